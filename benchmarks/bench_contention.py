@@ -0,0 +1,80 @@
+"""
+Throughput of many threads tracing at once: the global output lock, the
+single-queue background writer, and the sharded background writer.
+
+Run from the repository root:
+
+    python benchmarks/bench_contention.py
+
+Every thread emits the same number of records to a stream that discards
+them, so the numbers measure printtrace's own synchronisation rather than
+I/O. On a free-threaded build (``python3.13t``) the threads run in parallel
+and the difference between the strategies is larger.
+"""
+
+from __future__ import annotations
+
+import sys
+import threading
+import time
+
+from printtrace import Tracer, start_async_writer, stop_async_writer
+from printtrace.writer import active_writer
+
+RECORDS_PER_THREAD = 5_000
+THREAD_COUNTS = (1, 8, 64)
+STRATEGIES = ("lock", "async", "sharded")
+
+
+class NullStream:
+    def write(self, data: str) -> int:
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+
+def _run(strategy: str, threads: int) -> float:
+    if strategy == "async":
+        start_async_writer(maxsize=100_000)
+    elif strategy == "sharded":
+        start_async_writer(maxsize=100_000, sharded=True)
+
+    trace = Tracer("verbose", file=NullStream())  # type: ignore[arg-type]
+    barrier = threading.Barrier(threads + 1)
+
+    def worker() -> None:
+        barrier.wait()
+        for i in range(RECORDS_PER_THREAD):
+            trace("request", i)
+
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in pool:
+        thread.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for thread in pool:
+        thread.join()
+    writer = active_writer()
+    if writer is not None:
+        writer.flush()
+    elapsed = time.perf_counter() - started
+    stop_async_writer()
+    return elapsed
+
+
+def main() -> None:
+    gil = getattr(sys, "_is_gil_enabled", lambda: True)()
+    print(f"Python {sys.version.split()[0]}, GIL {'enabled' if gil else 'disabled'}")
+    print(f"{'threads':>7} " + " ".join(f"{name:>16}" for name in STRATEGIES))
+    for threads in THREAD_COUNTS:
+        total = threads * RECORDS_PER_THREAD
+        cells = []
+        for strategy in STRATEGIES:
+            elapsed = _run(strategy, threads)
+            cells.append(f"{total / elapsed / 1000:9.0f} krec/s")
+        print(f"{threads:>7} " + " ".join(f"{cell:>16}" for cell in cells))
+
+
+if __name__ == "__main__":
+    main()
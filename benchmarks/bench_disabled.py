@@ -0,0 +1,63 @@
+"""
+Cost of a disabled printtrace() call, compared with an empty function call.
+
+Run from the repository root:
+
+    python benchmarks/bench_disabled.py
+"""
+
+from __future__ import annotations
+
+import io
+import os
+import timeit
+from collections.abc import Callable
+
+from printtrace import INFO, Tracer
+from printtrace.api import printtrace, printtrace_disabled
+
+NUMBER = 1_000_000
+REPEAT = 5
+
+
+def _empty(*values: object, **kwargs: object) -> None:
+    pass
+
+
+def _ns_per_call(stmt: Callable[[], None]) -> float:
+    best = min(timeit.repeat(stmt, number=NUMBER, repeat=REPEAT))
+    return best / NUMBER * 1e9
+
+
+def main() -> None:
+    sink = io.StringIO()
+    off = Tracer("off", file=sink)
+    filtered = Tracer("verbose", file=sink, level=INFO)
+    payload = {"user": 42, "items": [1, 2, 3]}
+
+    os.environ.pop("PRINTTRACE_MODE", None)
+    cases: list[tuple[str, Callable[[], None]]] = [
+        ("empty function", lambda: _empty("x", payload)),
+        ("import-time no-op", lambda: printtrace_disabled("x", payload)),
+        ("Tracer('off')", lambda: off("x", payload)),
+        ("Tracer below level", lambda: filtered("x", payload)),
+        ("printtrace(mode='off')", lambda: printtrace("x", payload, mode="off")),
+    ]
+
+    baseline = None
+    for name, stmt in cases:
+        ns = _ns_per_call(stmt)
+        if baseline is None:
+            baseline = ns
+        print(f"{name:<26} {ns:8.1f} ns/call  ({ns / baseline:4.1f}x empty)")
+
+    # The env var is read on every call, so this one pays for os.getenv().
+    os.environ["PRINTTRACE_MODE"] = "off"
+    ns = _ns_per_call(lambda: printtrace("x", payload))
+    assert baseline is not None
+    name = "PRINTTRACE_MODE=off"
+    print(f"{name:<26} {ns:8.1f} ns/call  ({ns / baseline:4.1f}x empty)")
+
+
+if __name__ == "__main__":
+    main()
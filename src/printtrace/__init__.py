@@ -2,7 +2,91 @@
 printtrace - thread-safe, contextual debug printing for Python.
 """
 
-from .api import Mode, printtrace
+from typing import TYPE_CHECKING
 
-__all__ = ["printtrace", "Mode"]
+from ._types import Lazy
+from .api import Mode, disabled_at_import, printtrace, printtrace_disabled
+from .counters import disable_stats, enable_stats, reset_stats, stats
+from .dedup import report_repeats
+from .formatting import register_formatter, unregister_formatter
+from .funnel import attach_funnel, start_process_funnel, stop_process_funnel
+from .hotspots import (
+    disable_hotspots,
+    enable_hotspots,
+    hotspots,
+    report_hotspots,
+)
+from .levels import DEBUG, ERROR, INFO, WARNING
+from .memo import disable_format_cache, enable_format_cache, format_cache_stats
+from .sampling import EveryNth, FirstN, RateLimit, report_suppressed
+from .tracer import Tracer
+from .writer import (
+    start_async_writer,
+    start_loop_writer,
+    stop_async_writer,
+    stop_loop_writer,
+)
+
+if TYPE_CHECKING:
+    from .ring import RingSink
+    from .sinks import FdSink, RotatingFileSink
+
+# PRINTTRACE_MODE=off at import: bind the no-op so disabled calls skip even
+# the environment lookup. Calls through printtrace.api are unaffected.
+if disabled_at_import():
+    printtrace = printtrace_disabled  # noqa: F811
+
+__all__ = [
+    "printtrace",
+    "Mode",
+    "Tracer",
+    "Lazy",
+    "register_formatter",
+    "unregister_formatter",
+    "enable_format_cache",
+    "disable_format_cache",
+    "format_cache_stats",
+    "DEBUG",
+    "INFO",
+    "WARNING",
+    "ERROR",
+    "start_async_writer",
+    "stop_async_writer",
+    "start_loop_writer",
+    "stop_loop_writer",
+    "RingSink",
+    "RotatingFileSink",
+    "FdSink",
+    "start_process_funnel",
+    "stop_process_funnel",
+    "attach_funnel",
+    "EveryNth",
+    "FirstN",
+    "RateLimit",
+    "report_suppressed",
+    "report_repeats",
+    "enable_stats",
+    "disable_stats",
+    "reset_stats",
+    "stats",
+    "enable_hotspots",
+    "disable_hotspots",
+    "hotspots",
+    "report_hotspots",
+]
 __version__ = "1.1.0"
+
+# Loaded on first access: sinks are not needed by programs that write to
+# their own streams, and importing printtrace should stay cheap.
+_LAZY = {"RingSink": "ring", "RotatingFileSink": "sinks", "FdSink": "sinks"}
+
+
+def __getattr__(name: str) -> object:
+    module = _LAZY.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    from importlib import import_module
+
+    value = getattr(import_module(f".{module}", __name__), name)
+    globals()[name] = value
+    return value
@@ -0,0 +1,72 @@
+"""
+Command-line tools for printtrace.
+
+    python -m printtrace decode [--format verbose|json] FILE [FILE ...]
+    python -m printtrace ring [-n N] FILE
+
+``decode`` turns a ``mode="binary"`` trace back into text. ``-`` reads
+standard input. ``ring`` prints the records held in a flight-recorder ring
+file, oldest first.
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+from collections.abc import Sequence
+
+from .binary import decode
+from .ring import read_ring
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m printtrace")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    decode_cmd = commands.add_parser(
+        "decode", help="render a binary trace as verbose or json text"
+    )
+    decode_cmd.add_argument("--format", choices=("verbose", "json"), default="verbose")
+    decode_cmd.add_argument("files", nargs="+", metavar="FILE")
+
+    ring_cmd = commands.add_parser(
+        "ring", help="print the records in a flight-recorder ring file"
+    )
+    ring_cmd.add_argument(
+        "-n", "--last", type=int, default=None, help="only the last N records"
+    )
+    ring_cmd.add_argument("file", metavar="FILE")
+
+    args = parser.parse_args(argv)
+    if args.command == "ring":
+        return _ring(args.file, args.last)
+    return _decode(args.files, args.format)
+
+
+def _decode(paths: Sequence[str], fmt: str) -> int:
+    out = sys.stdout
+    for path in paths:
+        try:
+            if path == "-":
+                decode(sys.stdin.buffer, out, fmt)
+            else:
+                with open(path, "rb") as stream:
+                    decode(stream, out, fmt)
+        except (OSError, ValueError) as exc:
+            print(f"printtrace decode: {path}: {exc}", file=sys.stderr)
+            return 1
+    return 0
+
+
+def _ring(path: str, last: int | None) -> int:
+    try:
+        records = read_ring(path, last)
+    except (OSError, ValueError) as exc:
+        print(f"printtrace ring: {path}: {exc}", file=sys.stderr)
+        return 1
+    sys.stdout.write("".join(records))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
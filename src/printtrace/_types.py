@@ -3,16 +3,20 @@ Shared data types for printtrace.
 """
 
 from __future__ import annotations
-from dataclasses import dataclass
 
-__all__ = ["CallContext"]
+from collections.abc import Callable
+from typing import NamedTuple
 
+__all__ = ["CallContext", "Lazy"]
 
-@dataclass(frozen=True)
-class CallContext:
+
+class CallContext(NamedTuple):
     """
     Immutable snapshot of the call-site that invoked printtrace.
 
+    Tuple-backed so construction is a single allocation with no per-instance
+    ``__dict__``.
+
     Attributes
     ----------
     filename:
@@ -23,10 +27,45 @@ class CallContext:
     function:
         Name of the enclosing function, or ``"<module>"`` for module-level code.
     thread_name:
-        ``threading.current_thread().name`` at the moment of the call.
+        ``threading.current_thread().name``, read once per thread and cached.
+        Renaming a thread after its first printtrace call is not reflected.
+    pid:
+        ``os.getpid()`` of the emitting process, or ``0`` if unknown.
+    process_name:
+        ``multiprocessing.current_process().name`` - ``"MainProcess"``
+        outside of multiprocessing workers.
+    task_name:
+        Name of the current :class:`asyncio.Task`, or ``None`` outside a
+        running event loop's tasks.
     """
 
     filename: str
     lineno: int
     function: str
     thread_name: str
+    pid: int = 0
+    process_name: str = "MainProcess"
+    task_name: str | None = None
+
+
+class Lazy:
+    """
+    A traced value computed only if the record is actually emitted.
+
+    Wrap an expensive expression in a zero-argument callable::
+
+        printtrace("state", Lazy(lambda: expensive_summary(obj)))
+
+    When the call is suppressed (mode ``"off"`` or below the level threshold)
+    the callable is never invoked. Only top-level values are resolved; a
+    ``Lazy`` nested inside a container is rendered with ``repr()``. If the
+    callable raises, the value renders as ``<unprintable>``.
+    """
+
+    __slots__ = ("func",)
+
+    def __init__(self, func: Callable[[], object]) -> None:
+        self.func = func
+
+    def __repr__(self) -> str:
+        return f"Lazy({self.func!r})"
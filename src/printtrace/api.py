@@ -4,18 +4,14 @@ Public API for printtrace.
 
 from __future__ import annotations
 
-import json
 import os
 import sys
-from typing import Literal, TextIO
+from typing import TextIO
 
-from .context import capture_context
-from .formatting import format_value
-from .sync import output_lock
-
-
-Mode = Literal["verbose", "minimal", "json"]
-_VALID_MODES: frozenset[str] = frozenset({"verbose", "minimal", "json"})
+from .flush import resolve_flush_policy
+from .levels import DEBUG, resolve_level
+from .sampling import SamplingPolicy, admit
+from .tracer import Mode, Tracer, resolve_dedup, validate_mode
 
 _ENV_VAR = "PRINTTRACE_MODE"
 _DEFAULT_MODE: str = "verbose"
@@ -33,38 +29,33 @@ def _resolve_mode(mode: str | None) -> str:
     else:
         env = os.getenv(_ENV_VAR)
         resolved = env if env is not None else _DEFAULT_MODE
+    return validate_mode(resolved)
 
-    if resolved not in _VALID_MODES:
-        raise ValueError(
-            f"Invalid printtrace mode {resolved!r}. "
-            f"Expected one of: {sorted(_VALID_MODES)}."
-        )
-    return resolved
-
-
-def _format_message(*, message: str, context: str, mode: str) -> str:
-    if mode == "minimal":
-        return message
-
-    if mode == "json":
-        return json.dumps({"message": message, "context": context})
 
-    return f"{context} | {message}"
+# One default tracer per (mode, flush policy, level threshold, dedup window,
+# stack depth), built on first use.
+_default_tracers: dict[tuple[str, str, int, float | None, int], Tracer] = {}
 
 
-def _safe_str(value: object) -> str:
-    """str() with fallback to repr() and then a sentinel - never raises."""
-    try:
-        return str(value)
-    except Exception:
-        try:
-            return repr(value)
-        except Exception:
-            return "<unprintable>"
+def _default_tracer(mode: str, dedup: float | None = None, stack: int = 0) -> Tracer:
+    key = (mode, resolve_flush_policy(None), resolve_level(None), dedup, stack)
+    tracer = _default_tracers.get(key)
+    if tracer is None:
+        mode_name, flush, threshold, window, depth = key
+        tracer = Tracer(
+            mode_name,  # type: ignore[arg-type]
+            flush=flush,
+            level=threshold,
+            dedup=False if window is None else window,
+            stack=depth,
+        )
+        tracer = _default_tracers.setdefault(key, tracer)
+    return tracer
 
 
-def _shorten_filename(path: str) -> str:
-    return os.path.basename(path) or path
+def disabled_at_import() -> bool:
+    """True if ``PRINTTRACE_MODE=off`` was set when the package was imported."""
+    return os.getenv(_ENV_VAR) == "off"
 
 
 def printtrace(
@@ -73,6 +64,10 @@ def printtrace(
     end: str | None = "\n",
     file: TextIO | None = None,
     mode: str | None = None,
+    level: int = DEBUG,
+    sample: SamplingPolicy | None = None,
+    dedup: bool | float = False,
+    stack: int = 0,
 ) -> None:
     """
     Print a trace-safe debugging line with contextual information.
@@ -87,6 +82,8 @@ def printtrace(
         rendered with repr-style formatting (via :func:`format_value`).
         In ``"minimal"`` mode they are rendered with :func:`str`, matching
         the behaviour of the built-in :func:`print`. Both paths never raise.
+        A top-level :class:`Lazy` value is computed only if the line is
+        emitted.
     sep:
         Separator between values. Defaults to a single space.
         ``None`` is treated as ``" "`` to match :func:`print` semantics.
@@ -96,46 +93,72 @@ def printtrace(
     file:
         Output stream. Defaults to sys.stdout.
     mode:
-        Output mode: ``"verbose"`` (default), ``"minimal"``, or ``"json"``.
-        Overrides the ``PRINTTRACE_MODE`` environment variable.
+        Output mode: ``"verbose"`` (default), ``"minimal"``, ``"json"``,
+        ``"binary"``, or ``"off"``. Overrides the ``PRINTTRACE_MODE``
+        environment variable.
+    level:
+        Level of this call. It is dropped if below the ``PRINTTRACE_LEVEL``
+        threshold. Defaults to ``DEBUG``.
+    sample:
+        Sampling policy for this call site, such as ``EveryNth(1000)`` or
+        ``RateLimit(10)``; see :mod:`printtrace.sampling`. State is kept per
+        call site, so pass the same policy on every call from that site.
+        Defaults to ``None``: every call is emitted.
+    dedup:
+        Collapse consecutive identical lines from this call site into a
+        ``repeated N times`` summary; see :mod:`printtrace.dedup`. ``True``
+        uses a 10 second summary window, a number sets the window in
+        seconds. Defaults to ``False``.
+    stack:
+        Number of callers above this call site to show after it, innermost
+        first, in ``"verbose"`` and ``"json"`` modes; see
+        :mod:`printtrace.stack`. Defaults to ``0``.
 
     Raises
     ------
     ValueError
-        If *mode* (or ``PRINTTRACE_MODE``) is not one of the valid modes.
+        If *mode* (or ``PRINTTRACE_MODE``) is not one of the valid modes,
+        ``PRINTTRACE_FLUSH`` or ``PRINTTRACE_LEVEL`` is not valid, *dedup*
+        is not a positive window or is set in ``"binary"`` mode, or *stack*
+        is negative.
     """
-    if sep is None:
-        sep = " "
-    if end is None:
-        end = "\n"
-
-    out = sys.stdout if file is None else file
     effective_mode = _resolve_mode(mode)
-
-    ctx = capture_context()
-
-    context_str = (
-        f"[{ctx.thread_name}] "
-        f"{_shorten_filename(ctx.filename)}:{ctx.lineno} "
-        f"in {ctx.function}"
+    # Checked before the flush and level variables are read: a disabled call
+    # costs one environment lookup at most.
+    if effective_mode == "off":
+        return
+    tracer = _default_tracer(
+        effective_mode, resolve_dedup(dedup) if dedup else None, stack
     )
-
-    if effective_mode == "minimal":
-        message = sep.join(_safe_str(v) for v in values)
-    else:
-        message = sep.join(format_value(v) for v in values)
-
-    formatted = _format_message(
-        message=message,
-        context=context_str,
-        mode=effective_mode,
+    if level < tracer._threshold:
+        return
+    if file is None:
+        file = sys.stdout
+    if sample is not None and not admit(sample, file, 1, tracer._mode != "binary"):
+        return
+    tracer._emit(
+        values,
+        " " if sep is None else sep,
+        "\n" if end is None else end,
+        file,
     )
 
-    # Build output before the lock so formatting never runs in the critical section.
-    output = formatted + end
 
-    with output_lock():
-        out.write(output)
+def printtrace_disabled(
+    *values: object,
+    sep: str | None = " ",
+    end: str | None = "\n",
+    file: TextIO | None = None,
+    mode: str | None = None,
+    level: int = DEBUG,
+    sample: SamplingPolicy | None = None,
+    dedup: bool | float = False,
+    stack: int = 0,
+) -> None:
+    """
+    No-op with the signature of :func:`printtrace`.
 
-    # Flush outside the lock - a slow stream would otherwise stall all threads.
-    out.flush()
+    Bound as ``printtrace.printtrace`` when ``PRINTTRACE_MODE=off`` at import
+    time, so disabled calls cost one function call and nothing else. Arguments
+    are ignored, including an explicit *mode*.
+    """
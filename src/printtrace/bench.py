@@ -0,0 +1,485 @@
+"""
+Benchmark runner for printtrace.
+
+    python -m printtrace.bench [--quick] [--only PATTERN] [--output FILE]
+                               [--compare BASELINE] [--threshold FRACTION]
+
+Measures:
+
+- ``call.<mode>``: ns per call of a ``Tracer`` in each mode, to a stream
+  that discards the output; ``call.verbose.stats`` with counters enabled
+- ``format.<shape>``: ns per :func:`~printtrace.formatting.format_value`
+  call for flat, nested, wide, and huge-string values, and for ORM-style
+  rows that share related objects (``format.orm``) and are listed by them
+  in turn (``format.orm.backrefs``)
+- ``context.<function>``: ns per call-site capture, and for an 8-frame
+  stack, ``context.stack.8`` against ``traceback.format_stack()``
+- ``threads.<sink>.<n>``: records per second with *n* threads tracing at
+  once to a null stream, a file, and a pipe
+- ``sink.<kind>``: records per second written to disk by one thread, with
+  ``file=open(path, "w")`` (``sink.open``) against a
+  :class:`~printtrace.sinks.RotatingFileSink` without rotation
+  (``sink.rotating``) and rotating every 1 MiB (``sink.rotating.1mb``), and
+  an unbuffered :class:`~printtrace.sinks.FdSink` (``sink.fd``)
+- ``import.printtrace``: microseconds to ``import printtrace`` in a fresh
+  interpreter, as reported by ``python -X importtime``, median of runs
+
+Results are printed as a table and, with ``--output``, saved as JSON.
+``--compare`` loads a saved run and flags every metric that got worse by
+more than ``--threshold`` (default 10%); the exit status is 1 if any did.
+Benchmark numbers are noisy: compare runs from the same machine, and
+re-run before trusting a single flag.
+
+Constraints:
+- no dependencies; timing is :func:`timeit.repeat`, best of ``repeat``
+- a metric's name is its identity across runs: renaming one drops it from
+  comparisons
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import fnmatch
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import timeit
+import traceback
+from collections.abc import Callable, Iterator, Sequence
+from functools import partial
+from typing import Any, NamedTuple, TextIO
+
+from . import counters
+from .context import capture_context, capture_prefix, capture_site
+from .formatting import FormatLimits, format_value
+from .sinks import FdSink, RotatingFileSink
+from .stack import capture_stack, stack_text
+from .tracer import Tracer
+
+SCHEMA = 1
+DEFAULT_THRESHOLD = 0.10
+MODES = ("verbose", "minimal", "json")
+SINKS = ("null", "file", "pipe")
+_STACK_DEPTH = 8
+
+
+class Settings(NamedTuple):
+    """How long each measurement runs."""
+
+    number: int
+    repeat: int
+    records_per_thread: int
+    thread_counts: tuple[int, ...]
+
+
+FULL = Settings(20_000, 5, 5_000, (1, 4, 16, 64))
+QUICK = Settings(1_000, 2, 200, (1, 8))
+
+
+class NullStream:
+    """A text stream that discards everything written to it."""
+
+    def write(self, data: str) -> int:
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+
+def _ns_per_call(stmt: Callable[[], object], settings: Settings) -> float:
+    best = min(timeit.repeat(stmt, number=settings.number, repeat=settings.repeat))
+    return best / settings.number * 1e9
+
+
+class _Case(NamedTuple):
+    """One metric, measured only when it is selected."""
+
+    name: str
+    unit: str
+    higher_is_better: bool
+    measure: Callable[[Settings], float]
+
+
+def _ns_case(name: str, stmt: Callable[[], object]) -> _Case:
+    return _Case(name, "ns/call", False, lambda s: _ns_per_call(stmt, s))
+
+
+def _call_cases() -> Iterator[_Case]:
+    payload = {"user": 42, "items": [1, 2, 3]}
+    for mode in MODES:
+        trace = Tracer(mode, file=NullStream())  # type: ignore[arg-type]
+        yield _ns_case(f"call.{mode}", partial(trace, "request", payload))
+    trace = Tracer("verbose", file=NullStream())  # type: ignore[arg-type]
+    yield _Case(
+        "call.verbose.stats",
+        "ns/call",
+        False,
+        lambda s: _with_stats(lambda: trace("request", payload), s),
+    )
+
+
+def _with_stats(stmt: Callable[[], object], settings: Settings) -> float:
+    enabled = counters._stats is not None
+    counters.enable_stats()
+    try:
+        return _ns_per_call(stmt, settings)
+    finally:
+        if not enabled:
+            counters.disable_stats()
+
+
+_SHAPES: dict[str, object] = {
+    "flat": [1, 2.5, "three", None, True],
+    "nested": {"a": {"b": {"c": {"d": [1, 2, {"e": 3}]}}}},
+    "wide": {f"key{i}": i for i in range(200)},
+    "huge_str": "x" * 1_000_000,
+}
+
+
+def _orm_rows(count: int = 50, backrefs: bool = False) -> list[dict[str, object]]:
+    """
+    Query results as an ORM hands them over: rows sharing their related
+    objects, and with *backrefs*, related objects listing their rows.
+    """
+    vendor = {"id": 1, "name": "Acme", "country": "NZ"}
+    customers: list[dict[str, object]] = [
+        {
+            "id": c,
+            "name": f"customer {c}",
+            "address": {"city": "Wellington", "street": f"{c} Cuba St"},
+            "orders": [],
+        }
+        for c in range(3)
+    ]
+    products = [
+        {"id": p, "sku": f"SKU-{p:04d}", "price": 9.5 + p, "vendor": vendor}
+        for p in range(5)
+    ]
+    rows: list[dict[str, object]] = []
+    for i in range(count):
+        customer = customers[i % len(customers)]
+        row = {"id": i, "customer": customer, "product": products[i % 5], "qty": 2}
+        if backrefs:
+            customer["orders"].append(row)  # type: ignore[attr-defined]
+        rows.append(row)
+    return rows
+
+
+def _format_cases() -> Iterator[_Case]:
+    for shape, value in _SHAPES.items():
+        yield _ns_case(f"format.{shape}", partial(format_value, value))
+    # Deep and wide enough to reach every object.
+    limits = FormatLimits(max_depth=6, max_items=50, max_total=16 * 1024)
+    for name, backrefs in (("orm", False), ("orm.backrefs", True)):
+        rows = _orm_rows(backrefs=backrefs)
+        yield _ns_case(f"format.{name}", partial(format_value, rows, limits))
+
+
+def _context_cases() -> Iterator[_Case]:
+    functions: dict[str, Callable[[int], object]] = {
+        "capture_context": capture_context,
+        "capture_prefix": capture_prefix,
+        "capture_site": capture_site,
+    }
+    for name, capture in functions.items():
+        yield _ns_case(f"context.{name}", partial(capture, 1))
+    yield _ns_case(
+        f"context.stack.{_STACK_DEPTH}",
+        lambda: stack_text(capture_stack(_STACK_DEPTH, 1)),
+    )
+    # Reference point for the stack capture.
+    yield _ns_case(
+        f"context.traceback.{_STACK_DEPTH}",
+        lambda: traceback.format_stack(limit=_STACK_DEPTH),
+    )
+
+
+@contextlib.contextmanager
+def _sink(kind: str) -> Iterator[TextIO]:
+    """A stream to trace into, closed - with any reader joined - on exit."""
+    if kind == "null":
+        yield NullStream()  # type: ignore[misc]
+    elif kind == "file":
+        with tempfile.TemporaryFile("w") as stream:
+            yield stream
+    else:
+        read_fd, write_fd = os.pipe()
+        reader = threading.Thread(target=_drain, args=(read_fd,), daemon=True)
+        reader.start()
+        try:
+            with open(write_fd, "w") as stream:
+                yield stream
+        finally:
+            # The stream is closed, so the reader sees end-of-file.
+            reader.join()
+
+
+def _drain(fd: int) -> None:
+    with open(fd, "rb", buffering=0) as pipe:
+        while pipe.read(1 << 16):
+            pass
+
+
+def _throughput(sink: str, threads: int, settings: Settings) -> float:
+    with _sink(sink) as stream:
+        trace = Tracer("verbose", file=stream)
+        barrier = threading.Barrier(threads + 1)
+        count = settings.records_per_thread
+
+        def worker() -> None:
+            barrier.wait()
+            for i in range(count):
+                trace("request", i)
+
+        pool = [threading.Thread(target=worker) for _ in range(threads)]
+        for thread in pool:
+            thread.start()
+        barrier.wait()
+        started = time.perf_counter()
+        for thread in pool:
+            thread.join()
+        elapsed = time.perf_counter() - started
+    return threads * count / elapsed
+
+
+def _thread_cases(settings: Settings) -> Iterator[_Case]:
+    for sink in SINKS:
+        for threads in settings.thread_counts:
+            yield _Case(
+                f"threads.{sink}.{threads}",
+                "rec/s",
+                True,
+                partial(_throughput, sink, threads),
+            )
+
+
+def _disk_throughput(kind: str, settings: Settings) -> float:
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "trace.log")
+        with _disk_sink(kind, path) as stream:
+            trace = Tracer("verbose", file=stream)
+            started = time.perf_counter()
+            for i in range(settings.number):
+                trace("request", i)
+            # Count getting the last record to the file, not just buffered.
+            stream.close()
+            elapsed = time.perf_counter() - started
+    return settings.number / elapsed
+
+
+def _disk_sink(kind: str, path: str) -> contextlib.AbstractContextManager[Any]:
+    if kind == "open":
+        return open(path, "w")
+    if kind == "fd":
+        return FdSink(path)
+    if kind == "rotating":
+        return RotatingFileSink(path)
+    return RotatingFileSink(path, max_bytes=1 << 20, backups=2)
+
+
+def _sink_cases() -> Iterator[_Case]:
+    for kind in ("open", "fd", "rotating", "rotating.1mb"):
+        yield _Case(
+            f"sink.{kind}",
+            "rec/s",
+            True,
+            partial(_disk_throughput, kind),
+        )
+
+
+def import_time(runs: int = 5) -> float:
+    """
+    Median microseconds, over *runs* fresh interpreters, that
+    ``import printtrace`` takes, including everything it imports.
+
+    Raises
+    ------
+    RuntimeError
+        If the interpreter fails or reports no time for printtrace.
+    """
+    samples = []
+    for _ in range(max(runs, 1)):
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", "import printtrace"],
+            capture_output=True,
+            text=True,
+            timeout=60,
+        )
+        # "import time: self [us] | cumulative | imported package"
+        for line in result.stderr.splitlines():
+            fields = line.split("|")
+            if len(fields) == 3 and fields[2].strip() == "printtrace":
+                samples.append(float(fields[1]))
+                break
+        else:
+            raise RuntimeError(
+                f"No import time reported for printtrace: {result.stderr[-500:]}"
+            )
+    return statistics.median(samples)
+
+
+def _import_cases() -> Iterator[_Case]:
+    yield _Case("import.printtrace", "us", False, lambda s: import_time(s.repeat))
+
+
+def _cases(settings: Settings = FULL) -> list[_Case]:
+    """Every benchmark case, in run order."""
+    return [
+        *_call_cases(),
+        *_format_cases(),
+        *_context_cases(),
+        *_thread_cases(settings),
+        *_sink_cases(),
+        *_import_cases(),
+    ]
+
+
+def run(settings: Settings = FULL, only: str | None = None) -> dict[str, Any]:
+    """
+    Run the benchmarks and return the results as a JSON-ready dict.
+
+    Parameters
+    ----------
+    settings:
+        ``FULL`` or ``QUICK``, or custom :class:`Settings`.
+    only:
+        ``fnmatch`` pattern such as ``"call.*"``; cases whose name does not
+        match are not run.
+    """
+    metrics: dict[str, dict[str, Any]] = {}
+    for case in _cases(settings):
+        if only is not None and not fnmatch.fnmatchcase(case.name, only):
+            continue
+        metrics[case.name] = {
+            "value": case.measure(settings),
+            "unit": case.unit,
+            "higher_is_better": case.higher_is_better,
+        }
+    gil = getattr(sys, "_is_gil_enabled", lambda: True)()
+    return {
+        "schema": SCHEMA,
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "gil": bool(gil),
+        "platform": platform.platform(),
+        "settings": settings._asdict(),
+        "metrics": metrics,
+    }
+
+
+class Change(NamedTuple):
+    name: str
+    baseline: float
+    current: float
+    change: float
+    regressed: bool
+
+
+def compare(
+    baseline: dict[str, Any],
+    current: dict[str, Any],
+    threshold: float = DEFAULT_THRESHOLD,
+) -> list[Change]:
+    """
+    Compare two results dicts, metric by metric.
+
+    ``change`` is the relative change in the metric's better direction -
+    negative is worse - and a metric is flagged as regressed when it got
+    worse by more than *threshold*. Metrics missing from either side are
+    skipped.
+
+    Raises
+    ------
+    ValueError
+        If either dict is not a printtrace benchmark result.
+    """
+    for results in (baseline, current):
+        if results.get("schema") != SCHEMA or "metrics" not in results:
+            raise ValueError("Not a printtrace benchmark result.")
+    changes = []
+    for name, now in current["metrics"].items():
+        before = baseline["metrics"].get(name)
+        if before is None or not before["value"]:
+            continue
+        ratio = (now["value"] - before["value"]) / before["value"]
+        change = ratio if now["higher_is_better"] else -ratio
+        changes.append(
+            Change(name, before["value"], now["value"], change, change < -threshold)
+        )
+    return changes
+
+
+def _print_results(results: dict[str, Any], out: TextIO) -> None:
+    gil = "enabled" if results["gil"] else "disabled"
+    print(f"Python {results['python']}, GIL {gil}", file=out)
+    for name, metric in results["metrics"].items():
+        print(f"{name:<32} {metric['value']:>14,.1f} {metric['unit']}", file=out)
+
+
+def _print_changes(changes: Sequence[Change], out: TextIO) -> None:
+    print(f"\n{'metric':<32} {'baseline':>14} {'current':>14} {'change':>8}", file=out)
+    for change in changes:
+        flag = "  REGRESSION" if change.regressed else ""
+        print(
+            f"{change.name:<32} {change.baseline:>14,.1f} "
+            f"{change.current:>14,.1f} {change.change:>+8.1%}{flag}",
+            file=out,
+        )
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m printtrace.bench")
+    parser.add_argument(
+        "--quick", action="store_true", help="short runs, for smoke testing"
+    )
+    parser.add_argument(
+        "--only", metavar="PATTERN", help="only metrics matching this glob"
+    )
+    parser.add_argument("--output", metavar="FILE", help="save results as JSON")
+    parser.add_argument(
+        "--compare", metavar="BASELINE", help="flag regressions against a saved run"
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help="relative slowdown flagged as a regression (default 0.10)",
+    )
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if args.compare is not None:
+        try:
+            with open(args.compare, encoding="utf-8") as stream:
+                baseline = json.load(stream)
+        except (OSError, ValueError) as exc:
+            print(f"printtrace bench: {args.compare}: {exc}", file=sys.stderr)
+            return 1
+
+    results = run(QUICK if args.quick else FULL, args.only)
+    _print_results(results, sys.stdout)
+    if args.output is not None:
+        with open(args.output, "w", encoding="utf-8") as stream:
+            json.dump(results, stream, indent=2)
+            stream.write("\n")
+
+    if baseline is None:
+        return 0
+    try:
+        changes = compare(baseline, results, args.threshold)
+    except ValueError as exc:
+        print(f"printtrace bench: {args.compare}: {exc}", file=sys.stderr)
+        return 1
+    _print_changes(changes, sys.stdout)
+    return 1 if any(change.regressed for change in changes) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
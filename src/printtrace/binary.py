@@ -0,0 +1,418 @@
+"""
+Compact binary trace format for printtrace.
+
+``mode="binary"`` writes length-prefixed ``struct``-packed records instead of
+text. Call sites and threads are interned: the filename, function, line, and
+thread name are written once per stream as definition records, and each
+trace event refers to them by number. An event carries only the site id,
+thread id, a monotonic timestamp, and the values as rendered by
+:func:`~printtrace.formatting.format_value`.
+
+Decode a trace back into the usual text with::
+
+    python -m printtrace decode trace.bin
+    python -m printtrace decode --format json trace.bin
+
+Layout
+------
+Every record is ``<I`` body length followed by the body; the body's first
+byte is the record kind. Strings are ``<H`` (names) or ``<I`` (values)
+length-prefixed UTF-8, except in ``EVENT`` records.
+
+- ``HEADER``: magic, version, wall-clock time and monotonic nanoseconds at
+  the moment the stream was opened - used to turn event times back into
+  wall-clock timestamps. Precedes a process's first record on a stream. A
+  file appended to by several processes holds a header from each, and their
+  records may interleave; the reader keeps every definition across headers.
+- ``SITE``: site id, line, filename, function.
+- ``THREAD``: thread id, pid, thread name, process name. Site and thread ids
+  embed the pid, so processes sharing a file - including a forked child and
+  its parent - never reuse one another's ids.
+- ``EVENT``: site id, thread id, monotonic nanoseconds, flags, value count,
+  then a ``<I`` byte length per string, then the strings: ``sep`` and
+  ``end`` if they differ from the defaults and the asyncio task name if
+  there is one (per the flags), then the values.
+
+Constraints:
+- definitions are written before the first event that uses them, under the
+  same lock, so a reader never meets an unknown id
+- records are written on the caller's thread even when the background writer
+  is running: a drop policy discarding a record could discard definitions
+  that later events refer to
+- no imports from api or tracer
+"""
+
+from __future__ import annotations
+
+import contextlib
+import itertools
+import os
+import struct
+import threading
+import time
+import weakref
+from collections.abc import Iterator
+from types import CodeType
+from typing import IO, Any, NamedTuple
+
+from . import context as _context
+from ._types import CallContext
+from .context import render_context
+from .flush import Flusher
+from .sync import output_lock
+
+MAGIC = b"PTRB"
+VERSION = 2
+
+KIND_HEADER = 0
+KIND_SITE = 1
+KIND_THREAD = 2
+KIND_EVENT = 3
+
+_FLAG_SEP = 1
+_FLAG_END = 2
+_FLAG_TASK = 4
+
+_LEN = struct.Struct("<I")
+_HEADER = struct.Struct("<B4sBdq")
+_SITE = struct.Struct("<BQI")
+_THREAD = struct.Struct("<BQI")
+_EVENT = struct.Struct("<BQQqBH")
+_NAME_LEN = struct.Struct("<H")
+
+_MAX_NAME_BYTES = 0xFFFF
+
+# Site 0 is the fallback used when the caller's frame is unavailable.
+_UNKNOWN_SITE: tuple[str, int] = ("<unknown>", 0)
+
+__all__ = ["Event", "decode", "read_events", "write_event"]
+
+
+class Event(NamedTuple):
+    """One decoded trace event."""
+
+    context: CallContext
+    timestamp: float
+    values: list[str]
+    sep: str
+    end: str
+
+
+# -- encoding ----------------------------------------------------------------
+
+# (code object, line) -> (site id, encoded SITE record). Process-wide: ids
+# are assigned once and each stream receives the definitions it has not
+# seen yet. Like thread ids, site ids carry the pid in their high 32 bits.
+_sites: dict[Any, tuple[int, bytes]] = {}
+_site_ids = itertools.count(1)
+
+_thread_ids = itertools.count(1)
+
+
+class _StreamState:
+    """Which definitions a stream has already received."""
+
+    __slots__ = ("sites", "threads")
+
+    def __init__(self) -> None:
+        self.sites: set[int] = set()
+        self.threads: set[int] = set()
+
+
+# id(stream) -> (weak reference to the stream, its state). Guarded by
+# output_lock. A dead or mismatched reference means the id was reused.
+_streams: dict[int, tuple[Any, _StreamState]] = {}
+
+
+def _frame(body: bytes) -> bytes:
+    return _LEN.pack(len(body)) + body
+
+
+def _name(text: str) -> bytes:
+    # At most 4 bytes per character, so the cut never splits a character.
+    data = text[: _MAX_NAME_BYTES // 4].encode("utf-8", "surrogatepass")
+    return _NAME_LEN.pack(len(data)) + data
+
+
+def _header() -> bytes:
+    return _frame(
+        _HEADER.pack(KIND_HEADER, MAGIC, VERSION, time.time(), time.monotonic_ns())
+    )
+
+
+# Per-thread (thread id, encoded THREAD record), built on first use - not at
+# fork time, when multiprocessing has not yet named the child.
+_thread = threading.local()
+
+
+def _thread_slot() -> tuple[int, bytes]:
+    slot: tuple[int, bytes] | None = getattr(_thread, "slot", None)
+    if slot is None:
+        pid, process_name = _context._process_info()
+        thread_id = (pid << 32) | next(_thread_ids)
+        record = _frame(
+            _THREAD.pack(KIND_THREAD, thread_id, pid)
+            + _name(_context._cache.name)
+            + _name(process_name)
+        )
+        slot = _thread.slot = (thread_id, record)
+    return slot
+
+
+def _reinit_after_fork() -> None:
+    global _thread, _sites, _site_ids
+
+    # New ids, carrying the child's pid, for every thread and site of the
+    # child. A stream inherited from the parent keeps its state: the
+    # parent's definitions on it stay valid, and the child's ids are new.
+    _thread = threading.local()
+    _sites = {}
+    _site_ids = itertools.count(1)
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reinit_after_fork)
+
+
+def _site(key: tuple[CodeType, int] | None) -> tuple[int, bytes]:
+    entry = _sites.get(key)
+    if entry is None:
+        if key is None:
+            site_id = 0
+            filename, lineno = _UNKNOWN_SITE
+            function = "<unknown>"
+        else:
+            code, lineno = key
+            site_id = (os.getpid() << 32) | next(_site_ids)
+            filename, function = code.co_filename, code.co_name
+        record = _frame(
+            _SITE.pack(KIND_SITE, site_id, lineno) + _name(filename) + _name(function)
+        )
+        entry = _sites.setdefault(key, (site_id, record))
+    return entry
+
+
+def encode_event(
+    site_id: int,
+    thread_id: int,
+    parts: list[str],
+    sep: str,
+    end: str,
+    task: str | None = None,
+) -> bytes:
+    """Encode one ``EVENT`` record."""
+    flags = 0
+    texts = parts
+    if sep != " " or end != "\n" or task is not None:
+        texts = []
+        if sep != " ":
+            flags |= _FLAG_SEP
+            texts.append(sep)
+        if end != "\n":
+            flags |= _FLAG_END
+            texts.append(end)
+        if task is not None:
+            flags |= _FLAG_TASK
+            texts.append(task)
+        texts.extend(parts)
+    data = [text.encode("utf-8", "surrogatepass") for text in texts]
+    count = len(data)
+    payload = b"".join(data)
+    # One pack for the frame length, the fixed fields, and the value lengths.
+    head = struct.pack(
+        f"<IBQQqBH{count}I",
+        _EVENT.size + 4 * count + len(payload),
+        KIND_EVENT,
+        site_id,
+        thread_id,
+        time.monotonic_ns(),
+        flags,
+        len(parts),
+        *map(len, data),
+    )
+    return head + payload
+
+
+def write_event(
+    out: IO[Any],
+    site: tuple[CodeType, int] | None,
+    parts: list[str],
+    sep: str,
+    end: str,
+    flusher: Flusher,
+    task: str | None = None,
+) -> None:
+    """
+    Write one event to *out*, preceded by any definitions it still needs.
+
+    A text stream that exposes a binary ``buffer`` (such as ``sys.stdout``)
+    is written through that buffer.
+    """
+    target = getattr(out, "buffer", out)
+    site_id, site_record = _site(site)
+    thread_id, thread_record = _thread_slot()
+    event = encode_event(site_id, thread_id, parts, sep, end, task)
+
+    # The definitions check and the write share one critical section, so a
+    # stream never receives an event ahead of the records it refers to.
+    with output_lock():
+        entry = _streams.get(id(target))
+        if entry is not None and entry[0]() is target:
+            state = entry[1]
+            prefix = b""
+        else:
+            entry = None
+            state = _StreamState()
+            prefix = _header()
+        new_site = site_id not in state.sites
+        if new_site:
+            prefix += site_record
+        new_thread = thread_id not in state.threads
+        if new_thread:
+            prefix += thread_record
+        data = prefix + event if prefix else event
+        target.write(data)
+
+        # Recorded only once written: after a failed write the next event
+        # carries the header and definitions again.
+        if entry is None:
+            # Not weak-referenceable: every record carries its own header and
+            # definitions.
+            with contextlib.suppress(TypeError):
+                _streams[id(target)] = (weakref.ref(target), state)
+        if new_site:
+            state.sites.add(site_id)
+        if new_thread:
+            state.threads.add(thread_id)
+        flush_now = flusher.note_write(target, len(data))
+
+    if flush_now:
+        target.flush()
+
+
+# -- decoding ----------------------------------------------------------------
+
+
+def read_events(stream: IO[bytes]) -> Iterator[Event]:
+    """
+    Yield the events in a binary trace.
+
+    A record cut short at the end of the file - the writer was killed
+    mid-write - ends the iteration.
+
+    Raises
+    ------
+    ValueError
+        If the data is not a printtrace binary trace.
+    """
+    sites: dict[int, tuple[str, int, str]] = {}
+    threads: dict[int, tuple[str, int, str]] = {}
+    wall_base = 0.0
+    mono_base = 0
+    first = True
+
+    while True:
+        head = stream.read(_LEN.size)
+        if len(head) < _LEN.size:
+            return
+        (length,) = _LEN.unpack(head)
+        body = stream.read(length)
+        if len(body) < length or not body:
+            return
+        kind = body[0]
+
+        if first and kind != KIND_HEADER:
+            raise ValueError("Not a printtrace binary trace: missing header.")
+        first = False
+
+        if kind == KIND_HEADER:
+            _, magic, version, wall_base, mono_base = _HEADER.unpack_from(body)
+            if magic != MAGIC:
+                raise ValueError("Not a printtrace binary trace: bad magic.")
+            if version != VERSION:
+                raise ValueError(
+                    f"Unsupported printtrace binary trace version {version}."
+                )
+            # Definitions are kept: ids are unique per process, and records
+            # written before this header may still refer to them.
+        elif kind == KIND_SITE:
+            _, site_id, lineno = _SITE.unpack_from(body)
+            filename, offset = _read_name(body, _SITE.size)
+            function, _ = _read_name(body, offset)
+            sites[site_id] = (filename, lineno, function)
+        elif kind == KIND_THREAD:
+            _, thread_id, pid = _THREAD.unpack_from(body)
+            thread_name, offset = _read_name(body, _THREAD.size)
+            process_name, _ = _read_name(body, offset)
+            threads[thread_id] = (thread_name, pid, process_name)
+        elif kind == KIND_EVENT:
+            _, site_id, thread_id, mono, flags, count = _EVENT.unpack_from(body)
+            strings = count + sum(
+                1 for flag in (_FLAG_SEP, _FLAG_END, _FLAG_TASK) if flags & flag
+            )
+            sizes = struct.unpack_from(f"<{strings}I", body, _EVENT.size)
+            offset = _EVENT.size + 4 * strings
+            texts = []
+            for size in sizes:
+                chunk = body[offset : offset + size]
+                texts.append(chunk.decode("utf-8", "surrogatepass"))
+                offset += size
+            sep = texts.pop(0) if flags & _FLAG_SEP else " "
+            end = texts.pop(0) if flags & _FLAG_END else "\n"
+            task = texts.pop(0) if flags & _FLAG_TASK else None
+            values = texts
+            filename, lineno, function = sites.get(site_id, ("<unknown>", 0, "?"))
+            thread_name, pid, process_name = threads.get(
+                thread_id, ("?", 0, "MainProcess")
+            )
+            context = CallContext(
+                filename, lineno, function, thread_name, pid, process_name, task
+            )
+            timestamp = wall_base + (mono - mono_base) / 1e9
+            yield Event(context, timestamp, values, sep, end)
+        # Unknown kinds are skipped: newer writers may add record types.
+
+
+def _read_name(body: bytes, offset: int) -> tuple[str, int]:
+    (size,) = _NAME_LEN.unpack_from(body, offset)
+    start = offset + _NAME_LEN.size
+    return body[start : start + size].decode("utf-8", "surrogatepass"), start + size
+
+
+def decode(stream: IO[bytes], out: IO[str], fmt: str = "verbose") -> int:
+    """
+    Write the events in *stream* to *out* as ``verbose`` or ``json`` text.
+
+    Lines match what the corresponding text mode would have written for the
+    same call. Returns the number of events decoded.
+
+    Raises
+    ------
+    ValueError
+        If *fmt* is not ``"verbose"`` or ``"json"``, or *stream* is not a
+        printtrace binary trace.
+    """
+    if fmt not in ("verbose", "json"):
+        raise ValueError(
+            f"Invalid printtrace decode format {fmt!r}. "
+            f"Expected one of: ['json', 'verbose']."
+        )
+    from json.encoder import encode_basestring_ascii as encode
+
+    from .context import render_json_fields
+
+    count = 0
+    for event in read_events(stream):
+        message = event.sep.join(event.values)
+        if fmt == "verbose":
+            out.write(f"{render_context(event.context)} | {message}{event.end}")
+        else:
+            values = ", ".join(map(encode, event.values))
+            out.write(
+                f'{{"message": {encode(message)}, '
+                f"{render_json_fields(event.context)}, "
+                f'"timestamp": {event.timestamp!r}, '
+                f'"values": [{values}]}}{event.end}'
+            )
+        count += 1
+    return count
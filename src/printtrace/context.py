@@ -1,8 +1,15 @@
 """
 Call-site context capture for printtrace.
 
-Captures thread name, filename, line number, and function name for the
-frame that called printtrace().
+Captures thread name, filename, line number, function name, and the
+process id and name for the frame that called printtrace().
+
+The hot path is :func:`capture_prefix`, which returns the rendered
+``[thread] file:line in func`` prefix. Prefixes are cached per thread,
+keyed by ``(code object, line number)``, so a call site that has been hit
+before does no string building at all - one ``sys._getframe`` and one dict
+lookup. :func:`capture_json_fields` does the same for ``json`` mode, caching
+the call site's already-escaped JSON fields.
 
 Writing a wrapper around printtrace?
 -------------------------------------
@@ -20,12 +27,28 @@ an increased ``skip`` value to ``capture_context`` to compensate:
 
 Each extra call-stack level between the user's code and the
 ``capture_context`` call requires one additional skip.
+
+Tasks
+-----
+Inside an asyncio task the thread name is always that of the loop's thread,
+so the task name is captured too and shown after it:
+``[MainThread:Task-7] file:line in func``. Prefixes are cached per task name
+as well as per call site.
+
+Processes
+---------
+The pid and process name are read once per process. A forked child drops
+every cached rendering, since each one embeds the process it was rendered
+in. Records from a process other than the main one carry the process name
+in their prefix: ``[ForkPoolWorker-1/MainThread] file:line in func``.
 """
 
 from __future__ import annotations
 
-import inspect
+import os
+import sys
 import threading
+from types import CodeType
 
 from ._types import CallContext
 
@@ -33,7 +56,82 @@ from ._types import CallContext
 #   user code → printtrace() → capture_context()
 _SKIP_FRAMES = 2
 
-__all__ = ["capture_context", "_SKIP_FRAMES"]
+_MAIN_PROCESS = "MainProcess"
+
+# Per-thread prefix cache bound. Reaching it clears the cache rather than
+# evicting one entry; only code that generates call sites dynamically
+# (exec, eval, templating) gets anywhere near it.
+_MAX_CACHED_SITES = 4096
+
+__all__ = [
+    "capture_context",
+    "capture_prefix",
+    "capture_json_fields",
+    "capture_site",
+    "current_task_name",
+    "render_context",
+    "render_json_fields",
+    "render_site",
+    "_SKIP_FRAMES",
+]
+
+
+class _ThreadCache(threading.local):
+    """Per-thread state: the thread's name and its rendered call sites."""
+
+    def __init__(self) -> None:
+        self.name: str = threading.current_thread().name
+        # Keyed by call site only; an asyncio task name is spliced in after
+        # the lookup, so each new task does not add entries.
+        self.prefixes: dict[tuple[CodeType, int], tuple[str, int]] = {}
+        self.json_fields: dict[tuple[CodeType, int], tuple[str, str, str]] = {}
+
+
+_cache = _ThreadCache()
+
+# (pid, process name), read on first use in each process.
+_process: tuple[int, str] | None = None
+
+
+def _process_info() -> tuple[int, str]:
+    global _process
+
+    info = _process
+    if info is None:
+        # multiprocessing is only consulted if the program already imported
+        # it; without it, this is the main process.
+        mp = sys.modules.get("multiprocessing")
+        name = mp.current_process().name if mp is not None else _MAIN_PROCESS
+        info = _process = (os.getpid(), name)
+    return info
+
+
+def current_task_name() -> str | None:
+    """Name of the running asyncio task, or ``None`` outside of one."""
+    # Never imports asyncio: a program that has not imported it has no loop.
+    aio = sys.modules.get("asyncio")
+    if aio is None:
+        return None
+    loop = aio._get_running_loop()
+    if loop is None:
+        return None
+    task = aio.current_task(loop)
+    return None if task is None else task.get_name()
+
+
+def _reinit_after_fork() -> None:
+    global _process, _cache
+
+    # The name is read lazily: multiprocessing names the child only after
+    # the fork hooks have run.
+    _process = None
+    # The thread-local instance is replaced, not just cleared, so no other
+    # thread's cached renderings carry over either.
+    _cache = _ThreadCache()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reinit_after_fork)
 
 
 def capture_context(skip: int = _SKIP_FRAMES) -> CallContext:
@@ -49,32 +147,215 @@ def capture_context(skip: int = _SKIP_FRAMES) -> CallContext:
     if skip < 0:
         skip = 0
 
-    frame = inspect.currentframe()
     try:
-        for _ in range(skip):
-            if frame is None or frame.f_back is None:
-                return _fallback_context()
-            frame = frame.f_back
-
-        if frame is None:
-            return _fallback_context()
-
-        code = frame.f_code
-        return CallContext(
-            filename=code.co_filename,
-            lineno=frame.f_lineno,
-            function=code.co_name,
-            thread_name=threading.current_thread().name,
-        )
-    finally:
-        # Break reference cycles - CPython keeps frames alive via f_locals.
-        del frame
+        # _getframe(0) is this function, matching the historical skip semantics.
+        frame = sys._getframe(skip)
+    except ValueError:
+        return _fallback_context()
+
+    code = frame.f_code
+    lineno = frame.f_lineno
+    # Break reference cycles - CPython keeps frames alive via f_locals.
+    del frame
+    return CallContext(
+        code.co_filename,
+        lineno,
+        code.co_name,
+        _cache.name,
+        *_process_info(),
+        current_task_name(),
+    )
+
+
+def capture_prefix(skip: int = _SKIP_FRAMES) -> str:
+    """
+    Return the rendered ``[thread] file:line in func`` prefix for the caller.
+
+    Equivalent to ``render_context(capture_context(skip))``, but served from a
+    per-thread cache once the call site has been seen, in any asyncio task.
+    """
+    if skip < 0:
+        skip = 0
+
+    try:
+        frame = sys._getframe(skip)
+    except ValueError:
+        return render_context(_fallback_context())
+
+    key = (frame.f_code, frame.f_lineno)
+    del frame
+
+    cache = _cache
+    prefixes = cache.prefixes
+    entry = prefixes.get(key)
+    if entry is None:
+        ctx = _site_context(key, cache.name)
+        entry = (render_context(ctx), _task_offset(ctx))
+        if len(prefixes) >= _MAX_CACHED_SITES:
+            prefixes.clear()
+        prefixes[key] = entry
+
+    task = current_task_name()
+    if task is None:
+        return entry[0]
+    prefix, at = entry
+    return f"{prefix[:at]}:{task}{prefix[at:]}"
+
+
+def capture_json_fields(skip: int = _SKIP_FRAMES) -> str:
+    """
+    Return the caller's context as a fragment of a JSON object.
+
+    Equivalent to ``render_json_fields(capture_context(skip))``, served from a
+    per-thread cache like :func:`capture_prefix`.
+    """
+    if skip < 0:
+        skip = 0
+
+    try:
+        frame = sys._getframe(skip)
+    except ValueError:
+        return render_json_fields(_fallback_context())
+
+    key = (frame.f_code, frame.f_lineno)
+    del frame
+
+    cache = _cache
+    table = cache.json_fields
+    entry = table.get(key)
+    if entry is None:
+        entry = _json_pieces(_site_context(key, cache.name))
+        if len(table) >= _MAX_CACHED_SITES:
+            table.clear()
+        table[key] = entry
+
+    task = current_task_name()
+    if task is None:
+        return entry[0]
+    from json.encoder import encode_basestring_ascii as encode
+
+    _, head, tail = entry
+    # Escaping is per character, so the task's escaped text splices into
+    # the already-escaped context string.
+    return f"{head}{encode(':' + task)[1:-1]}{tail}{encode(task)}"
+
+
+def _site_context(site: tuple[CodeType, int], thread_name: str) -> CallContext:
+    code, lineno = site
+    return CallContext(
+        code.co_filename,
+        lineno,
+        code.co_name,
+        thread_name,
+        *_process_info(),
+        None,
+    )
+
+
+def _task_offset(ctx: CallContext) -> int:
+    """Where ``:task`` goes in ``render_context(ctx)`` for a task-less *ctx*."""
+    who = ctx.thread_name
+    if ctx.process_name != _MAIN_PROCESS:
+        who = f"{ctx.process_name}/{who}"
+    return 1 + len(who)
+
+
+def _json_pieces(ctx: CallContext) -> tuple[str, str, str]:
+    """
+    Render a task-less *ctx* as ``(fields, head, tail)``: its JSON fields, and
+    the two parts around which a task is spliced in - the escaped ``:task``
+    after *head*, the encoded task name after *tail*.
+    """
+    from json.encoder import encode_basestring_ascii as encode
+
+    fields = render_json_fields(ctx)
+    prefix = render_context(ctx)
+    # '"context": "[thread' - the closing quote is in the tail.
+    head = '"context": ' + encode(prefix[: _task_offset(ctx)])[:-1]
+    tail = fields[len(head) : -len("null")]
+    return fields, head, tail
+
+
+def capture_site(skip: int = _SKIP_FRAMES) -> tuple[CodeType, int] | None:
+    """
+    Return the caller's ``(code object, line number)``, or ``None`` if the
+    stack is shallower than *skip*.
+
+    The key the other ``capture_*`` functions cache on; nothing is rendered.
+    """
+    if skip < 0:
+        skip = 0
+    try:
+        frame = sys._getframe(skip)
+    except ValueError:
+        return None
+    key = (frame.f_code, frame.f_lineno)
+    del frame
+    return key
+
+
+def render_json_fields(ctx: CallContext) -> str:
+    """
+    Render *ctx* as the ``"context"``, ``"thread"``, ``"file"``, ``"line"``,
+    ``"function"``, ``"pid"``, ``"process"``, and ``"task"`` members of a
+    JSON object, without the braces. ``"task"`` is ``null`` outside a task.
+
+    Strings are escaped exactly as ``json.dumps`` escapes them by default,
+    so a record built around the fragment is byte-identical to the
+    ``json.dumps`` output for the same keys in the same order.
+    """
+    # Imported here, not at module load: only json mode renders these, and
+    # only once per call site.
+    from json.encoder import encode_basestring_ascii as encode
+
+    filename = _shorten_filename(ctx.filename)
+    task = "null" if ctx.task_name is None else encode(ctx.task_name)
+    return (
+        f'"context": {encode(render_context(ctx))}, '
+        f'"thread": {encode(ctx.thread_name)}, '
+        f'"file": {encode(filename)}, '
+        f'"line": {int(ctx.lineno)}, '
+        f'"function": {encode(ctx.function)}, '
+        f'"pid": {int(ctx.pid)}, '
+        f'"process": {encode(ctx.process_name)}, '
+        f'"task": {task}'
+    )
+
+
+def render_context(ctx: CallContext) -> str:
+    """
+    Render *ctx* as ``[thread] file:line in func`` with a basename filename.
+
+    Outside the main process the thread is qualified by the process name,
+    and inside an asyncio task it is followed by the task name:
+    ``[process/thread:task]``.
+    """
+    who = ctx.thread_name
+    if ctx.task_name is not None:
+        who = f"{who}:{ctx.task_name}"
+    if ctx.process_name != _MAIN_PROCESS:
+        who = f"{ctx.process_name}/{who}"
+    return f"[{who}] {_shorten_filename(ctx.filename)}:{ctx.lineno} in {ctx.function}"
+
+
+def render_site(site: tuple[CodeType, int]) -> str:
+    """Render a :func:`capture_site` key as ``file:line in func``."""
+    code, lineno = site
+    return f"{_shorten_filename(code.co_filename)}:{lineno} in {code.co_name}"
+
+
+def _shorten_filename(path: str) -> str:
+    return os.path.basename(path) or path
 
 
 def _fallback_context() -> CallContext:
+    pid, process_name = _process_info()
     return CallContext(
         filename="<unknown>",
         lineno=0,
         function="<unknown>",
-        thread_name=threading.current_thread().name,
+        thread_name=_cache.name,
+        pid=pid,
+        process_name=process_name,
+        task_name=current_task_name(),
     )
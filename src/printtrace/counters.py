@@ -0,0 +1,327 @@
+"""
+Opt-in self-instrumentation for printtrace.
+
+With counters enabled, every emitted call records, in a table owned by the
+calling thread:
+
+- the call, per mode
+- the bytes written, as the text's UTF-8 length
+- nanoseconds spent capturing the call site, formatting values, waiting
+  for the output lock, holding it to write, and flushing afterwards
+- the lock wait in a log2 histogram
+
+:func:`stats` sums the tables of every thread that has recorded anything.
+
+Recording takes no lock: each thread only writes its own table, and the
+only shared step is registering a thread's table the first time it
+records. Reading while threads record gives totals that are current to
+within the calls in flight.
+
+The emit path reports to one :class:`Recorder`. The counters behind
+:func:`stats` are one; the call-site profiler in :mod:`printtrace.hotspots`
+is another, and with both enabled each measurement goes to both.
+
+Not covered: records handed to a background writer are counted with their
+size but not timed past the hand-off, and ``"binary"`` mode writes are
+not timed.
+
+Constraints:
+- disabled by default; with no recorder installed the cost is one global
+  read per call
+- no imports from formatting, context, tracer, or api
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+from collections.abc import Callable
+from types import CodeType
+from typing import Generic, NamedTuple, TypeVar
+
+_T = TypeVar("_T")
+
+# Lock waits up to 2**63 ns; bucket b holds waits w with w.bit_length() == b.
+_BUCKETS = 64
+
+__all__ = [
+    "Recorder",
+    "Stats",
+    "ThreadTables",
+    "disable_stats",
+    "enable_stats",
+    "reset_stats",
+    "stats",
+]
+
+
+class Stats(NamedTuple):
+    """
+    Totals across threads since counters were enabled or last reset.
+
+    ``lock_wait_histogram`` maps an upper bound in nanoseconds to the number
+    of lock acquisitions that waited at least half that long and less than
+    it (``1`` counts waits of 0 ns). Only non-empty buckets are present.
+    """
+
+    calls: dict[str, int]
+    bytes_written: int
+    context_ns: int
+    format_ns: int
+    lock_wait_ns: int
+    write_ns: int
+    flush_ns: int
+    lock_wait_histogram: dict[int, int]
+
+
+class _ThreadTable:
+    """One thread's counters. Written by that thread only."""
+
+    __slots__ = (
+        "calls",
+        "bytes_written",
+        "context_ns",
+        "format_ns",
+        "lock_wait_ns",
+        "write_ns",
+        "flush_ns",
+        "wait_buckets",
+    )
+
+    def __init__(self) -> None:
+        self.calls: dict[str, int] = {}
+        self.bytes_written = 0
+        self.context_ns = 0
+        self.format_ns = 0
+        self.lock_wait_ns = 0
+        self.write_ns = 0
+        self.flush_ns = 0
+        self.wait_buckets = [0] * _BUCKETS
+
+
+class ThreadTables(Generic[_T]):
+    """One table per thread, each written only by its own thread."""
+
+    def __init__(self, factory: Callable[[], _T]) -> None:
+        self._factory = factory
+        self._local = threading.local()
+        self._tables: list[_T] = []
+        self._lock = threading.Lock()
+
+    def get(self) -> _T:
+        """The calling thread's table, created on first use."""
+        table: _T | None = getattr(self._local, "table", None)
+        if table is None:
+            table = self._factory()
+            self._local.table = table
+            with self._lock:
+                self._tables.append(table)
+        return table
+
+    def all(self) -> list[_T]:
+        with self._lock:
+            return list(self._tables)
+
+
+def encoded_length(text: str) -> int:
+    """Return the size of ``text`` in UTF-8, the encoding the sinks write."""
+    if text.isascii():
+        return len(text)
+    return len(text.encode("utf-8", "surrogatepass"))
+
+
+class Recorder:
+    """
+    Receives the emit path's measurements. The base class ignores them.
+
+    ``wants_site`` asks the emit path to pass the call site's
+    ``(code object, line)`` to :meth:`record_call`; otherwise it passes
+    ``None`` and skips the capture. Its ``length`` is the text's length in
+    characters; the ``length`` given to :meth:`record_write` and
+    :meth:`record_handoff` is its :func:`encoded_length` in bytes.
+    """
+
+    wants_site = False
+
+    def record_call(
+        self,
+        mode: str,
+        site: tuple[CodeType, int] | None,
+        length: int,
+        context_ns: int,
+        format_ns: int,
+    ) -> None:
+        pass
+
+    def record_write(
+        self, length: int, wait_ns: int, write_ns: int, flush_ns: int
+    ) -> None:
+        pass
+
+    def record_handoff(self, length: int) -> None:
+        pass
+
+
+class StatsRecorder(Recorder):
+    """The per-thread counter tables of one enabled period."""
+
+    def __init__(self) -> None:
+        self._tables = ThreadTables(_ThreadTable)
+
+    def record_call(
+        self,
+        mode: str,
+        site: tuple[CodeType, int] | None,
+        length: int,
+        context_ns: int,
+        format_ns: int,
+    ) -> None:
+        table = self._tables.get()
+        table.calls[mode] = table.calls.get(mode, 0) + 1
+        table.context_ns += context_ns
+        table.format_ns += format_ns
+
+    def record_write(
+        self, length: int, wait_ns: int, write_ns: int, flush_ns: int
+    ) -> None:
+        table = self._tables.get()
+        table.bytes_written += length
+        table.lock_wait_ns += wait_ns
+        table.write_ns += write_ns
+        table.flush_ns += flush_ns
+        table.wait_buckets[min(wait_ns.bit_length(), _BUCKETS - 1)] += 1
+
+    def record_handoff(self, length: int) -> None:
+        self._tables.get().bytes_written += length
+
+    def totals(self) -> Stats:
+        calls: dict[str, int] = {}
+        buckets = [0] * _BUCKETS
+        bytes_written = context_ns = format_ns = 0
+        lock_wait_ns = write_ns = flush_ns = 0
+        for table in self._tables.all():
+            for mode, count in list(table.calls.items()):
+                calls[mode] = calls.get(mode, 0) + count
+            for i, count in enumerate(table.wait_buckets):
+                buckets[i] += count
+            bytes_written += table.bytes_written
+            context_ns += table.context_ns
+            format_ns += table.format_ns
+            lock_wait_ns += table.lock_wait_ns
+            write_ns += table.write_ns
+            flush_ns += table.flush_ns
+        return Stats(
+            calls=calls,
+            bytes_written=bytes_written,
+            context_ns=context_ns,
+            format_ns=format_ns,
+            lock_wait_ns=lock_wait_ns,
+            write_ns=write_ns,
+            flush_ns=flush_ns,
+            lock_wait_histogram={
+                1 << i: count for i, count in enumerate(buckets) if count
+            },
+        )
+
+
+class _Tee(Recorder):
+    """Forwards every measurement to several recorders."""
+
+    def __init__(self, recorders: list[Recorder]) -> None:
+        self._recorders = recorders
+        self.wants_site = any(r.wants_site for r in recorders)
+
+    def record_call(
+        self,
+        mode: str,
+        site: tuple[CodeType, int] | None,
+        length: int,
+        context_ns: int,
+        format_ns: int,
+    ) -> None:
+        for recorder in self._recorders:
+            recorder.record_call(mode, site, length, context_ns, format_ns)
+
+    def record_write(
+        self, length: int, wait_ns: int, write_ns: int, flush_ns: int
+    ) -> None:
+        for recorder in self._recorders:
+            recorder.record_write(length, wait_ns, write_ns, flush_ns)
+
+    def record_handoff(self, length: int) -> None:
+        for recorder in self._recorders:
+            recorder.record_handoff(length)
+
+
+# Read directly by the tracer's emit path; None means nothing is recording.
+_active: Recorder | None = None
+_stats: StatsRecorder | None = None
+_profiler: Recorder | None = None
+
+
+def _install() -> None:
+    global _active
+
+    recorders = [r for r in (_stats, _profiler) if r is not None]
+    if not recorders:
+        _active = None
+    elif len(recorders) == 1:
+        _active = recorders[0]
+    else:
+        _active = _Tee(recorders)
+
+
+def set_profiler(profiler: Recorder | None) -> None:
+    """Install (or with ``None``, remove) the call-site profiler's recorder."""
+    global _profiler
+
+    _profiler = profiler
+    _install()
+
+
+def enable_stats() -> None:
+    """Start recording. Counters already recorded are kept."""
+    global _stats
+
+    if _stats is None:
+        _stats = StatsRecorder()
+        _install()
+
+
+def disable_stats() -> None:
+    """Stop recording and drop the counters."""
+    global _stats
+
+    _stats = None
+    _install()
+
+
+def reset_stats() -> None:
+    """Zero the counters. Has no effect while disabled."""
+    global _stats
+
+    if _stats is not None:
+        _stats = StatsRecorder()
+        _install()
+
+
+def stats() -> Stats:
+    """Totals since recording was enabled or reset; all zeros if disabled."""
+    recorder = _stats
+    if recorder is None:
+        return Stats({}, 0, 0, 0, 0, 0, 0, {})
+    return recorder.totals()
+
+
+def _reinit_after_fork() -> None:
+    # The child starts from zero with its own tables, if recording. The
+    # profiler resets its own state.
+    global _stats
+
+    if _stats is not None:
+        _stats = StatsRecorder()
+        _install()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reinit_after_fork)
@@ -0,0 +1,165 @@
+"""
+Collapsing of consecutive duplicate lines per call site.
+
+With deduplication on, each formatted record is compared with the previous
+one from the same call site - per ``(code object, line)`` - by hash. A
+repeat to the same stream is counted instead of written; the same record to
+another stream is written. When the site's message or stream changes, the
+count is written first, to the stream the repeats went to, as::
+
+    [printtrace] worker.py:42 in poll: previous line repeated 4,311 times
+
+A site repeating the same message for longer than the window gets the same
+summary once per window, so a stuck loop stays visible. Pending counts are
+written at interpreter exit, or on :func:`report_repeats`.
+
+What is compared is the record without its timestamp: in ``"verbose"`` mode
+the ``[thread] file:line in func | message`` line, so the same message from
+two threads is not a repeat.
+
+Constraints:
+- only hashes are kept, never the messages themselves
+- the comparison runs after formatting: dedup saves I/O, not formatting
+  (use :mod:`printtrace.sampling` for that)
+- no imports from api or tracer
+"""
+
+from __future__ import annotations
+
+import atexit
+import os
+import threading
+import time
+from types import CodeType
+from typing import TextIO
+
+from .context import render_site
+from .writer import write_notice
+
+DEFAULT_WINDOW = 10.0
+
+# Site-table bound. Reaching it reports and forgets every site.
+_MAX_SITES = 4096
+
+__all__ = ["DEFAULT_WINDOW", "observe", "report_repeats", "validate_window"]
+
+
+class _Site:
+    """Last record hash and pending repeat count of one call site."""
+
+    __slots__ = ("digest", "repeats", "stamp", "stream")
+
+    def __init__(self, digest: int, stamp: float, stream: TextIO) -> None:
+        self.digest = digest
+        self.repeats = 0
+        # When the site last wrote a record or a summary.
+        self.stamp = stamp
+        self.stream = stream
+
+
+_sites: dict[tuple[CodeType, int], _Site] = {}
+_lock = threading.Lock()
+_atexit_registered = False
+
+
+def validate_window(window: float | None) -> float | None:
+    """Return *window* unchanged, or raise ValueError if not positive."""
+    if window is not None and not window > 0:
+        raise ValueError(f"dedup window must be > 0 seconds, got {window!r}.")
+    return window
+
+
+def observe(
+    site: tuple[CodeType, int] | None,
+    digest: int,
+    stream: TextIO,
+    window: float,
+) -> tuple[bool, str]:
+    """
+    Record one formatted record from *site* with hash *digest*.
+
+    Returns ``(write, summary)``: whether the record itself is written, and
+    a repeat summary to write first (empty if none is due).
+    """
+    global _atexit_registered
+
+    if site is None:
+        return True, ""
+    now = time.monotonic()
+    stale: tuple[TextIO, str] | None = None
+
+    with _lock:
+        state = _sites.get(site)
+        if state is not None and state.digest == digest and state.stream is stream:
+            state.repeats += 1
+            if now - state.stamp < window:
+                return False, ""
+            summary = _summary(site, state.repeats)
+            state.repeats = 0
+            state.stamp = now
+            return False, summary
+
+        summary = ""
+        if state is None:
+            if len(_sites) >= _MAX_SITES:
+                _report_and_forget()
+            _sites[site] = _Site(digest, now, stream)
+            if not _atexit_registered:
+                atexit.register(report_repeats)
+                _atexit_registered = True
+        else:
+            if state.repeats:
+                text = _summary(site, state.repeats)
+                if state.stream is stream:
+                    summary = text
+                else:
+                    stale = (state.stream, text)
+            state.digest = digest
+            state.repeats = 0
+            state.stamp = now
+            state.stream = stream
+
+    if stale is not None:
+        write_notice(*stale)
+    return True, summary
+
+
+def report_repeats() -> None:
+    """Write every site's pending repeat summary now."""
+    pending = []
+    with _lock:
+        for site, state in _sites.items():
+            if state.repeats:
+                pending.append((state.stream, _summary(site, state.repeats)))
+                state.repeats = 0
+                state.stamp = time.monotonic()
+    for stream, text in pending:
+        write_notice(stream, text)
+
+
+def _report_and_forget() -> None:
+    # Called with _lock held.
+    sites = list(_sites.items())
+    _sites.clear()
+    for site, state in sites:
+        if state.repeats:
+            write_notice(state.stream, _summary(site, state.repeats))
+
+
+def _summary(site: tuple[CodeType, int], count: int) -> str:
+    noun = "time" if count == 1 else "times"
+    return (
+        f"[printtrace] {render_site(site)}: previous line repeated {count:,} {noun}\n"
+    )
+
+
+def _reinit_after_fork() -> None:
+    global _lock
+
+    _lock = threading.Lock()
+    # The parent reports its own repeats.
+    _sites.clear()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reinit_after_fork)
@@ -0,0 +1,293 @@
+"""
+Flush policies for printtrace.
+
+Decides when a stream is flushed after a write:
+
+- ``"always"`` (default) - flush after every call.
+- ``"tty"`` - flush after every call only if the stream is a terminal;
+  files and pipes are left to their own buffering.
+- ``"batch"`` - flush once ``PRINTTRACE_FLUSH_BYTES`` bytes are pending on a
+  stream, and from a background timer every ``PRINTTRACE_FLUSH_INTERVAL``
+  milliseconds.
+
+Streams written under a deferring policy are tracked until flushed. They are
+flushed at interpreter exit and before an uncaught exception is reported, so
+trace lines leading up to a crash are not lost in a userspace buffer.
+Tracking holds a weak reference and covers at most ``_MAX_TRACKED_STREAMS``
+streams; a stream that cannot be tracked is flushed per call instead.
+
+Constraints:
+- ``note_write()`` runs under ``output_lock()`` and must stay cheap
+- ``flush()`` on the stream always runs outside the lock
+- a forked child forgets the parent's pending streams and timer: their
+  buffered data is the parent's to flush, and the timer thread did not
+  survive the fork
+"""
+
+from __future__ import annotations
+
+import atexit
+import contextlib
+import os
+import sys
+import threading
+import time
+import weakref
+from types import TracebackType
+from typing import IO, Any, Literal
+
+from .sync import output_lock
+
+FlushPolicy = Literal["always", "tty", "batch"]
+_VALID_POLICIES: frozenset[str] = frozenset({"always", "tty", "batch"})
+
+_ENV_VAR = "PRINTTRACE_FLUSH"
+_BYTES_ENV_VAR = "PRINTTRACE_FLUSH_BYTES"
+_INTERVAL_ENV_VAR = "PRINTTRACE_FLUSH_INTERVAL"
+_DEFAULT_POLICY: str = "always"
+
+DEFAULT_FLUSH_BYTES = 64 * 1024
+DEFAULT_FLUSH_INTERVAL_MS = 100
+
+_MAX_TRACKED_STREAMS = 256
+
+__all__ = [
+    "FlushPolicy",
+    "Flusher",
+    "flush_pending",
+    "get_flusher",
+    "resolve_flush_policy",
+]
+
+
+def resolve_flush_policy(policy: str | None) -> str:
+    """Return the effective flush policy, or raise ValueError if unrecognised.
+
+    Resolution order: explicit argument → PRINTTRACE_FLUSH env var → "always".
+    """
+    if policy is not None:
+        resolved = policy
+    else:
+        env = os.getenv(_ENV_VAR)
+        resolved = env if env is not None else _DEFAULT_POLICY
+
+    if resolved not in _VALID_POLICIES:
+        raise ValueError(
+            f"Invalid printtrace flush policy {resolved!r}. "
+            f"Expected one of: {sorted(_VALID_POLICIES)}."
+        )
+    return resolved
+
+
+class Flusher:
+    """Flush after every write. Base class for the deferring policies."""
+
+    def note_write(self, stream: IO[Any], nbytes: int) -> bool:
+        """
+        Record that *nbytes* were written to *stream*.
+
+        Called under ``output_lock()``. Returns ``True`` if the caller should
+        flush *stream* now.
+        """
+        return True
+
+
+# Streams with unflushed data under a deferring policy, keyed by id().
+# Guarded by output_lock(): every mutation happens inside note_write() or
+# with the lock explicitly held. The weak reference keeps tracking from
+# holding a stream alive (one collected first was flushed by its own close)
+# and detects an id() reused by a different stream.
+_pending: dict[int, tuple[weakref.ref[IO[Any]], int]] = {}
+
+
+def _mark_pending(stream: IO[Any], nbytes: int) -> int | None:
+    """
+    Add *nbytes* to the count held back on *stream*.
+
+    Returns the new count, or ``None`` if *stream* cannot be tracked - it
+    does not support weak references, or ``_MAX_TRACKED_STREAMS`` live
+    streams are already pending - and the caller should flush it now.
+    """
+    key = id(stream)
+    entry = _pending.get(key)
+    if entry is not None and entry[0]() is stream:
+        total = entry[1] + nbytes
+        _pending[key] = (entry[0], total)
+        return total
+
+    if len(_pending) >= _MAX_TRACKED_STREAMS:
+        for dead in [k for k, (ref, _) in _pending.items() if ref() is None]:
+            del _pending[dead]
+        if len(_pending) >= _MAX_TRACKED_STREAMS:
+            return None
+    try:
+        ref = weakref.ref(stream)
+    except TypeError:
+        return None
+    _pending[key] = (ref, nbytes)
+    return nbytes
+
+
+class TtyFlusher(Flusher):
+    """Flush per call on terminals; leave files and pipes to their buffers."""
+
+    def __init__(self) -> None:
+        # isatty() is a syscall on real files; ask once per stream. The weak
+        # reference detects an id() reused by a different stream.
+        self._isatty: dict[int, tuple[weakref.ref[IO[Any]], bool]] = {}
+
+    def note_write(self, stream: IO[Any], nbytes: int) -> bool:
+        if self._isatty_cached(stream):
+            return True
+        return _mark_pending(stream, nbytes) is None
+
+    def _isatty_cached(self, stream: IO[Any]) -> bool:
+        key = id(stream)
+        entry = self._isatty.get(key)
+        if entry is not None and entry[0]() is stream:
+            return entry[1]
+
+        tty = _stream_isatty(stream)
+        try:
+            ref = weakref.ref(stream)
+        except TypeError:
+            return tty
+        if len(self._isatty) >= _MAX_TRACKED_STREAMS:
+            self._isatty.clear()
+        self._isatty[key] = (ref, tty)
+        return tty
+
+
+class BatchFlusher(Flusher):
+    """Flush every *max_bytes* per stream and every *interval* seconds."""
+
+    def __init__(self, max_bytes: int, interval: float) -> None:
+        self.max_bytes = max_bytes
+        self.interval = interval
+        self._timer: threading.Thread | None = None
+
+    def note_write(self, stream: IO[Any], nbytes: int) -> bool:
+        if self._timer is None:
+            self._start_timer()
+        total = _mark_pending(stream, nbytes)
+        if total is None:
+            return True
+        if total >= self.max_bytes:
+            del _pending[id(stream)]
+            return True
+        return False
+
+    def _start_timer(self) -> None:
+        # Called under output_lock(), so at most one timer is ever started.
+        self._timer = threading.Thread(
+            target=self._run, name="printtrace-flush", daemon=True
+        )
+        self._timer.start()
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(self.interval)
+            flush_pending()
+
+
+def _stream_isatty(stream: IO[Any]) -> bool:
+    try:
+        return bool(stream.isatty())
+    except Exception:
+        return False
+
+
+def _env_int(name: str, default: int) -> int:
+    raw = os.getenv(name)
+    if raw is None:
+        return default
+    try:
+        value = int(raw)
+    except ValueError:
+        raise ValueError(f"{name} must be an integer, got {raw!r}.") from None
+    if value < 1:
+        raise ValueError(f"{name} must be >= 1, got {value}.")
+    return value
+
+
+_flushers: dict[str, Flusher] = {"always": Flusher()}
+_flushers_lock = threading.Lock()
+
+
+def get_flusher(policy: str) -> Flusher:
+    """
+    Return the shared :class:`Flusher` for a validated *policy* name.
+
+    ``"batch"`` reads ``PRINTTRACE_FLUSH_BYTES`` and
+    ``PRINTTRACE_FLUSH_INTERVAL`` the first time it is requested.
+    """
+    flusher = _flushers.get(policy)
+    if flusher is not None:
+        return flusher
+
+    with _flushers_lock:
+        flusher = _flushers.get(policy)
+        if flusher is None:
+            if policy == "tty":
+                flusher = TtyFlusher()
+            else:
+                flusher = BatchFlusher(
+                    max_bytes=_env_int(_BYTES_ENV_VAR, DEFAULT_FLUSH_BYTES),
+                    interval=_env_int(_INTERVAL_ENV_VAR, DEFAULT_FLUSH_INTERVAL_MS)
+                    / 1000,
+                )
+            _install_final_flush()
+            _flushers[policy] = flusher
+    return flusher
+
+
+def flush_pending() -> None:
+    """Flush every stream with data held back by a deferring policy."""
+    with output_lock():
+        streams = [ref() for ref, _ in _pending.values()]
+        _pending.clear()
+
+    for stream in streams:
+        if stream is None:
+            continue
+        with contextlib.suppress(Exception):
+            stream.flush()
+
+
+def _reinit_after_fork() -> None:
+    global _flushers_lock
+
+    _flushers_lock = threading.Lock()
+    _pending.clear()
+    for flusher in _flushers.values():
+        if isinstance(flusher, BatchFlusher):
+            flusher._timer = None
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reinit_after_fork)
+
+
+_final_flush_installed = False
+
+
+def _install_final_flush() -> None:
+    global _final_flush_installed
+
+    if _final_flush_installed:
+        return
+    _final_flush_installed = True
+    atexit.register(flush_pending)
+
+    previous = sys.excepthook
+
+    def excepthook(
+        exc_type: type[BaseException],
+        exc: BaseException,
+        tb: TracebackType | None,
+    ) -> None:
+        # Trace output first, so it precedes the traceback it explains.
+        flush_pending()
+        previous(exc_type, exc, tb)
+
+    sys.excepthook = excepthook
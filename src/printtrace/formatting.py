@@ -6,30 +6,192 @@ safe to embed in debug output. Key guarantees:
 
 - Never raises: all exceptions are caught and replaced with a sentinel.
 - Bounded output: depth, item count, and string length are all capped.
+- Bounded work: a character budget covers the whole call. Once it is spent,
+  iteration stops and the remaining output is replaced with ``…``; fallback
+  ``repr()`` results are truncated to what is left of it.
 - Brackets match Python's repr: list, tuple, set, frozenset, and empty
   set/frozenset are all rendered distinctly.
+- Cycles stop at the first repeat: a container met again inside itself
+  renders as ``[...]``/``{...}``, as in Python's repr. A container met
+  again elsewhere in the call at the same depth reuses its rendering.
+- Buffers are summarized, not dumped: large ``bytes``, ``bytearray``,
+  ``array.array``, every ``memoryview``, and array-like objects exposing
+  ``__array_interface__`` (or ``shape`` and ``dtype``) render as their size,
+  element format, and a short preview read through a memoryview slice.
+
+Values are dispatched on their exact type through a lookup table. A type
+without an entry is resolved once - by the same precedence as an
+``isinstance`` chain - and the result is cached, so subclasses and custom
+classes also cost a single dict lookup after their first appearance.
+Formatters for application types can be added with
+:func:`register_formatter`.
 """
 
 from __future__ import annotations
 
-from collections.abc import Iterable, Mapping
-from typing import Any
+import contextlib
+import sys
+from collections.abc import Callable, Iterable, Mapping
+from typing import TYPE_CHECKING, Any, NamedTuple
+
+from . import memo as _memo
+from ._types import Lazy
+
+if TYPE_CHECKING:
+    from array import array
 
 MAX_DEPTH = 3
 MAX_ITEMS = 10
 MAX_STR_LEN = 120
+MAX_TOTAL_LEN = 4096
+
+# Bytes shown in a buffer summary's hex/ASCII preview.
+_PREVIEW_BYTES = 16
+
+__all__ = [
+    "format_value",
+    "format_values",
+    "format_parts",
+    "str_values",
+    "register_formatter",
+    "unregister_formatter",
+    "FormatLimits",
+    "DEFAULT_LIMITS",
+    "MAX_DEPTH",
+    "MAX_ITEMS",
+    "MAX_STR_LEN",
+    "MAX_TOTAL_LEN",
+]
+
+
+class FormatLimits(NamedTuple):
+    """
+    Output caps applied by :func:`format_value`.
+
+    The module-level ``MAX_*`` constants are the defaults; a
+    :class:`~printtrace.Tracer` can bind its own set. ``max_total`` is the
+    character budget for one call, shared by every value in it.
+    """
+
+    max_depth: int = MAX_DEPTH
+    max_items: int = MAX_ITEMS
+    max_str_len: int = MAX_STR_LEN
+    max_total: int = MAX_TOTAL_LEN
+
+
+DEFAULT_LIMITS = FormatLimits()
+
+
+class _State:
+    """
+    Per-call formatting state: the limits, what is left of the budget, and
+    the containers seen so far.
+    """
 
-__all__ = ["format_value", "MAX_DEPTH", "MAX_ITEMS", "MAX_STR_LEN"]
+    __slots__ = (
+        "max_depth",
+        "max_items",
+        "max_str_len",
+        "remaining",
+        "clipped",
+        "cycles",
+        "seen",
+    )
 
+    def __init__(self, limits: FormatLimits) -> None:
+        self.max_depth = limits.max_depth
+        self.max_items = limits.max_items
+        self.max_str_len = limits.max_str_len
+        self.remaining = limits.max_total
+        # Set when the budget, rather than a per-value cap, cut output short.
+        self.clipped = False
+        # Cycle markers rendered so far.
+        self.cycles = 0
+        # Containers by id: None while being rendered, then (container,
+        # depth, rendering). Holding the container keeps its id from being
+        # reused by another object during the call. Created on first use.
+        self.seen: dict[int, tuple[object, int, str] | None] | None = None
 
-def format_value(value: Any) -> str:
+
+def format_value(value: Any, limits: FormatLimits = DEFAULT_LIMITS) -> str:
     """
     Format *value* as a compact, human-readable debug string.
 
-    Always returns a string - never raises.
+    Always returns a string - never raises. A top-level :class:`Lazy` is
+    resolved first. Immutable values are served from the format cache when
+    it is enabled (see :mod:`printtrace.memo`).
+    """
+    return _format_root(value, _State(limits), limits)
+
+
+def format_values(
+    values: Iterable[Any], sep: str, limits: FormatLimits = DEFAULT_LIMITS
+) -> str:
+    """
+    Format and join *values* with *sep* under one shared character budget.
+
+    Values after the budget runs out are not formatted at all; a single
+    ``…`` stands in for them.
+    """
+    return sep.join(format_parts(values, sep, limits))
+
+
+def format_parts(
+    values: Iterable[Any], sep: str, limits: FormatLimits = DEFAULT_LIMITS
+) -> list[str]:
+    """
+    Format *values* as :func:`format_values` does, returning the pieces.
+
+    The budget still counts one *sep* between pieces. When it runs out the
+    last piece is ``…``.
+    """
+    state = _State(limits)
+    parts: list[str] = []
+    for value in values:
+        if parts:
+            if state.remaining <= 0:
+                parts.append("…")
+                break
+            state.remaining -= len(sep)
+        parts.append(_format_root(value, state, limits))
+    return parts
+
+
+def str_values(
+    values: Iterable[Any], sep: str, limits: FormatLimits = DEFAULT_LIMITS
+) -> str:
+    """
+    ``str()`` each of *values* and join with *sep*, as :func:`print` does.
+
+    Never raises, and each string is truncated to what is left of the shared
+    character budget. ``str()`` itself cannot be interrupted, so a value
+    with an enormous ``__str__`` still pays for building it once.
     """
+    remaining = limits.max_total
+    parts: list[str] = []
+    for value in values:
+        if parts:
+            if remaining <= 0:
+                parts.append("…")
+                break
+            remaining -= len(sep)
+        text = _safe_str(value)
+        if len(text) > remaining:
+            text = text[: max(remaining, 0)] + "…"
+        remaining -= len(text)
+        parts.append(text)
+    return sep.join(parts)
+
+
+def _safe_str(value: object) -> str:
+    """str() with fallback to repr() and then a sentinel - never raises."""
+    if type(value) is Lazy:
+        try:
+            value = value.func()
+        except Exception:
+            return "<unprintable>"
     try:
-        return _format(value, depth=0)
+        return str(value)
     except Exception:
         try:
             return repr(value)
@@ -37,64 +199,179 @@ def format_value(value: Any) -> str:
             return "<unprintable>"
 
 
-def _format(value: Any, depth: int) -> str:
-    if depth >= MAX_DEPTH:
+def _format_root(value: object, state: _State, limits: FormatLimits) -> str:
+    if type(value) is Lazy:
+        try:
+            value = value.func()
+        except Exception:
+            return _charge("<unprintable>", state)
+
+    # Module global read rather than a call: this runs for every value.
+    cache = _memo._active
+    if cache is not None:
+        key = cache.key_for(value, limits)
+        if key is not None:
+            found, text = cache.lookup(key, value)
+            if text is not None and len(text) <= state.remaining:
+                state.remaining -= len(text)
+                return text
+
+            clipped_before = state.clipped
+            state.clipped = False
+            text = _format_top(value, state)
+            # A budget-clipped rendering depends on the rest of the call.
+            if not found and not state.clipped:
+                cache.store(key, value, text)
+            state.clipped = state.clipped or clipped_before
+            return text
+
+    return _format_top(value, state)
+
+
+def _format_top(value: object, state: _State) -> str:
+    try:
+        return _format(value, 0, state)
+    except Exception:
+        return _format_repr(value, 0, state)
+
+
+def _format(value: Any, depth: int, state: _State | None = None) -> str:
+    if state is None:
+        state = _State(DEFAULT_LIMITS)
+    if depth >= state.max_depth:
+        state.remaining -= 1
         return "…"
 
-    if value is None or isinstance(value, (bool, int, float)):
-        return repr(value)
+    tp = type(value)
+    formatter = _dispatch.get(tp)
+    if formatter is None:
+        formatter = _resolve(tp)
+    return formatter(value, depth, state)
 
-    if isinstance(value, str):
-        return _format_str(value)
 
-    # Check Mapping before the generic iterable types; dicts are also iterable.
-    if isinstance(value, Mapping):
-        return _format_mapping(value, depth)
+def _charge(text: str, state: _State) -> str:
+    """Deduct *text* from the budget, truncating it if the budget runs out."""
+    remaining = state.remaining
+    if len(text) > remaining:
+        state.remaining = 0
+        state.clipped = True
+        return text[: max(remaining, 0)] + "…"
+    state.remaining = remaining - len(text)
+    return text
 
-    # Use type() not isinstance() for list/tuple so subclasses (e.g. namedtuples)
-    # fall through to repr() and keep their class name.
-    if type(value) is list or type(value) is tuple:
-        return _format_sequence(value, depth)
-    if isinstance(value, (set, frozenset)):
-        return _format_sequence(value, depth)
 
+def _format_repr(value: object, depth: int, state: _State) -> str:
     # repr() covers dataclasses, enums, custom classes, etc.
     try:
-        return repr(value)
+        text = repr(value)
     except Exception:
-        return "<unprintable>"
+        text = "<unprintable>"
+    return _charge(text, state)
+
+
+def _format_scalar(value: object, depth: int, state: _State) -> str:
+    return _charge(repr(value), state)
+
+
+def _format_str(value: str, depth: int, state: _State) -> str:
+    limit = state.max_str_len
+    if state.remaining < limit:
+        limit = max(state.remaining, 0)
+        state.clipped = state.clipped or len(value) > limit
+    text = repr(value) if len(value) <= limit else repr(value[:limit] + "…")
+    state.remaining -= len(text)
+    return text
 
 
-def _format_str(value: str) -> str:
-    if len(value) <= MAX_STR_LEN:
-        return repr(value)
-    truncated = value[:MAX_STR_LEN]
-    return repr(truncated + "…")
+# Stands in for an id absent from _State.seen, where None means "being
+# rendered". Typed as an entry so a lookup needs no Any; its first item is
+# never a formatted value.
+_UNSEEN: tuple[object, int, str] = (object(), -1, "")
 
 
-def _format_mapping(value: Mapping[Any, Any], depth: int) -> str:
+def _tracked(render: _Formatter, cycle: Callable[[Any], str]) -> _Formatter:
+    """
+    Wrap a container formatter with cycle detection and reuse of shared
+    subtrees.
+
+    A container met again inside itself renders as ``cycle(value)`` - ``[...]``
+    and ``{...}``, as :func:`repr` does. A container met again elsewhere at
+    the same depth reuses its last rendering, unless that was cut short by
+    the budget or holds a cycle marker, which depends on where it was met.
+    """
+
+    def formatter(value: object, depth: int, state: _State) -> str:
+        seen = state.seen
+        if seen is None:
+            seen = state.seen = {}
+        key = id(value)
+        entry = seen.get(key, _UNSEEN)
+        if entry is None:
+            state.cycles += 1
+            return _charge(cycle(value), state)
+        if depth + 1 >= state.max_depth:
+            # Nested containers render as "…" here: nothing below can recur,
+            # and there is little to reuse.
+            return render(value, depth, state)
+        if entry is not _UNSEEN and entry[0] is value and entry[1] == depth:
+            text = entry[2]
+            if len(text) <= state.remaining:
+                state.remaining -= len(text)
+                return text
+
+        cycles = state.cycles
+        clipped = state.clipped
+        seen[key] = None
+        try:
+            text = render(value, depth, state)
+        except BaseException:
+            del seen[key]
+            raise
+        if state.clipped or state.cycles != cycles or clipped:
+            del seen[key]
+        else:
+            seen[key] = (value, depth, text)
+        return text
+
+    return formatter
+
+
+def _render_mapping(value: Mapping[Any, Any], depth: int, state: _State) -> str:
+    state.remaining -= 2
     items: list[str] = []
     for i, (k, v) in enumerate(value.items()):
-        if i >= MAX_ITEMS:
+        if i >= state.max_items:
+            items.append("…")
+            break
+        if state.remaining <= 0:
+            state.clipped = True
             items.append("…")
             break
         try:
-            items.append(f"{_format(k, depth + 1)}: {_format(v, depth + 1)}")
+            key = _format(k, depth + 1, state)
+            items.append(f"{key}: {_format(v, depth + 1, state)}")
         except Exception:
             items.append("<unprintable>")
+        state.remaining -= 4
     return "{" + ", ".join(items) + "}"
 
 
-def _format_sequence(value: Iterable[Any], depth: int) -> str:
+def _render_sequence(value: Iterable[Any], depth: int, state: _State) -> str:
+    state.remaining -= 2
     items: list[str] = []
     for i, item in enumerate(value):
-        if i >= MAX_ITEMS:
+        if i >= state.max_items:
+            items.append("…")
+            break
+        if state.remaining <= 0:
+            state.clipped = True
             items.append("…")
             break
         try:
-            items.append(_format(item, depth + 1))
+            items.append(_format(item, depth + 1, state))
         except Exception:
             items.append("<unprintable>")
+        state.remaining -= 2
 
     # set() and frozenset() must not render as {} (indistinguishable from empty dict).
     if not items:
@@ -113,6 +390,105 @@ def _format_sequence(value: Iterable[Any], depth: int) -> str:
     return f"{open_c}{inner}{close_c}"
 
 
+def _sequence_cycle(value: object) -> str:
+    open_c, close_c = _brackets(value)
+    return f"{open_c}...{close_c}"
+
+
+def _format_bytes(value: bytes | bytearray, depth: int, state: _State) -> str:
+    # Short payloads keep their familiar repr; only large ones are summarized.
+    if len(value) <= state.max_str_len:
+        return _format_repr(value, depth, state)
+    return _charge(_summarize_buffer(type(value).__name__, memoryview(value)), state)
+
+
+def _format_memoryview(value: memoryview, depth: int, state: _State) -> str:
+    try:
+        text = _summarize_buffer("memoryview", value)
+    except ValueError:
+        # Operations on a released memoryview raise ValueError.
+        text = "<memoryview released>"
+    return _charge(text, state)
+
+
+def _format_array(value: array[Any], depth: int, state: _State) -> str:
+    if len(value) <= state.max_items:
+        return _format_repr(value, depth, state)
+    return _charge(_summarize_buffer("array", memoryview(value)), state)
+
+
+def _summarize_buffer(name: str, view: memoryview) -> str:
+    """Describe a buffer from its metadata and the first few bytes or items."""
+    parts = [f"<{name} len={len(view)}"]
+    if name in ("memoryview", "array"):
+        parts.append(f"format={view.format!r}")
+    if view.ndim != 1:
+        parts.append(f"shape={view.shape}")
+    if view.nbytes != len(view):
+        parts.append(f"nbytes={view.nbytes}")
+    if view.c_contiguous:
+        parts.append(_buffer_preview(view))
+    return " ".join(parts) + ">"
+
+
+def _buffer_preview(view: memoryview) -> str:
+    if view.format in ("B", "b", "c") and view.ndim == 1:
+        head = view[:_PREVIEW_BYTES]
+        raw = bytes(head)
+        ascii_text = "".join(chr(b) if 32 <= b < 127 else "." for b in raw)
+        more = " …" if view.nbytes > _PREVIEW_BYTES else ""
+        return f"hex={head.hex(' ')}{more} ascii={ascii_text!r}"
+
+    count = _PREVIEW_BYTES // max(view.itemsize, 1) or 1
+    # Any: cast() is typed per literal format code; this one is only known
+    # at runtime and is rejected by cast() itself if unsupported.
+    item_format: Any = view.format
+    try:
+        flat = view.cast("B").cast(item_format) if view.ndim != 1 else view
+        items = flat[:count].tolist()
+    except (TypeError, ValueError, NotImplementedError):
+        # Formats memoryview cannot unpack (e.g. struct-style or non-native).
+        more = " …" if view.nbytes > _PREVIEW_BYTES else ""
+        return f"hex={view.cast('B')[:_PREVIEW_BYTES].hex(' ')}{more}"
+    more = ", …" if len(flat) > count else ""
+    return f"head=[{', '.join(map(repr, items))}{more}]"
+
+
+def _format_array_like(value: object, depth: int, state: _State) -> str:
+    """Summarize numpy-style arrays without calling their (possibly huge) repr."""
+    array: Any = value  # duck-typed: shape, dtype, and the buffer protocol
+    try:
+        interface = getattr(value, "__array_interface__", None)
+        if isinstance(interface, dict):
+            shape = tuple(interface.get("shape", ()))
+            dtype = getattr(value, "dtype", None)
+            if dtype is None:
+                dtype = interface.get("typestr")
+        else:
+            shape = tuple(array.shape)
+            dtype = array.dtype
+        size = 1
+        for dim in shape:
+            size *= int(dim)
+    except Exception:
+        return _format_repr(value, depth, state)
+
+    if size <= state.max_items:
+        return _format_repr(value, depth, state)
+
+    text = f"<{type(value).__name__} shape={shape} dtype={dtype}"
+    try:
+        view = memoryview(array)
+    except Exception:
+        # Not a buffer, or an exporter that refuses (e.g. ValueError for
+        # object dtypes or BufferError).
+        view = None
+    if view is not None and view.c_contiguous:
+        with contextlib.suppress(Exception):
+            text += " " + _buffer_preview(view)
+    return _charge(text + ">", state)
+
+
 def _brackets(value: Any) -> tuple[str, str]:
     if isinstance(value, list):
         return "[", "]"
@@ -121,3 +497,135 @@ def _brackets(value: Any) -> tuple[str, str]:
     if isinstance(value, frozenset):
         return "frozenset({", "})"
     return "{", "}"
+
+
+# ---------------------------------------------------------------------------
+# Type dispatch
+# ---------------------------------------------------------------------------
+
+_Formatter = Callable[[Any, int, _State], str]
+
+_format_mapping = _tracked(_render_mapping, lambda value: "{...}")
+_format_sequence = _tracked(_render_sequence, _sequence_cycle)
+
+# Exact-type entries. Subclasses are resolved by _resolve() with the same
+# precedence the original isinstance chain used, then cached by type.
+_BUILTIN: dict[type, _Formatter] = {
+    type(None): _format_scalar,
+    bool: _format_scalar,
+    int: _format_scalar,
+    float: _format_scalar,
+    str: _format_str,
+    dict: _format_mapping,
+    # Exact list/tuple only: subclasses (e.g. namedtuples) fall through to
+    # repr() and keep their class name.
+    list: _format_sequence,
+    tuple: _format_sequence,
+    set: _format_sequence,
+    frozenset: _format_sequence,
+    bytes: _format_bytes,
+    bytearray: _format_bytes,
+    memoryview: _format_memoryview,
+}
+
+# Resolution cache bound. Reaching it resets the table to the registered
+# entries; only code that creates classes dynamically gets near it.
+_MAX_RESOLVED = 1024
+
+_user_formatters: dict[type, Callable[[Any], str]] = {}
+_dispatch: dict[type, _Formatter] = dict(_BUILTIN)
+
+
+def register_formatter(tp: type, func: Callable[[Any], str]) -> None:
+    """
+    Format instances of *tp* (and its subclasses) with *func*.
+
+    *func* receives the value and returns its rendering. It takes precedence
+    over the built-in handling, including for built-in types. An exception
+    raised by *func* renders the value as ``<unprintable>``. The result is
+    truncated if it exceeds what is left of the call's character budget.
+    """
+    _user_formatters[tp] = func
+    _rebuild_dispatch()
+
+
+def unregister_formatter(tp: type) -> None:
+    """Remove the formatter registered for *tp*. Unknown types are ignored."""
+    _user_formatters.pop(tp, None)
+    _rebuild_dispatch()
+
+
+def _rebuild_dispatch() -> None:
+    global _dispatch
+
+    # A registration covers subclasses, so it also displaces the exact
+    # built-in entries below it (e.g. bool under int); _resolve() then finds
+    # it through the MRO.
+    registered = tuple(_user_formatters)
+    table = {
+        tp: formatter
+        for tp, formatter in _BUILTIN.items()
+        if not issubclass(tp, registered)
+    }
+    for tp, func in _user_formatters.items():
+        table[tp] = _wrap_user(func)
+    # Swap in a whole new table so concurrent lookups never see it half-built.
+    _dispatch = table
+    # Cached renderings may have come from a formatter that just changed.
+    _memo.clear_active_cache()
+
+
+def _wrap_user(func: Callable[[Any], str]) -> _Formatter:
+    def formatter(value: object, depth: int, state: _State) -> str:
+        try:
+            text = func(value)
+        except Exception:
+            text = "<unprintable>"
+        return _charge(text, state)
+
+    return formatter
+
+
+def _is_array_type(tp: type) -> bool:
+    # An array.array instance means the array module is loaded; it is never
+    # imported here. Resolved once per type, then served from the dispatch.
+    module = sys.modules.get("array")
+    return module is not None and issubclass(tp, module.array)
+
+
+def _resolve(tp: type) -> _Formatter:
+    """Pick and cache the formatter for a type with no exact entry."""
+    formatter: _Formatter | None = None
+    for base in tp.__mro__:
+        func = _user_formatters.get(base)
+        if func is not None:
+            formatter = _wrap_user(func)
+            break
+
+    if formatter is None:
+        if issubclass(tp, (bool, int, float)):
+            formatter = _format_scalar
+        elif issubclass(tp, str):
+            formatter = _format_str
+        # Check Mapping before the set types; mappings are also iterable.
+        elif issubclass(tp, Mapping):
+            formatter = _format_mapping
+        elif issubclass(tp, (set, frozenset)):
+            formatter = _format_sequence
+        elif issubclass(tp, (bytes, bytearray)):
+            formatter = _format_bytes
+        elif _is_array_type(tp):
+            formatter = _format_array
+        elif hasattr(tp, "__array_interface__") or (
+            hasattr(tp, "shape") and hasattr(tp, "dtype")
+        ):
+            formatter = _format_array_like
+        else:
+            formatter = _format_repr
+
+    table = _dispatch
+    if len(table) >= _MAX_RESOLVED:
+        _rebuild_dispatch()
+        table = _dispatch
+    table[tp] = formatter
+    return formatter
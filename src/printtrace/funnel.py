@@ -0,0 +1,205 @@
+"""
+Multi-process output funnel for printtrace.
+
+Each process has its own output lock, so lines written by several processes
+to a shared stdout can interleave and tear. With the funnel started in the
+parent, child processes do not write ``sys.stdout`` or ``sys.stderr``
+themselves: they send each finished record over a ``multiprocessing``
+queue, and a collector thread in the parent writes them - under the
+parent's output lock, in the order they arrive - to the parent's stream.
+
+Children created with ``fork`` are attached automatically. Children
+started with ``spawn`` or ``forkserver`` attach through a pool
+initializer::
+
+    funnel = start_process_funnel()
+    with ProcessPoolExecutor(
+        initializer=attach_funnel, initargs=(funnel.queue,)
+    ) as pool:
+        ...
+
+Constraints:
+- only ``sys.stdout`` and ``sys.stderr`` are funnelled; any other stream
+  is written by the child directly, as before
+- the child side is installed as the background writer, so it shares that
+  registry and the emit path is unchanged
+- ``multiprocessing`` is imported only when the funnel is started
+"""
+
+from __future__ import annotations
+
+import atexit
+import os
+import sys
+import threading
+from typing import TYPE_CHECKING, TextIO
+
+from . import writer as _writer
+from .writer import _write_batch
+
+if TYPE_CHECKING:
+    from multiprocessing.context import BaseContext
+    from multiprocessing.queues import Queue
+
+    # A record is (stream tag, text); None tells the collector to stop.
+    _RecordQueue = Queue[tuple[int, str] | None]
+
+_STDOUT = 0
+_STDERR = 1
+
+# Records taken from the queue per write batch, at most.
+_MAX_BATCH = 1024
+
+DEFAULT_STOP_TIMEOUT = 5.0
+
+__all__ = ["Funnel", "attach_funnel", "start_process_funnel", "stop_process_funnel"]
+
+
+class Funnel:
+    """
+    The parent's end of the funnel: a queue and the thread draining it.
+
+    Parameters
+    ----------
+    context:
+        ``multiprocessing`` context used to create the queue. Defaults to
+        the global context.
+    """
+
+    def __init__(self, context: BaseContext | None = None) -> None:
+        self.queue: _RecordQueue
+        if context is None:
+            import multiprocessing
+
+            self.queue = multiprocessing.Queue()
+        else:
+            self.queue = context.Queue()
+        self.pid = os.getpid()
+        self._thread = threading.Thread(
+            target=self._run, name="printtrace-funnel", daemon=True
+        )
+        self._thread.start()
+
+    def close(self, timeout: float | None = DEFAULT_STOP_TIMEOUT) -> bool:
+        """
+        Write what has arrived so far and stop the collector.
+
+        Returns ``False`` if the collector did not finish within *timeout*.
+        """
+        self.queue.put(None)
+        self._thread.join(timeout)
+        return not self._thread.is_alive()
+
+    def _run(self) -> None:
+        get = self.queue.get
+        while True:
+            try:
+                items = [get()]
+                while items[-1] is not None and len(items) < _MAX_BATCH:
+                    if self.queue.empty():
+                        break
+                    items.append(get())
+            except (EOFError, OSError):
+                return
+
+            batch = []
+            for item in items:
+                if item is None:
+                    break
+                tag, text = item
+                stream = sys.stdout if tag == _STDOUT else sys.stderr
+                batch.append((stream, text, 0))
+            _write_batch(batch)
+            if items[-1] is None:
+                return
+
+
+class _FunnelSender:
+    """Background writer of a child process: sends records to the parent."""
+
+    def __init__(self, queue: _RecordQueue) -> None:
+        self._queue = queue
+
+    def submit(self, stream: TextIO, text: str) -> bool:
+        if stream is sys.stdout:
+            tag = _STDOUT
+        elif stream is sys.stderr:
+            tag = _STDERR
+        else:
+            return False
+        try:
+            self._queue.put((tag, text))
+        except Exception:
+            # Queue closed or broken: the caller writes the record itself.
+            return False
+        return True
+
+    def flush(self, timeout: float | None = None) -> bool:
+        return True
+
+    def close(self, timeout: float | None = None) -> bool:
+        return True
+
+
+_funnel: Funnel | None = None
+_control_lock = threading.Lock()
+_atexit_registered = False
+
+
+def start_process_funnel(*, context: BaseContext | None = None) -> Funnel:
+    """
+    Collect the stdout and stderr records of child processes in this one.
+
+    Replaces any funnel already running. The collector is stopped at
+    interpreter exit, after writing what has arrived.
+    """
+    global _funnel, _atexit_registered
+
+    new = Funnel(context)
+    with _control_lock:
+        old, _funnel = _funnel, new
+        if not _atexit_registered:
+            atexit.register(stop_process_funnel)
+            _atexit_registered = True
+    if old is not None:
+        old.close()
+    return new
+
+
+def stop_process_funnel(timeout: float | None = DEFAULT_STOP_TIMEOUT) -> bool:
+    """
+    Stop collecting child records.
+
+    Returns ``False`` if the collector could not finish within *timeout*.
+    """
+    global _funnel
+
+    with _control_lock:
+        old, _funnel = _funnel, None
+    if old is None:
+        return True
+    return old.close(timeout)
+
+
+def attach_funnel(queue: _RecordQueue) -> None:
+    """
+    Send this process's stdout and stderr records to the funnel's *queue*.
+
+    For ``spawn`` and ``forkserver`` children, pass as a pool
+    ``initializer`` with ``initargs=(funnel.queue,)``.
+    """
+    _writer._active = _FunnelSender(queue)
+
+
+def _reinit_after_fork() -> None:
+    global _funnel, _control_lock
+
+    _control_lock = threading.Lock()
+    funnel, _funnel = _funnel, None
+    # Runs after the writer's own fork hook has reset it to synchronous.
+    if funnel is not None:
+        attach_funnel(funnel.queue)
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reinit_after_fork)
@@ -0,0 +1,295 @@
+"""
+Hot call-site profiler for printtrace.
+
+With the profiler enabled, every emitted call is attributed to its call
+site - ``file:line in function`` - and counted: calls, length of text
+produced, and nanoseconds spent formatting. :func:`hotspots` returns the
+sites ranked by total formatting time, call count, or text length, and
+:func:`report_hotspots` prints the top of that ranking::
+
+    [printtrace] hot call sites, top 3 by time
+         calls        text  format ms  mean us  site
+       120,341   9,514,210     812.40     6.75  worker.py:42 in poll
+         4,102   1,211,834     301.22    73.43  api.py:88 in handle
+            12       1,904       0.31    25.83  main.py:10 in <module>
+
+The report is printed at interpreter exit, and - if a signal was given to
+:func:`enable_hotspots` - whenever that signal arrives.
+
+Constraints:
+- each thread aggregates into its own table, so profiling adds no lock to
+  the emit path; tables are merged when a report is taken
+- sites are keyed by ``(code object, line)`` and rendered only for reports
+- the signal handler starts a thread to print the report: the report takes
+  the output lock, which the interrupted thread may be holding
+"""
+
+from __future__ import annotations
+
+import atexit
+import contextlib
+import os
+import sys
+import threading
+from types import CodeType
+from typing import Literal, NamedTuple, TextIO
+
+from . import counters
+from .context import _shorten_filename
+from .counters import Recorder, ThreadTables
+from .writer import write_notice
+
+DEFAULT_TOP = 20
+
+SortKey = Literal["time", "calls", "text"]
+_SORT_KEYS: frozenset[str] = frozenset({"time", "calls", "text"})
+
+_Site = tuple[CodeType, int]
+
+__all__ = [
+    "Hotspot",
+    "disable_hotspots",
+    "enable_hotspots",
+    "hotspots",
+    "report_hotspots",
+]
+
+
+class Hotspot(NamedTuple):
+    """Totals for one call site."""
+
+    filename: str
+    lineno: int
+    function: str
+    calls: int
+    text: int
+    format_ns: int
+
+    @property
+    def mean_format_ns(self) -> float:
+        return self.format_ns / self.calls if self.calls else 0.0
+
+
+class _Profiler(Recorder):
+    wants_site = True
+
+    def __init__(self, top: int, file: TextIO | None) -> None:
+        # Per thread: site -> [calls, text, format_ns]
+        self.tables: ThreadTables[dict[_Site, list[int]]] = ThreadTables(dict)
+        self.top = top
+        self.file = file
+
+    def record_call(
+        self,
+        mode: str,
+        site: _Site | None,
+        length: int,
+        context_ns: int,
+        format_ns: int,
+    ) -> None:
+        if site is None:
+            return
+        table = self.tables.get()
+        entry = table.get(site)
+        if entry is None:
+            table[site] = [1, length, format_ns]
+        else:
+            entry[0] += 1
+            entry[1] += length
+            entry[2] += format_ns
+
+    def merged(self) -> dict[_Site, list[int]]:
+        totals: dict[_Site, list[int]] = {}
+        for table in self.tables.all():
+            for site, entry in list(table.items()):
+                calls, text, format_ns = entry
+                total = totals.get(site)
+                if total is None:
+                    totals[site] = [calls, text, format_ns]
+                else:
+                    total[0] += calls
+                    total[1] += text
+                    total[2] += format_ns
+        return totals
+
+
+_profiler: _Profiler | None = None
+_previous_handler: object = None
+_signal_number: int | None = None
+_atexit_registered = False
+
+
+def _validate_sort(by: str) -> str:
+    if by not in _SORT_KEYS:
+        raise ValueError(
+            f"Invalid printtrace hotspot sort key {by!r}. "
+            f"Expected one of: {sorted(_SORT_KEYS)}."
+        )
+    return by
+
+
+def enable_hotspots(
+    *,
+    top: int = DEFAULT_TOP,
+    file: TextIO | None = None,
+    report_signal: int | None = None,
+) -> None:
+    """
+    Start attributing emitted calls to their call sites.
+
+    Replaces any profile already running, discarding its totals.
+
+    Parameters
+    ----------
+    top:
+        Number of sites in the reports printed at exit and on signal.
+    file:
+        Stream the reports go to. ``None`` means ``sys.stderr`` as it is at
+        the time of the report.
+    report_signal:
+        Signal that prints a report, e.g. ``signal.SIGUSR1``. Must be called
+        from the main thread to install it. ``None`` installs no handler.
+
+    Raises
+    ------
+    ValueError
+        If *top* is less than 1.
+    """
+    global _profiler, _atexit_registered
+
+    if top < 1:
+        raise ValueError(f"top must be >= 1, got {top}.")
+    _restore_signal()
+    _profiler = _Profiler(top, file)
+    counters.set_profiler(_profiler)
+    if report_signal is not None:
+        _install_signal(report_signal)
+    if not _atexit_registered:
+        atexit.register(_report_at_exit)
+        _atexit_registered = True
+
+
+def disable_hotspots() -> None:
+    """Stop profiling, discard the totals, and remove the signal handler."""
+    global _profiler
+
+    _restore_signal()
+    _profiler = None
+    counters.set_profiler(None)
+
+
+def hotspots(top: int | None = None, by: SortKey = "time") -> list[Hotspot]:
+    """
+    Call sites ranked by *by*, highest first; empty if not profiling.
+
+    Parameters
+    ----------
+    top:
+        Return at most this many sites. ``None`` returns all of them.
+    by:
+        ``"time"`` (total formatting time, default), ``"calls"``, or
+        ``"text"`` (total length of text produced).
+
+    Raises
+    ------
+    ValueError
+        If *by* is not a valid sort key.
+    """
+    column = ("calls", "text", "time").index(_validate_sort(by))
+    profiler = _profiler
+    if profiler is None:
+        return []
+    ranked = sorted(
+        profiler.merged().items(), key=lambda item: item[1][column], reverse=True
+    )
+    if top is not None:
+        ranked = ranked[:top]
+    return [
+        Hotspot(
+            _shorten_filename(code.co_filename),
+            lineno,
+            code.co_name,
+            calls,
+            text,
+            format_ns,
+        )
+        for (code, lineno), (calls, text, format_ns) in ranked
+    ]
+
+
+def report_hotspots(
+    top: int | None = None,
+    by: SortKey = "time",
+    file: TextIO | None = None,
+) -> None:
+    """
+    Print the top call sites as a table.
+
+    *top* and *file* default to the values given to :func:`enable_hotspots`.
+    Prints nothing if not profiling.
+    """
+    profiler = _profiler
+    if profiler is None:
+        return
+    if top is None:
+        top = profiler.top
+    rows = hotspots(top, by)
+    out = file or profiler.file or sys.stderr
+    lines = [
+        f"[printtrace] hot call sites, top {len(rows)} by {by}",
+        f"{'calls':>10} {'text':>11} {'format ms':>10} {'mean us':>8}  site",
+    ]
+    for row in rows:
+        lines.append(
+            f"{row.calls:>10,} {row.text:>11,} {row.format_ns / 1e6:>10.2f} "
+            f"{row.mean_format_ns / 1e3:>8.2f}  "
+            f"{row.filename}:{row.lineno} in {row.function}"
+        )
+    write_notice(out, "\n".join(lines) + "\n")
+
+
+def _report_at_exit() -> None:
+    profiler = _profiler
+    if profiler is not None and profiler.merged():
+        report_hotspots()
+
+
+def _on_signal(signum: int, frame: object) -> None:
+    # The interrupted thread may hold the output lock or be mid-write.
+    threading.Thread(
+        target=report_hotspots, name="printtrace-hotspots", daemon=True
+    ).start()
+
+
+def _install_signal(signum: int) -> None:
+    global _previous_handler, _signal_number
+
+    import signal
+
+    _previous_handler = signal.signal(signum, _on_signal)
+    _signal_number = signum
+
+
+def _restore_signal() -> None:
+    global _previous_handler, _signal_number
+
+    if _signal_number is None:
+        return
+    import signal
+
+    with contextlib.suppress(ValueError, TypeError):
+        signal.signal(_signal_number, _previous_handler)  # type: ignore[arg-type]
+    _previous_handler = _signal_number = None
+
+
+def _reinit_after_fork() -> None:
+    # A child profiles its own calls from zero, with the same settings.
+    global _profiler
+
+    if _profiler is not None:
+        _profiler = _Profiler(_profiler.top, _profiler.file)
+        counters.set_profiler(_profiler)
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reinit_after_fork)
@@ -0,0 +1,56 @@
+"""
+Trace levels for printtrace.
+
+Levels are plain integers using the same values as :mod:`logging`, so a
+threshold reads the same in both. A call is emitted when its level is at
+least the tracer's threshold; the default threshold of ``0`` emits
+everything.
+"""
+
+from __future__ import annotations
+
+import os
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+
+_NAMES: dict[str, int] = {
+    "debug": DEBUG,
+    "info": INFO,
+    "warning": WARNING,
+    "error": ERROR,
+}
+
+_ENV_VAR = "PRINTTRACE_LEVEL"
+_DEFAULT_THRESHOLD = 0
+
+__all__ = ["DEBUG", "INFO", "WARNING", "ERROR", "resolve_level"]
+
+
+def resolve_level(level: int | str | None) -> int:
+    """Return the effective threshold, or raise ValueError if unrecognised.
+
+    Resolution order: explicit argument → PRINTTRACE_LEVEL env var → 0.
+    Accepts an integer, a decimal string, or a level name (case-insensitive).
+    """
+    if level is None:
+        env = os.getenv(_ENV_VAR)
+        if env is None:
+            return _DEFAULT_THRESHOLD
+        level = env
+
+    if isinstance(level, int):
+        return level
+
+    named = _NAMES.get(level.strip().lower())
+    if named is not None:
+        return named
+    try:
+        return int(level)
+    except ValueError:
+        raise ValueError(
+            f"Invalid printtrace level {level!r}. "
+            f"Expected an integer or one of: {sorted(_NAMES)}."
+        ) from None
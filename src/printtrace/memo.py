@@ -0,0 +1,279 @@
+"""
+Opt-in memoization of formatted immutable values.
+
+Traces often print the same constants over and over: config tuples, enum
+members, frozensets, long literal strings. With the cache enabled,
+:func:`~printtrace.formatting.format_value` serves their rendering from a
+size-bounded LRU table instead of formatting them again.
+
+What is cached, and how it is matched:
+
+- ``str`` and ``bytes`` of ``_MIN_CACHED_LEN`` to ``_MAX_CACHED_LEN``
+  characters - by value. Longer payloads would be hashed in full on every
+  lookup, which costs more than the bounded rendering it saves.
+- enum members whose value is itself immutable - by class and name, so a
+  member with an unhashable mixin (``class L(list, Enum)``) is keyed too.
+- ``tuple`` and ``frozenset`` containing only immutable values, at any
+  depth - by identity, so the same object hits and an equal copy misses.
+  The entry keeps the object alive, and its approximate size counts against
+  the cache's byte ceiling.
+
+Anything mutable - lists, dicts, sets, arbitrary objects, or an immutable
+container holding one - is never cached, so a cached rendering can never go
+stale. Only top-level values are looked up; nested values are formatted as
+part of their container.
+
+Constraints:
+- disabled by default; the disabled cost is one global read per value
+- no imports from formatting, context, or api
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import threading
+from collections import OrderedDict
+from collections.abc import Iterable
+from enum import Enum, EnumMeta
+from typing import NamedTuple, cast
+
+DEFAULT_MAX_ENTRIES = 1024
+DEFAULT_MAX_BYTES = 1 << 20
+
+# Shorter strings are cheaper to re-format than to look up.
+_MIN_CACHED_LEN = 32
+_MAX_CACHED_LEN = 4096
+
+# Deep-immutability checks give up (and decline to cache) past this many
+# nodes, so a huge tuple costs one bounded walk rather than a full one.
+_MAX_CHECKED_NODES = 1000
+
+# Rough per-entry bookkeeping cost, counted against max_bytes.
+_ENTRY_OVERHEAD = 100
+
+_IMMUTABLE_SCALARS: frozenset[type] = frozenset(
+    {type(None), bool, int, float, complex, str, bytes}
+)
+
+_IDENTITY = object()
+
+_Entry = tuple[object, "str | None", int]
+# (type or _IDENTITY, value or member name or id(), format limits)
+_Key = tuple[object, object, tuple[int, ...]]
+
+__all__ = [
+    "CacheStats",
+    "FormatCache",
+    "disable_format_cache",
+    "enable_format_cache",
+    "format_cache_stats",
+]
+
+
+class CacheStats(NamedTuple):
+    """Counters for the format cache. ``size`` is approximate, in bytes."""
+
+    hits: int
+    misses: int
+    evictions: int
+    entries: int
+    size: int
+
+
+class FormatCache:
+    """
+    LRU cache of formatted values, bounded by entry count and approximate size.
+
+    Thread-safe. Values that turn out to contain something mutable are
+    remembered as uncacheable so they are not re-checked on every call. They
+    are remembered by key only: the entry does not keep them alive.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+    ) -> None:
+        if max_entries < 1:
+            raise ValueError(f"max_entries must be >= 1, got {max_entries}.")
+        if max_bytes < 1:
+            raise ValueError(f"max_bytes must be >= 1, got {max_bytes}.")
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+
+        # key -> (anchor, text or None for "not cacheable", size)
+        self._entries: OrderedDict[_Key, _Entry] = OrderedDict()
+        self._lock = threading.Lock()
+        self._size = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    @staticmethod
+    def key_for(value: object, limits: tuple[int, ...]) -> _Key | None:
+        """Return the cache key for *value*, or ``None`` if it is never cached."""
+        tp = type(value)
+        if tp is str or tp is bytes:
+            size = len(value)  # type: ignore[arg-type]
+            if size < _MIN_CACHED_LEN or size > _MAX_CACHED_LEN:
+                return None
+            return (tp, value, limits)
+        if tp is tuple or tp is frozenset:
+            return (_IDENTITY, id(value), limits)
+        if isinstance(tp, EnumMeta):
+            # Not the member itself: a mixin such as list makes it unhashable.
+            return (tp, cast(Enum, value)._name_, limits)
+        return None
+
+    def lookup(self, key: _Key, value: object) -> tuple[bool, str | None]:
+        """
+        Return ``(found, text)``.
+
+        ``found`` with ``text=None`` means *value* is known to be uncacheable.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            # An uncacheable identity entry holds no object to compare; if its
+            # id() was reused, the newcomer is merely formatted uncached.
+            if entry is not None and (
+                key[0] is not _IDENTITY or entry[0] is value or entry[1] is None
+            ):
+                self._entries.move_to_end(key)
+                if entry[1] is not None:
+                    self._hits += 1
+                return True, entry[1]
+            self._misses += 1
+            return False, None
+
+    def store(self, key: _Key, value: object, text: str) -> None:
+        """Cache *text* as the rendering of *value*, if *value* is immutable."""
+        footprint = _immutable_size(value)
+        anchor: object = None
+        stored = None
+        size = _ENTRY_OVERHEAD
+        if footprint is not None:
+            anchor = value
+            stored = text
+            size += len(text)
+            if key[0] is _IDENTITY:
+                size += footprint
+            elif isinstance(key[1], (str, bytes)):
+                size += len(key[1])
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= old[2]
+            # Cacheable identity entries keep their object alive, so its id()
+            # cannot be reused by a different object while the entry exists.
+            self._entries[key] = (anchor, stored, size)
+            self._size += size
+            entries = self._entries
+            while len(entries) > self.max_entries or self._size > self.max_bytes:
+                _, (_, _, evicted) = entries.popitem(last=False)
+                self._size -= evicted
+                self._evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            return CacheStats(
+                hits=self._hits,
+                misses=self._misses,
+                evictions=self._evictions,
+                entries=len(self._entries),
+                size=self._size,
+            )
+
+
+def _immutable_size(value: object) -> int | None:
+    """
+    Approximate bytes held by *value*, or ``None`` if it may be mutable.
+
+    Shared members are counted once per reference, so this errs high.
+    """
+    stack = [value]
+    seen = 0
+    size = 0
+    while stack:
+        item = stack.pop()
+        seen += 1
+        if seen > _MAX_CHECKED_NODES:
+            return None
+        tp = type(item)
+        if tp in _IMMUTABLE_SCALARS:
+            size += sys.getsizeof(item)
+            continue
+        if tp is tuple or tp is frozenset:
+            size += sys.getsizeof(item)
+            stack.extend(cast(Iterable[object], item))
+            continue
+        if isinstance(item, Enum):
+            # The member's repr includes its value.
+            stack.append(item.value)
+            continue
+        return None
+    return size
+
+
+# Read directly by formatting.format_value(); None means disabled.
+_active: FormatCache | None = None
+
+
+def enable_format_cache(
+    *,
+    max_entries: int = DEFAULT_MAX_ENTRIES,
+    max_bytes: int = DEFAULT_MAX_BYTES,
+) -> FormatCache:
+    """
+    Start memoizing formatted immutable values. Replaces any existing cache.
+
+    Raises
+    ------
+    ValueError
+        If *max_entries* or *max_bytes* is less than 1.
+    """
+    global _active
+
+    _active = FormatCache(max_entries=max_entries, max_bytes=max_bytes)
+    return _active
+
+
+def disable_format_cache() -> None:
+    """Stop memoizing and drop all cached renderings."""
+    global _active
+
+    _active = None
+
+
+def format_cache_stats() -> CacheStats:
+    """Counters for the active cache, or all zeros if caching is disabled."""
+    cache = _active
+    if cache is None:
+        return CacheStats(0, 0, 0, 0, 0)
+    return cache.stats()
+
+
+def _reinit_after_fork() -> None:
+    # The lock may have been held by another thread at the fork.
+    cache = _active
+    if cache is not None:
+        cache._lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reinit_after_fork)
+
+
+def clear_active_cache() -> None:
+    """Drop cached renderings, e.g. after the formatter registry changes."""
+    cache = _active
+    if cache is not None:
+        cache.clear()
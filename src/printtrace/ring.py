@@ -0,0 +1,230 @@
+"""
+Memory-mapped flight recorder for printtrace.
+
+A :class:`RingSink` is a file-like object backed by a fixed-size ``mmap``
+of a file. Pass it as ``file=`` and each trace record is copied into the
+mapping and a head pointer advanced - no flush, no system call per record.
+When the ring is full the oldest records are overwritten.
+
+Because the mapping is shared with the file, records already copied survive
+the process dying - ``SIGKILL``, a segfault, an abort - and can be read back
+afterwards with :func:`read_ring` or::
+
+    python -m printtrace ring trace.ring -n 100
+
+They do not survive a kernel crash or power loss unless the mapping was
+flushed with :meth:`RingSink.flush_to_disk`.
+
+Layout
+------
+A 64-byte header - magic, capacity, head, record count - followed by
+``capacity`` bytes of ring. ``head`` is the total number of bytes ever
+written; a record's position in the ring is its offset modulo capacity.
+Each record is framed as ``<I length, UTF-8 text, <I length``, so a reader
+walks backwards from the head. The head is published after the record is
+copied: a write interrupted part-way is simply not part of the ring.
+
+Constraints:
+- ``write()`` runs under ``output_lock()`` when called by a tracer, so it
+  must not take that lock itself
+- a forked child gets fresh sink locks; parent and child then share the
+  mapping, so a child should open its own ring rather than write to the
+  parent's
+- no imports from api or tracer
+"""
+
+from __future__ import annotations
+
+import mmap
+import os
+import struct
+import threading
+import weakref
+from types import TracebackType
+
+MAGIC = b"PTRING1\x00"
+HEADER_SIZE = 64
+DEFAULT_SIZE = 1 << 20
+MIN_SIZE = 4096
+
+_HEADER = struct.Struct("<8sQQQ")
+# head and record count, published together after each record.
+_HEAD = struct.Struct("<QQ")
+_HEAD_OFFSET = 16
+_LEN = struct.Struct("<I")
+_FRAME_OVERHEAD = 2 * _LEN.size
+
+__all__ = ["RingSink", "read_ring"]
+
+# Open sinks, so their locks can be replaced in a forked child.
+_sinks: weakref.WeakSet[RingSink] = weakref.WeakSet()
+
+
+class RingSink:
+    """
+    File-like sink that keeps the most recent trace records in an mmap ring.
+
+    An existing ring file of the same size is reopened and appended to, so
+    records from earlier runs stay readable until overwritten; a file with a
+    different size or no valid header is reinitialised.
+
+    Parameters
+    ----------
+    path:
+        Ring file to create or reuse.
+    size:
+        Ring capacity in bytes, excluding the header. A record longer than
+        the capacity is truncated to fit.
+
+    Raises
+    ------
+    ValueError
+        If *size* is less than ``MIN_SIZE``.
+    """
+
+    def __init__(self, path: str | os.PathLike[str], size: int = DEFAULT_SIZE) -> None:
+        if size < MIN_SIZE:
+            raise ValueError(f"size must be >= {MIN_SIZE}, got {size}.")
+        self.path = os.fspath(path)
+        self.capacity = size
+
+        total = HEADER_SIZE + size
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if os.fstat(fd).st_size != total:
+                os.ftruncate(fd, total)
+            self._map = mmap.mmap(fd, total)
+        finally:
+            os.close(fd)
+
+        magic, capacity, head, count = _HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or capacity != size:
+            head = count = 0
+            _HEADER.pack_into(self._map, 0, MAGIC, size, head, count)
+        self._head: int = head
+        self._count: int = count
+        self._lock = threading.Lock()
+        self._closed = False
+        _sinks.add(self)
+
+    def write(self, text: str) -> int:
+        """Copy *text* into the ring as one record. Returns ``len(text)``."""
+        data = text.encode("utf-8", "surrogatepass")
+        limit = self.capacity - _FRAME_OVERHEAD
+        if len(data) > limit:
+            data = data[:limit]
+        length = _LEN.pack(len(data))
+        frame = length + data + length
+
+        with self._lock:
+            if self._closed:
+                raise ValueError("write to closed RingSink")
+            head = self._head
+            self._copy(head, frame)
+            self._head = head = head + len(frame)
+            self._count += 1
+            _HEAD.pack_into(self._map, _HEAD_OFFSET, head, self._count)
+        return len(text)
+
+    def flush(self) -> None:
+        """No-op: records are visible in the file as soon as they are written."""
+
+    def flush_to_disk(self) -> None:
+        """Force the mapping to stable storage (``msync``)."""
+        with self._lock:
+            if not self._closed:
+                self._map.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            if not self._closed:
+                self._closed = True
+                self._map.close()
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def __enter__(self) -> RingSink:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        self.close()
+
+    def __repr__(self) -> str:
+        return f"RingSink({self.path!r}, size={self.capacity})"
+
+    def _copy(self, position: int, frame: bytes) -> None:
+        capacity = self.capacity
+        offset = position % capacity
+        first = min(len(frame), capacity - offset)
+        start = HEADER_SIZE + offset
+        self._map[start : start + first] = frame[:first]
+        if first < len(frame):
+            rest = len(frame) - first
+            self._map[HEADER_SIZE : HEADER_SIZE + rest] = frame[first:]
+
+
+def _reinit_after_fork() -> None:
+    for sink in list(_sinks):
+        sink._lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reinit_after_fork)
+
+
+def read_ring(path: str | os.PathLike[str], last: int | None = None) -> list[str]:
+    """
+    Return the records in a ring file, oldest first.
+
+    Parameters
+    ----------
+    path:
+        A file written by :class:`RingSink`. The writing process may still be
+        running, or may have died.
+    last:
+        Return at most this many of the most recent records.
+
+    Raises
+    ------
+    ValueError
+        If *path* is not a printtrace ring file.
+    """
+    with open(path, "rb") as stream:
+        data = stream.read()
+    if len(data) < HEADER_SIZE:
+        raise ValueError("Not a printtrace ring file: too short.")
+    magic, capacity, head, _ = _HEADER.unpack_from(data, 0)
+    if magic != MAGIC or not capacity or len(data) < HEADER_SIZE + capacity:
+        raise ValueError("Not a printtrace ring file: bad header.")
+    ring = data[HEADER_SIZE : HEADER_SIZE + capacity]
+
+    def read(position: int, size: int) -> bytes:
+        offset = position % capacity
+        chunk = ring[offset : offset + size]
+        if len(chunk) < size:
+            chunk += ring[: size - len(chunk)]
+        return chunk
+
+    records: list[str] = []
+    position = head
+    while position >= _FRAME_OVERHEAD and (last is None or len(records) < last):
+        (size,) = _LEN.unpack(read(position - _LEN.size, _LEN.size))
+        start = position - _FRAME_OVERHEAD - size
+        # Stop at the first record that has been (partly) overwritten.
+        if start < 0 or head - start > capacity:
+            break
+        (leading,) = _LEN.unpack(read(start, _LEN.size))
+        if leading != size:
+            break
+        payload = read(start + _LEN.size, size)
+        records.append(payload.decode("utf-8", "replace"))
+        position = start
+    records.reverse()
+    return records
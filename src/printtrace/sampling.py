@@ -0,0 +1,294 @@
+"""
+Per-call-site sampling and rate limiting for printtrace.
+
+A sampling policy decides, for each call, whether it is emitted. State is
+kept per call site - per ``(code object, line)`` - so a loop that calls
+``printtrace()`` a million times is throttled without affecting any other
+call site:
+
+- :class:`EveryNth` - emit the 1st, (N+1)th, (2N+1)th, ... call.
+- :class:`FirstN` - emit the first N calls, then nothing.
+- :class:`RateLimit` - token bucket: at most ``per_second`` calls per second
+  on average, with bursts of up to ``burst``.
+
+The decision is made before the call site is rendered and before any value
+is formatted, so a suppressed call costs a frame lookup, a dict lookup, a
+clock read, and a counter update.
+
+Suppressed calls are counted, and reported as a line such as::
+
+    [printtrace] worker.py:42 in poll suppressed 48,211 lines
+
+on the site's next call - emitted or suppressed - once ``REPORT_INTERVAL``
+seconds have passed since its last report, so a site that never emits again
+(a spent :class:`FirstN`, a large :class:`EveryNth`) is still reported while
+it keeps being called. Every site is also reported at interpreter exit (or on
+:func:`report_suppressed`).
+
+Constraints:
+- a site's state is created from the first policy seen there; later calls
+  at that site reuse it, whatever policy object they pass
+- reports are text lines, so calls on a binary tracer are counted but not
+  reported
+- no imports from api or tracer
+"""
+
+from __future__ import annotations
+
+import abc
+import atexit
+import os
+import sys
+import threading
+import time
+from types import CodeType
+from typing import TextIO
+
+from .context import render_site
+from .writer import write_notice
+
+REPORT_INTERVAL = 10.0
+
+# Site-table bound. Reaching it reports and forgets every site.
+_MAX_SITES = 4096
+
+__all__ = [
+    "EveryNth",
+    "FirstN",
+    "RateLimit",
+    "SamplingPolicy",
+    "admit",
+    "report_suppressed",
+]
+
+
+class _Site:
+    """Sampling state of one call site."""
+
+    __slots__ = (
+        "policy",
+        "lock",
+        "calls",
+        "suppressed",
+        "tokens",
+        "stamp",
+        "last_report",
+        "stream",
+    )
+
+    def __init__(self, policy: SamplingPolicy, now: float) -> None:
+        self.policy = policy
+        self.lock = threading.Lock()
+        self.calls = 0
+        # Suppressed since the last report.
+        self.suppressed = 0
+        self.tokens = 0.0
+        self.stamp = now
+        self.last_report = now
+        self.stream: TextIO | None = None
+
+
+class SamplingPolicy(abc.ABC):
+    """Base class for sampling policies. Policies are immutable."""
+
+    __slots__ = ()
+
+    # An optional hook, not abstract: only stateful policies override it.
+    def _setup(self, site: _Site) -> None:  # noqa: B027
+        """Initialise a new site's state. Runs once, before its first call."""
+
+    @abc.abstractmethod
+    def _allow(self, site: _Site) -> bool:
+        """Decide one call. Runs with ``site.lock`` held."""
+
+
+class EveryNth(SamplingPolicy):
+    """
+    Emit one call in every *n*, starting with the first.
+
+    Raises
+    ------
+    ValueError
+        If *n* is less than 1.
+    """
+
+    __slots__ = ("n",)
+
+    def __init__(self, n: int) -> None:
+        if n < 1:
+            raise ValueError(f"n must be >= 1, got {n}.")
+        self.n = n
+
+    def _allow(self, site: _Site) -> bool:
+        return site.calls % self.n == 0
+
+    def __repr__(self) -> str:
+        return f"EveryNth({self.n})"
+
+
+class FirstN(SamplingPolicy):
+    """
+    Emit the first *n* calls, then suppress the rest.
+
+    Raises
+    ------
+    ValueError
+        If *n* is negative.
+    """
+
+    __slots__ = ("n",)
+
+    def __init__(self, n: int) -> None:
+        if n < 0:
+            raise ValueError(f"n must be >= 0, got {n}.")
+        self.n = n
+
+    def _allow(self, site: _Site) -> bool:
+        return site.calls < self.n
+
+    def __repr__(self) -> str:
+        return f"FirstN({self.n})"
+
+
+class RateLimit(SamplingPolicy):
+    """
+    Token bucket: *per_second* calls per second on average, *burst* at once.
+
+    *burst* defaults to ``max(1, per_second)``.
+
+    Raises
+    ------
+    ValueError
+        If *per_second* is not positive or *burst* is less than 1.
+    """
+
+    __slots__ = ("per_second", "burst")
+
+    def __init__(self, per_second: float, burst: int | None = None) -> None:
+        if per_second <= 0:
+            raise ValueError(f"per_second must be > 0, got {per_second}.")
+        if burst is None:
+            burst = max(1, int(per_second))
+        if burst < 1:
+            raise ValueError(f"burst must be >= 1, got {burst}.")
+        self.per_second = per_second
+        self.burst = burst
+
+    def _setup(self, site: _Site) -> None:
+        site.tokens = float(self.burst)
+
+    def _allow(self, site: _Site) -> bool:
+        now = time.monotonic()
+        tokens = min(
+            float(self.burst), site.tokens + (now - site.stamp) * self.per_second
+        )
+        site.stamp = now
+        if tokens >= 1.0:
+            site.tokens = tokens - 1.0
+            return True
+        site.tokens = tokens
+        return False
+
+    def __repr__(self) -> str:
+        return f"RateLimit({self.per_second!r}, burst={self.burst})"
+
+
+_sites: dict[tuple[CodeType, int], _Site] = {}
+_sites_lock = threading.Lock()
+_atexit_registered = False
+
+
+def admit(
+    policy: SamplingPolicy, stream: TextIO, skip: int, report: bool = True
+) -> bool:
+    """
+    Decide whether the call at stack depth *skip* is emitted under *policy*.
+
+    Writes a suppression report to *stream* first if one is due. With
+    *report* false - a binary trace - suppressed calls are counted but never
+    reported to *stream*.
+    """
+    try:
+        frame = sys._getframe(skip + 1)
+    except ValueError:
+        return True
+    key = (frame.f_code, frame.f_lineno)
+    del frame
+
+    site = _sites.get(key)
+    if site is None:
+        site = _new_site(key, policy)
+
+    with site.lock:
+        allowed = site.policy._allow(site)
+        site.calls += 1
+        if not allowed:
+            site.suppressed += 1
+            if report:
+                site.stream = stream
+        due = 0
+        if report and site.suppressed:
+            now = time.monotonic()
+            if now - site.last_report >= REPORT_INTERVAL:
+                due, site.suppressed = site.suppressed, 0
+                site.last_report = now
+
+    if due:
+        _write_report(stream, key, due)
+    return allowed
+
+
+def _new_site(key: tuple[CodeType, int], policy: SamplingPolicy) -> _Site:
+    global _atexit_registered
+
+    with _sites_lock:
+        site = _sites.get(key)
+        if site is not None:
+            return site
+        if len(_sites) >= _MAX_SITES:
+            _report_and_forget()
+        site = _Site(policy, time.monotonic())
+        policy._setup(site)
+        _sites[key] = site
+        if not _atexit_registered:
+            atexit.register(report_suppressed)
+            _atexit_registered = True
+    return site
+
+
+def report_suppressed() -> None:
+    """Report every site's unreported suppressed calls now."""
+    for key, site in list(_sites.items()):
+        with site.lock:
+            count, site.suppressed = site.suppressed, 0
+            site.last_report = time.monotonic()
+            stream = site.stream
+        if count and stream is not None:
+            _write_report(stream, key, count)
+
+
+def _report_and_forget() -> None:
+    # Called with _sites_lock held.
+    sites = list(_sites.items())
+    _sites.clear()
+    for key, site in sites:
+        if site.suppressed and site.stream is not None:
+            _write_report(site.stream, key, site.suppressed)
+
+
+def _write_report(stream: TextIO, key: tuple[CodeType, int], count: int) -> None:
+    noun = "line" if count == 1 else "lines"
+    text = f"[printtrace] {render_site(key)} suppressed {count:,} {noun}\n"
+    write_notice(stream, text)
+
+
+def _reinit_after_fork() -> None:
+    global _sites_lock
+
+    _sites_lock = threading.Lock()
+    # The parent reports its own suppressed calls.
+    _sites.clear()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reinit_after_fork)
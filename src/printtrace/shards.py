@@ -0,0 +1,263 @@
+"""
+Sharded background writer for printtrace.
+
+With many emitting threads, the single output lock - or the single queue of
+:class:`~printtrace.writer.AsyncWriter` - becomes the point every thread
+contends on. :class:`ShardedWriter` gives each thread its own buffer
+instead. A record is stamped with a global sequence number as it is
+submitted and appended to the calling thread's buffer; a merger thread
+collects the buffers and writes records in sequence order, so arrival order
+is still output order.
+
+Started with ``start_async_writer(sharded=True)``; it shares the background
+writer's registry, exit drain, and :func:`~printtrace.stop_async_writer`.
+
+Constraints:
+- the submitting thread takes no shared lock on a GIL build: the sequence
+  number is one ``next()`` on an :func:`itertools.count` and the append goes
+  to a deque only that thread writes to, under that shard's own lock
+- the merger takes each shard's lock once, after ``close()``, for its final
+  collection: a record appended before that is written, and a submit after
+  it sees the writer closed - none is accepted and then lost
+- on a free-threaded build the sequence counter is guarded by a lock, since
+  ``itertools.count`` is not atomic there; the critical section is two
+  instructions long
+- a sequence number taken but never appended (the thread was interrupted in
+  between) is skipped after ``_GAP_TIMEOUT`` rather than stalling output
+"""
+
+from __future__ import annotations
+
+import heapq
+import itertools
+import sys
+import threading
+import time
+from collections import deque
+from typing import TextIO
+
+from .writer import DEFAULT_MAXSIZE, _write_batch
+
+_VALID_POLICIES: frozenset[str] = frozenset({"block", "drop-newest"})
+
+# Merger wake-up interval when idle, and how long it waits on a missing
+# sequence number before moving past it.
+_POLL_INTERVAL = 0.05
+_GAP_TIMEOUT = 0.2
+
+# Sleep between checks while a "block" submitter waits for room.
+_BLOCK_POLL = 0.0005
+
+# (sequence number, stream, text, records dropped before this one)
+_Sequenced = tuple[int, TextIO, str, int]
+
+__all__ = ["ShardedWriter"]
+
+
+def _gil_enabled() -> bool:
+    check = getattr(sys, "_is_gil_enabled", None)
+    return True if check is None else bool(check())
+
+
+class _Shard:
+    """One thread's buffer."""
+
+    __slots__ = ("records", "thread", "dropped", "lock")
+
+    def __init__(self, thread: threading.Thread) -> None:
+        self.records: deque[_Sequenced] = deque()
+        # Held by the owning thread while it checks for close and appends,
+        # and by the merger for its final collection. Otherwise uncontended.
+        self.lock = threading.Lock()
+        self.thread = thread
+        self.dropped = 0
+
+
+class ShardedWriter:
+    """
+    Per-thread buffers merged by sequence number on a single writer thread.
+
+    Parameters
+    ----------
+    maxsize:
+        Maximum number of records buffered per thread. Must be >= 1.
+    policy:
+        What :meth:`submit` does when the calling thread's buffer is full:
+        ``"block"`` waits for the merger, ``"drop-newest"`` discards the
+        record. Dropped records are reported as with
+        :class:`~printtrace.writer.AsyncWriter`.
+    """
+
+    def __init__(self, maxsize: int = DEFAULT_MAXSIZE, policy: str = "block") -> None:
+        if maxsize < 1:
+            raise ValueError(f"maxsize must be >= 1, got {maxsize}.")
+        if policy not in _VALID_POLICIES:
+            raise ValueError(
+                f"Invalid sharded full-buffer policy {policy!r}. "
+                f"Expected one of: {sorted(_VALID_POLICIES)}."
+            )
+        self.maxsize = maxsize
+        self.policy = policy
+
+        self._local = threading.local()
+        self._shards: list[_Shard] = []
+        self._shards_lock = threading.Lock()
+        self._next_seq = itertools.count().__next__
+        self._seq_lock = None if _gil_enabled() else threading.Lock()
+
+        self._wake = threading.Event()
+        self._idle = threading.Condition(threading.Lock())
+        self._backlog = 0
+        self._busy = False
+        self._closed = False
+        self._thread = threading.Thread(
+            target=self._run, name="printtrace-merger", daemon=True
+        )
+        self._thread.start()
+
+    def submit(self, stream: TextIO, text: str) -> bool:
+        """
+        Buffer *text* for writing to *stream*.
+
+        Returns ``False`` only if the writer has been closed.
+        """
+        if self._closed:
+            return False
+        shard: _Shard | None = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._register()
+        records = shard.records
+
+        if len(records) >= self.maxsize:
+            if self.policy == "drop-newest":
+                shard.dropped += 1
+                return True
+            while len(records) >= self.maxsize:
+                if self._closed:
+                    return False
+                self._wake.set()
+                time.sleep(_BLOCK_POLL)
+
+        lock = self._seq_lock
+        with shard.lock:
+            # Checked again here: the merger may have made its final
+            # collection since the check above.
+            if self._closed:
+                return False
+            if lock is None:
+                records.append((self._next_seq(), stream, text, shard.dropped))
+            else:
+                with lock:
+                    seq = self._next_seq()
+                records.append((seq, stream, text, shard.dropped))
+        shard.dropped = 0
+
+        if not self._wake.is_set():
+            self._wake.set()
+        return True
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """
+        Wait until every buffered record has been written and flushed.
+
+        Returns ``False`` if *timeout* expired first.
+        """
+        self._wake.set()
+        with self._idle:
+            return self._idle.wait_for(self._drained, timeout)
+
+    def close(self, timeout: float | None = None) -> bool:
+        """
+        Stop accepting records and drain the buffers.
+
+        Returns ``False`` if the merger did not finish within *timeout*.
+        """
+        self._closed = True
+        self._wake.set()
+        self._thread.join(timeout)
+        return not self._thread.is_alive()
+
+    def _register(self) -> _Shard:
+        shard = _Shard(threading.current_thread())
+        self._local.shard = shard
+        with self._shards_lock:
+            self._shards.append(shard)
+        return shard
+
+    def _drained(self) -> bool:
+        if self._busy or self._backlog:
+            return False
+        return not any(shard.records for shard in self._shards)
+
+    def _collect_final(self, heap: list[_Sequenced]) -> None:
+        # Once this has held a shard's lock, every later submit to the shard
+        # sees _closed and is refused.
+        with self._shards_lock:
+            shards = list(self._shards)
+        for shard in shards:
+            with shard.lock:
+                records = shard.records
+                while records:
+                    heapq.heappush(heap, records.popleft())
+
+    def _collect(self, heap: list[_Sequenced]) -> None:
+        with self._shards_lock:
+            shards = list(self._shards)
+        finished = []
+        for shard in shards:
+            records = shard.records
+            while records:
+                heapq.heappush(heap, records.popleft())
+            if not shard.thread.is_alive() and not records:
+                finished.append(shard)
+        if finished:
+            with self._shards_lock:
+                self._shards = [s for s in self._shards if s not in finished]
+
+    def _run(self) -> None:
+        heap: list[_Sequenced] = []
+        expected = 0
+        gap_since: float | None = None
+
+        while True:
+            self._wake.clear()
+            self._collect(heap)
+
+            batch = []
+            while heap and heap[0][0] == expected:
+                _, stream, text, dropped = heapq.heappop(heap)
+                batch.append((stream, text, dropped))
+                expected += 1
+
+            if heap and not batch:
+                # The next number was taken but not appended yet - or never
+                # will be. Give it a moment, then move past it.
+                now = time.monotonic()
+                if gap_since is None:
+                    gap_since = now
+                elif now - gap_since >= _GAP_TIMEOUT or self._closed:
+                    expected = heap[0][0]
+                    gap_since = None
+                    continue
+            else:
+                gap_since = None
+
+            if batch:
+                self._busy = True
+                self._backlog = len(heap)
+                try:
+                    _write_batch(batch)
+                finally:
+                    self._busy = False
+
+            with self._idle:
+                self._backlog = len(heap)
+                self._idle.notify_all()
+
+            if self._closed and not heap and self._drained():
+                self._collect_final(heap)
+                if not heap:
+                    return
+                continue
+            if not batch:
+                self._wake.wait(_POLL_INTERVAL if not heap else _BLOCK_POLL * 10)
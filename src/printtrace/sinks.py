@@ -0,0 +1,450 @@
+"""
+File sinks for printtrace.
+
+:class:`FdSink` writes each record straight to a file descriptor: the text
+is encoded to UTF-8 once and handed to ``os.write``, with no
+``TextIOWrapper`` or ``BufferedWriter`` in between. Batches from a
+background writer go out in ``os.writev`` calls. A record is always a
+single system call, so on a pipe, records of up to ``PIPE_BUF`` bytes are
+never interleaved with other writers - other processes included - and on a
+file opened ``O_APPEND`` no record is split.
+
+A :class:`RotatingFileSink` is a file-like object configured by path. Pass
+it as ``file=`` and each trace record is encoded and appended to a large
+in-memory buffer; the buffer reaches the file in one ``os.write`` when it
+fills, and at most every ``flush_interval`` seconds otherwise. The
+``flush()`` a tracer issues after each call is gated by that interval, so a
+busy program makes one system call per buffer rather than two per record.
+
+The file is rotated by size, by age, or both. Rotation renames with
+:func:`os.replace`, so at every moment each name refers to a complete file::
+
+    app.log -> app.log.1 -> app.log.2 -> ... -> app.log.<backups> (deleted)
+
+Buffered records are written to the file they were emitted into before it
+is rotated, and every write to the file is made under the sink's lock, so
+the file holds records in the order they were written to the sink - the
+order the output lock was acquired in.
+
+Constraints:
+- ``write()`` and ``write_records()`` run under ``output_lock()`` when
+  called by a tracer or background writer, so they must not take it
+- a batch written with ``writev`` holds whole records only; on a pipe or
+  socket a batch is kept within ``PIPE_BUF`` so the kernel writes it
+  atomically
+- one background thread writes out buffers older than their interval;
+  it never takes the output lock
+- buffers are written out at interpreter exit; records written after that
+  go straight to the file
+- a forked child gets fresh sink locks and drops the parent's buffered
+  records, which are the parent's to write
+- no imports from api or tracer
+"""
+
+from __future__ import annotations
+
+import atexit
+import contextlib
+import os
+import stat
+import threading
+import time
+import weakref
+from collections.abc import Callable
+from types import TracebackType
+
+DEFAULT_BUFFER_SIZE = 256 * 1024
+DEFAULT_FLUSH_INTERVAL = 1.0
+DEFAULT_BACKUPS = 5
+
+# POSIX minimums, for platforms that do not report their own.
+_MIN_PIPE_BUF = 512
+_MIN_IOV_MAX = 16
+
+__all__ = ["FdSink", "RotatingFileSink"]
+
+# Open sinks, for the flush timer, the exit flush, and the fork hook.
+_sinks: weakref.WeakSet[RotatingFileSink] = weakref.WeakSet()
+_timer: threading.Thread | None = None
+_timer_lock = threading.Lock()
+_atexit_registered = False
+
+
+class FdSink:
+    """
+    File-like sink that writes each record to a file descriptor in one call.
+
+    Parameters
+    ----------
+    target:
+        A path, opened ``O_WRONLY | O_APPEND | O_CREAT``, or an open file
+        descriptor such as ``1`` for stdout, used as it is.
+    closefd:
+        Close the descriptor in :meth:`close`. Defaults to ``True`` for a
+        path and ``False`` for a descriptor.
+
+    Records are not buffered, so there is nothing to flush. Text written to
+    the same descriptor through ``sys.stdout`` or another stream object is
+    buffered there, and reaches it only when that stream is flushed.
+    """
+
+    def __init__(
+        self, target: int | str | os.PathLike[str], *, closefd: bool | None = None
+    ) -> None:
+        if isinstance(target, int):
+            self.fd = target
+            self.name: int | str = target
+            self._closefd = bool(closefd)
+        else:
+            self.name = os.fspath(target)
+            self.fd = os.open(self.name, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            self._closefd = closefd is None or closefd
+        mode = os.fstat(self.fd).st_mode
+        if stat.S_ISFIFO(mode) or stat.S_ISSOCK(mode):
+            # Larger batches may be split, and interleaved, by the kernel.
+            pipe_buf = _conf("fpathconf", self.fd, "PC_PIPE_BUF")
+            self._batch_limit = max(pipe_buf, _MIN_PIPE_BUF)
+        else:
+            self._batch_limit = 0
+        self._iov_max = max(_conf("sysconf", "SC_IOV_MAX"), _MIN_IOV_MAX)
+        self._closed = False
+
+    def write(self, text: str) -> int:
+        """Encode *text* and write it in one system call. Returns ``len(text)``."""
+        if self._closed:
+            raise ValueError("write to closed FdSink")
+        self._write_all(text.encode("utf-8", "surrogatepass"))
+        return len(text)
+
+    def write_records(self, texts: list[str]) -> None:
+        """
+        Write several records, batched into as few ``writev`` calls as
+        atomicity allows.
+        """
+        if self._closed:
+            raise ValueError("write to closed FdSink")
+        writev = getattr(os, "writev", None)
+        limit = self._batch_limit
+        batch: list[bytes] = []
+        size = 0
+        for text in texts:
+            data = text.encode("utf-8", "surrogatepass")
+            if batch and (
+                len(batch) >= self._iov_max or (limit and size + len(data) > limit)
+            ):
+                self._write_batch(batch, size, writev)
+                batch = []
+                size = 0
+            batch.append(data)
+            size += len(data)
+        if batch:
+            self._write_batch(batch, size, writev)
+
+    def flush(self) -> None:
+        """No-op: records are written to the descriptor as they arrive."""
+
+    def fileno(self) -> int:
+        return self.fd
+
+    def isatty(self) -> bool:
+        return not self._closed and os.isatty(self.fd)
+
+    def close(self) -> None:
+        if not self._closed:
+            self._closed = True
+            if self._closefd:
+                os.close(self.fd)
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def __enter__(self) -> FdSink:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        self.close()
+
+    def __repr__(self) -> str:
+        return f"FdSink({self.name!r})"
+
+    def _write_all(self, data: bytes) -> None:
+        written = os.write(self.fd, data)
+        if written < len(data):
+            # Interrupted part-way, or a non-blocking descriptor was full.
+            view = memoryview(data)
+            while written < len(data):
+                written += os.write(self.fd, view[written:])
+
+    def _write_batch(
+        self, batch: list[bytes], size: int, writev: Callable[..., int] | None
+    ) -> None:
+        if writev is None or len(batch) == 1:
+            self._write_all(b"".join(batch))
+            return
+        written = writev(self.fd, batch)
+        if written < size:
+            self._write_all(b"".join(batch)[written:])
+
+
+def _conf(function: str, *args: object) -> int:
+    query: Callable[..., int] | None = getattr(os, function, None)
+    if query is None:
+        return 0
+    try:
+        return int(query(*args))
+    except (OSError, ValueError):
+        return 0
+
+
+class RotatingFileSink:
+    """
+    File-like sink that appends trace records to a rotated file.
+
+    An existing file at *path* is appended to, and counts towards
+    *max_bytes*.
+
+    Parameters
+    ----------
+    path:
+        File to write. Rotated copies are named ``<path>.1``, ``<path>.2``,
+        ..., newest first.
+    max_bytes:
+        Rotate before a record would take the file past this size. A record
+        larger than *max_bytes* is written whole, to a file of its own.
+        ``None`` (default) never rotates by size.
+    rotate_interval:
+        Rotate before the first record written this many seconds after the
+        file was opened. ``None`` (default) never rotates by age.
+    backups:
+        Rotated copies to keep. With ``0``, rotation truncates the file.
+    buffer_size:
+        Bytes buffered before they are written to the file.
+    flush_interval:
+        Longest time, in seconds, a record stays buffered.
+
+    Raises
+    ------
+    ValueError
+        If a size, interval, or count is out of range.
+    """
+
+    def __init__(
+        self,
+        path: str | os.PathLike[str],
+        *,
+        max_bytes: int | None = None,
+        rotate_interval: float | None = None,
+        backups: int = DEFAULT_BACKUPS,
+        buffer_size: int = DEFAULT_BUFFER_SIZE,
+        flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+    ) -> None:
+        if max_bytes is not None and max_bytes < 1:
+            raise ValueError(f"max_bytes must be >= 1, got {max_bytes}.")
+        if rotate_interval is not None and not rotate_interval > 0:
+            raise ValueError(
+                f"rotate_interval must be positive, got {rotate_interval!r}."
+            )
+        if backups < 0:
+            raise ValueError(f"backups must be >= 0, got {backups}.")
+        if buffer_size < 0:
+            raise ValueError(f"buffer_size must be >= 0, got {buffer_size}.")
+        if not flush_interval > 0:
+            raise ValueError(
+                f"flush_interval must be positive, got {flush_interval!r}."
+            )
+        self.path = os.fspath(path)
+        self.max_bytes = max_bytes
+        self.rotate_interval = rotate_interval
+        self.backups = backups
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+
+        self._rotates = max_bytes is not None or rotate_interval is not None
+        self._buffer = bytearray()
+        self._lock = threading.Lock()
+        self._closed = False
+        self._fd = -1
+        self._open(truncate=False)
+        self._written = time.monotonic()
+        _sinks.add(self)
+        _start_background()
+
+    def write(self, text: str) -> int:
+        """Buffer *text*, rotating first if it is due. Returns ``len(text)``."""
+        data = text.encode("utf-8", "surrogatepass")
+        with self._lock:
+            if self._closed:
+                raise ValueError("write to closed RotatingFileSink")
+            if self._rotates and self._rotation_due(len(data)):
+                self._rotate()
+            buffer = self._buffer
+            buffer += data
+            self._size += len(data)
+            if len(buffer) >= self.buffer_size:
+                self._write_buffer()
+        return len(text)
+
+    def flush(self) -> None:
+        """
+        Write the buffer to the file if it has waited ``flush_interval``.
+
+        Tracers call this after every record; use :meth:`sync` to write the
+        buffer out unconditionally.
+        """
+        if time.monotonic() - self._written >= self.flush_interval:
+            self._write_due()
+
+    def sync(self) -> None:
+        """Write the buffer to the file now."""
+        with self._lock:
+            if not self._closed:
+                self._write_buffer()
+
+    def rotate(self) -> None:
+        """Write the buffer out and rotate now, whatever the limits."""
+        with self._lock:
+            if self._closed:
+                raise ValueError("rotate of closed RotatingFileSink")
+            self._rotate()
+
+    def close(self) -> None:
+        """Write the buffer out and close the file."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            try:
+                self._write_buffer()
+            finally:
+                os.close(self._fd)
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def __enter__(self) -> RotatingFileSink:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        self.close()
+
+    def __repr__(self) -> str:
+        return (
+            f"RotatingFileSink({self.path!r}, max_bytes={self.max_bytes}, "
+            f"rotate_interval={self.rotate_interval}, backups={self.backups})"
+        )
+
+    # The methods below run under self._lock, except _write_due.
+
+    def _open(self, truncate: bool) -> None:
+        flags = os.O_WRONLY | os.O_APPEND | os.O_CREAT
+        if truncate:
+            flags |= os.O_TRUNC
+        self._fd = os.open(self.path, flags, 0o644)
+        self._size = os.fstat(self._fd).st_size
+        self._opened = time.monotonic()
+
+    def _rotation_due(self, incoming: int) -> bool:
+        if (
+            self.max_bytes is not None
+            and self._size
+            and self._size + incoming > self.max_bytes
+        ):
+            return True
+        return (
+            self.rotate_interval is not None
+            and time.monotonic() - self._opened >= self.rotate_interval
+        )
+
+    def _rotate(self) -> None:
+        # Buffered records belong to the file they were written to.
+        self._write_buffer()
+        os.close(self._fd)
+        if self.backups:
+            for index in range(self.backups - 1, 0, -1):
+                older = f"{self.path}.{index}"
+                if os.path.exists(older):
+                    os.replace(older, f"{self.path}.{index + 1}")
+            # Removed or moved away by someone else: start a new one.
+            with contextlib.suppress(FileNotFoundError):
+                os.replace(self.path, f"{self.path}.1")
+        self._open(truncate=not self.backups)
+
+    def _write_buffer(self) -> None:
+        buffer = self._buffer
+        while buffer:
+            written = os.write(self._fd, buffer)
+            del buffer[:written]
+        self._written = time.monotonic()
+
+    def _write_due(self) -> None:
+        with self._lock:
+            if (
+                not self._closed
+                and time.monotonic() - self._written >= self.flush_interval
+            ):
+                self._write_buffer()
+
+
+def _start_background() -> None:
+    global _timer, _atexit_registered
+
+    with _timer_lock:
+        if not _atexit_registered:
+            atexit.register(_write_at_exit)
+            _atexit_registered = True
+        if _timer is None:
+            _timer = threading.Thread(
+                target=_run_timer, name="printtrace-sinks", daemon=True
+            )
+            _timer.start()
+
+
+def _run_timer() -> None:
+    while True:
+        # Hold no sink across the sleep: the weak set must see it collected.
+        interval = min(
+            (sink.flush_interval for sink in list(_sinks)),
+            default=DEFAULT_FLUSH_INTERVAL,
+        )
+        time.sleep(interval)
+        for sink in list(_sinks):
+            with contextlib.suppress(Exception):
+                sink._write_due()
+
+
+def _write_at_exit() -> None:
+    for sink in list(_sinks):
+        # Background writers may still drain into the sink after this.
+        sink.buffer_size = 0
+        with contextlib.suppress(Exception):
+            sink.sync()
+
+
+def _reinit_after_fork() -> None:
+    global _timer, _timer_lock
+
+    _timer_lock = threading.Lock()
+    _timer = None
+    sinks = list(_sinks)
+    for sink in sinks:
+        sink._lock = threading.Lock()
+        sink._size -= len(sink._buffer)
+        sink._buffer.clear()
+    if sinks:
+        _start_background()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reinit_after_fork)
@@ -0,0 +1,125 @@
+"""
+Call-chain capture for printtrace.
+
+The call-site prefix names only the frame that called printtrace(). With a
+stack depth set, the callers above it are captured too and rendered after
+the prefix, innermost first::
+
+    [MainThread] db.py:40 in query <- repo.py:12 in Repo.get <- app.py:7 in main
+
+The stack is walked with ``f_back`` - no :mod:`inspect`, no
+:mod:`traceback`, no source lines read. Work is cached at two levels:
+
+- each frame's summary - ``file:line in qualname`` - is interned per
+  ``(code object, line)`` and reused by every stack that passes through it
+- a whole rendered stack is cached by the flat tuple of its ``(code
+  object, line)`` pairs, so a stack seen before costs the walk and one
+  dict lookup
+
+Constraints:
+- caches are shared across threads: renderings contain no thread or
+  process, and a lost race only renders the same string twice
+- both caches are bounded and cleared when full, like the prefix cache
+- no imports from formatting, tracer, or api
+"""
+
+from __future__ import annotations
+
+import sys
+from collections.abc import Hashable
+from types import CodeType
+from typing import Any
+
+from .context import _SKIP_FRAMES, _shorten_filename
+
+# Flat (code, line, code, line, ...) of the callers above the call site.
+StackKey = tuple[object, ...]
+
+_MAX_CACHED = 4096
+
+_frames: dict[tuple[CodeType, int], str] = {}
+_texts: dict[StackKey, str] = {}
+_json: dict[StackKey, str] = {}
+
+__all__ = [
+    "StackKey",
+    "capture_stack",
+    "render_stack",
+    "stack_json",
+    "stack_text",
+    "validate_depth",
+]
+
+
+def validate_depth(depth: int) -> int:
+    """Return *depth* unchanged, or raise ValueError if negative."""
+    if depth < 0:
+        raise ValueError(f"stack depth must be >= 0, got {depth}.")
+    return depth
+
+
+def capture_stack(depth: int, skip: int = _SKIP_FRAMES) -> StackKey:
+    """
+    Return up to *depth* callers of the frame at *skip*, innermost first,
+    as a flat ``(code, line, code, line, ...)`` tuple.
+
+    The frame at *skip* itself - the call site - is not included.
+    """
+    try:
+        frame = sys._getframe(max(skip, 0)).f_back
+    except ValueError:
+        return ()
+    key: list[object] = []
+    while frame is not None and depth > 0:
+        key.append(frame.f_code)
+        key.append(frame.f_lineno)
+        frame = frame.f_back
+        depth -= 1
+    del frame
+    return tuple(key)
+
+
+def stack_text(key: StackKey) -> str:
+    """Render *key* as `` <- file:line in qualname`` per frame, cached."""
+    text = _texts.get(key)
+    if text is None:
+        text = "".join(f" <- {frame}" for frame in render_stack(key))
+        _store(_texts, key, text)
+    return text
+
+
+def stack_json(key: StackKey) -> str:
+    """Render *key* as a JSON array of frame summaries, cached."""
+    text = _json.get(key)
+    if text is None:
+        from json.encoder import encode_basestring_ascii
+
+        frames = ", ".join(map(encode_basestring_ascii, render_stack(key)))
+        text = f"[{frames}]"
+        _store(_json, key, text)
+    return text
+
+
+def render_stack(key: StackKey) -> list[str]:
+    """The ``file:line in qualname`` summary of each frame in *key*."""
+    return [
+        _frame_summary(key[i], key[i + 1])  # type: ignore[arg-type]
+        for i in range(0, len(key), 2)
+    ]
+
+
+def _frame_summary(code: CodeType, lineno: int) -> str:
+    site = (code, lineno)
+    summary = _frames.get(site)
+    if summary is None:
+        # co_qualname is 3.11+; on 3.10 the plain name is the best there is.
+        name = getattr(code, "co_qualname", code.co_name)
+        summary = f"{_shorten_filename(code.co_filename)}:{lineno} in {name}"
+        _store(_frames, site, summary)
+    return summary
+
+
+def _store(table: dict[Any, str], key: Hashable, text: str) -> None:
+    if len(table) >= _MAX_CACHED:
+        table.clear()
+    table[key] = text
@@ -2,13 +2,19 @@
 Global output lock for printtrace.
 
 Constraints:
-- one lock, no queues, no worker threads
+- one lock; the default path has no queues and no worker threads
+- the opt-in background writers (writer.py, shards.py) still write under
+  this lock, and only their single writer thread takes it
 - lock scope covers only the write() call
 - no imports from formatting, context, or api
+- a forked child gets a fresh lock: another thread of the parent may have
+  held it at the moment of the fork, and that thread does not exist in the
+  child to release it
 """
 
 from __future__ import annotations
 
+import os
 import threading
 from collections.abc import Generator
 from contextlib import contextmanager
@@ -29,4 +35,22 @@ def output_lock() -> Generator[None, None, None]:
         yield
 
 
-__all__ = ["output_lock"]
+def current_lock() -> threading.Lock:
+    """
+    The lock :func:`output_lock` takes, for callers that time its
+    acquisition. Fetch it per write: a forked child replaces it.
+    """
+    return _output_lock
+
+
+def _reinit_after_fork() -> None:
+    global _output_lock
+
+    _output_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reinit_after_fork)
+
+
+__all__ = ["current_lock", "output_lock"]
@@ -0,0 +1,461 @@
+"""
+Tracer objects for printtrace.
+
+A :class:`Tracer` binds mode, output stream, flush policy, and formatting
+limits once, at construction, and compiles an emit function specialised for
+that combination. Calling the tracer does no mode lookup, no environment
+read, and no branching on mode strings. A call below the tracer's level
+threshold - or any call on an ``"off"`` tracer - returns after a single
+comparison, before the call site is inspected or any value is formatted.
+
+The module-level :func:`~printtrace.printtrace` is a thin front end over a
+small set of cached default tracers, one per ``(mode, flush policy, level
+threshold, dedup window, stack depth)``.
+"""
+
+from __future__ import annotations
+
+import sys
+import time
+from collections.abc import Callable
+from types import CodeType
+from typing import Literal, TextIO
+
+from . import counters as _counters
+from .context import (
+    capture_json_fields,
+    capture_prefix,
+    capture_site,
+    current_task_name,
+)
+from .dedup import DEFAULT_WINDOW, observe, validate_window
+from .flush import Flusher, get_flusher, resolve_flush_policy
+from .formatting import (
+    MAX_DEPTH,
+    MAX_ITEMS,
+    MAX_STR_LEN,
+    MAX_TOTAL_LEN,
+    FormatLimits,
+    format_parts,
+    format_values,
+    str_values,
+)
+from .levels import DEBUG, resolve_level
+from .sampling import SamplingPolicy, admit
+from .stack import capture_stack, stack_json, stack_text, validate_depth
+from .sync import current_lock, output_lock
+from .writer import active_writer
+
+Mode = Literal["verbose", "minimal", "json", "binary", "off"]
+_VALID_MODES: frozenset[str] = frozenset(
+    {"verbose", "minimal", "json", "binary", "off"}
+)
+
+# Threshold that no call level reaches: the "off" mode.
+_DISABLED = sys.maxsize
+
+# Frames from capture_prefix() to the user's call-site:
+#   user code → Tracer.__call__ / printtrace() → emit → capture_prefix()
+_EMIT_SKIP = 3
+
+_clock = time.perf_counter_ns
+
+# emit(values, sep, end, out)
+_Emit = Callable[[tuple[object, ...], str, str, TextIO], None]
+
+__all__ = ["Tracer", "Mode"]
+
+
+def validate_mode(mode: str) -> str:
+    """Return *mode* unchanged, or raise ValueError if unrecognised."""
+    if mode not in _VALID_MODES:
+        raise ValueError(
+            f"Invalid printtrace mode {mode!r}. "
+            f"Expected one of: {sorted(_VALID_MODES)}."
+        )
+    return mode
+
+
+class Tracer:
+    """
+    A printtrace configuration resolved once and reused for every call.
+
+    Parameters
+    ----------
+    mode:
+        ``"verbose"`` (default), ``"minimal"``, ``"json"``, ``"binary"``, or
+        ``"off"``. Unlike :func:`~printtrace.printtrace`, the ``PRINTTRACE_MODE``
+        environment variable is not consulted.
+    file:
+        Default output stream. ``None`` means ``sys.stdout`` as it is at the
+        time of each call. ``"binary"`` mode needs a stream opened in binary
+        mode, or a text stream with a ``buffer`` attribute.
+    flush:
+        Flush policy: ``"always"`` (default), ``"tty"``, or ``"batch"``.
+    level:
+        Threshold: calls with a lower ``level`` are dropped. An integer or a
+        level name such as ``"info"``. Defaults to ``0`` (emit everything).
+    max_depth, max_items, max_str_len, max_total:
+        Formatting limits for this tracer. ``max_total`` is the character
+        budget for one call across all its values. Default to the values in
+        :mod:`printtrace.formatting`.
+    sample:
+        Sampling policy applied to every call through this tracer, such as
+        ``EveryNth(100)``; see :mod:`printtrace.sampling`. A call's own
+        *sample* argument takes precedence. Defaults to ``None``: no
+        sampling.
+    dedup:
+        Collapse consecutive identical records from a call site into a
+        ``repeated N times`` summary; see :mod:`printtrace.dedup`. ``True``
+        uses a 10 second summary window, a number sets the window in
+        seconds. Not available in ``"binary"`` mode. Defaults to ``False``.
+    stack:
+        Number of callers above the call site to capture and show, innermost
+        first; see :mod:`printtrace.stack`. Applies to ``"verbose"`` and
+        ``"json"`` modes. Defaults to ``0``: the call site only.
+
+    Raises
+    ------
+    ValueError
+        If *mode*, *flush*, or *level* is not valid, *dedup* is not a
+        positive window, *dedup* is set in ``"binary"`` mode, or *stack* is
+        negative.
+    """
+
+    __slots__ = (
+        "_mode",
+        "_file",
+        "_flush",
+        "_threshold",
+        "_limits",
+        "_sample",
+        "_dedup",
+        "_stack",
+        "_emit",
+    )
+
+    def __init__(
+        self,
+        mode: Mode = "verbose",
+        *,
+        file: TextIO | None = None,
+        flush: str = "always",
+        level: int | str = 0,
+        max_depth: int = MAX_DEPTH,
+        max_items: int = MAX_ITEMS,
+        max_str_len: int = MAX_STR_LEN,
+        max_total: int = MAX_TOTAL_LEN,
+        sample: SamplingPolicy | None = None,
+        dedup: bool | float = False,
+        stack: int = 0,
+    ) -> None:
+        self._mode = validate_mode(mode)
+        self._flush = resolve_flush_policy(flush)
+        self._file = file
+        threshold = resolve_level(level)
+        self._threshold = _DISABLED if self._mode == "off" else threshold
+        self._limits = FormatLimits(max_depth, max_items, max_str_len, max_total)
+        self._sample = sample
+        self._dedup = resolve_dedup(dedup)
+        if self._dedup is not None and self._mode == "binary":
+            raise ValueError("dedup is not supported in 'binary' mode.")
+        self._stack = validate_depth(stack)
+        self._emit = _compile(
+            self._mode,
+            get_flusher(self._flush),
+            self._limits,
+            self._dedup,
+            self._stack,
+        )
+
+    @property
+    def mode(self) -> str:
+        return self._mode
+
+    @property
+    def file(self) -> TextIO | None:
+        return self._file
+
+    @property
+    def flush(self) -> str:
+        return self._flush
+
+    @property
+    def level(self) -> int:
+        return self._threshold
+
+    @property
+    def limits(self) -> FormatLimits:
+        return self._limits
+
+    @property
+    def sample(self) -> SamplingPolicy | None:
+        return self._sample
+
+    @property
+    def dedup(self) -> float | None:
+        """The dedup window in seconds, or ``None`` if dedup is off."""
+        return self._dedup
+
+    @property
+    def stack(self) -> int:
+        return self._stack
+
+    def __repr__(self) -> str:
+        return (
+            f"Tracer(mode={self._mode!r}, flush={self._flush!r}, "
+            f"limits={tuple(self._limits)!r})"
+        )
+
+    def __call__(
+        self,
+        *values: object,
+        sep: str | None = " ",
+        end: str | None = "\n",
+        file: TextIO | None = None,
+        level: int = DEBUG,
+        sample: SamplingPolicy | None = None,
+    ) -> None:
+        """
+        Emit one trace line. ``sep``, ``end``, ``file``, ``level``, and
+        ``sample`` behave as in :func:`~printtrace.printtrace`; ``file`` and
+        ``sample`` override the tracer's own.
+        """
+        if level < self._threshold:
+            return
+        if file is None:
+            file = self._file if self._file is not None else sys.stdout
+        if sample is None:
+            sample = self._sample
+        # Decided before the call site is rendered or any value formatted.
+        if sample is not None and not admit(sample, file, 1, self._mode != "binary"):
+            return
+        self._emit(
+            values,
+            " " if sep is None else sep,
+            "\n" if end is None else end,
+            file,
+        )
+
+
+def resolve_dedup(dedup: bool | float | None) -> float | None:
+    """Return the dedup window for a ``dedup`` argument, ``None`` if off."""
+    if dedup is None or dedup is False:
+        return None
+    if dedup is True:
+        return DEFAULT_WINDOW
+    return validate_window(dedup)
+
+
+def _write(out: TextIO, output: str, flusher: Flusher) -> None:
+    recorder = _counters._active
+    # Background mode: the writer thread does the write and the flush.
+    writer = active_writer()
+    if writer is not None and writer.submit(out, output):
+        if recorder is not None:
+            recorder.record_handoff(_counters.encoded_length(output))
+        return
+    if recorder is not None:
+        _write_timed(out, output, flusher, recorder)
+        return
+
+    with output_lock():
+        out.write(output)
+        flush_now = flusher.note_write(out, len(output))
+
+    # Flush outside the lock - a slow stream would otherwise stall all threads.
+    if flush_now:
+        out.flush()
+
+
+def _write_timed(
+    out: TextIO, output: str, flusher: Flusher, recorder: _counters.Recorder
+) -> None:
+    lock = current_lock()
+    started = _clock()
+    lock.acquire()
+    acquired = _clock()
+    try:
+        out.write(output)
+        flush_now = flusher.note_write(out, len(output))
+    finally:
+        lock.release()
+    released = _clock()
+    if flush_now:
+        out.flush()
+    recorder.record_write(
+        _counters.encoded_length(output),
+        acquired - started,
+        released - acquired,
+        _clock() - released,
+    )
+
+
+def _write_deduped(
+    out: TextIO,
+    output: str,
+    site: tuple[CodeType, int] | None,
+    digest: int,
+    window: float,
+    flusher: Flusher,
+) -> None:
+    write, summary = observe(site, digest, out, window)
+    if write:
+        _write(out, summary + output, flusher)
+    elif summary:
+        _write(out, summary, flusher)
+
+
+def _compile(
+    mode: str,
+    flusher: Flusher,
+    limits: FormatLimits,
+    window: float | None = None,
+    depth: int = 0,
+) -> _Emit:
+    """
+    Build the emit function for one (mode, flush policy, limits, dedup window,
+    stack depth) binding.
+    """
+    # Every variant builds its output before the lock so formatting never
+    # runs in the critical section.
+    if mode == "off":
+
+        def emit_off(
+            values: tuple[object, ...], sep: str, end: str, out: TextIO
+        ) -> None:
+            pass
+
+        return emit_off
+
+    if mode == "minimal":
+
+        def emit_minimal(
+            values: tuple[object, ...], sep: str, end: str, out: TextIO
+        ) -> None:
+            recorder = _counters._active
+            if recorder is None:
+                output = str_values(values, sep, limits) + end
+            else:
+                started = _clock()
+                output = str_values(values, sep, limits) + end
+                formatted = _clock()
+                site = capture_site(_EMIT_SKIP) if recorder.wants_site else None
+                recorder.record_call(
+                    "minimal", site, len(output), 0, formatted - started
+                )
+            if window is None:
+                _write(out, output, flusher)
+            else:
+                site = capture_site(_EMIT_SKIP)
+                _write_deduped(out, output, site, hash(output), window, flusher)
+
+        return emit_minimal
+
+    if mode == "json":
+        # Imported for json tracers only, keeping it out of package import.
+        from json.encoder import encode_basestring_ascii as encode
+
+        now = time.time
+        float_repr = float.__repr__
+
+        def emit_json(
+            values: tuple[object, ...], sep: str, end: str, out: TextIO
+        ) -> None:
+            # Assembled by hand around the call site's cached fields; the
+            # result is byte-identical to json.dumps() on the same dict.
+            recorder = _counters._active
+            if recorder is None:
+                fields = capture_json_fields(_EMIT_SKIP)
+                if depth:
+                    stack = stack_json(capture_stack(depth, _EMIT_SKIP))
+                    fields = f'{fields}, "stack": {stack}'
+                parts = format_parts(values, sep, limits)
+            else:
+                started = _clock()
+                fields = capture_json_fields(_EMIT_SKIP)
+                if depth:
+                    stack = stack_json(capture_stack(depth, _EMIT_SKIP))
+                    fields = f'{fields}, "stack": {stack}'
+                captured = _clock()
+                parts = format_parts(values, sep, limits)
+            record = (
+                f'{{"message": {encode(sep.join(parts))}, {fields}, '
+                f'"timestamp": {float_repr(now())}, '
+                f'"values": [{", ".join(map(encode, parts))}]}}'
+            )
+            if recorder is not None:
+                formatted = _clock()
+                site = capture_site(_EMIT_SKIP) if recorder.wants_site else None
+                recorder.record_call(
+                    "json",
+                    site,
+                    len(record) + len(end),
+                    captured - started,
+                    formatted - captured,
+                )
+            if window is None:
+                _write(out, record + end, flusher)
+            else:
+                # Everything but the timestamp.
+                digest = hash((fields, sep, end, *parts))
+                site = capture_site(_EMIT_SKIP)
+                _write_deduped(out, record + end, site, digest, window, flusher)
+
+        return emit_json
+
+    if mode == "binary":
+        # struct and the binary format load only when a binary tracer is built.
+        from .binary import write_event
+
+        def emit_binary(
+            values: tuple[object, ...], sep: str, end: str, out: TextIO
+        ) -> None:
+            recorder = _counters._active
+            if recorder is None:
+                site = capture_site(_EMIT_SKIP)
+                parts = format_parts(values, sep, limits)
+            else:
+                started = _clock()
+                site = capture_site(_EMIT_SKIP)
+                captured = _clock()
+                parts = format_parts(values, sep, limits)
+                # The encoded size is not known here; count the text.
+                length = sum(map(len, parts))
+                recorder.record_call(
+                    "binary", site, length, captured - started, _clock() - captured
+                )
+            write_event(out, site, parts, sep, end, flusher, current_task_name())
+
+        return emit_binary
+
+    def emit_verbose(
+        values: tuple[object, ...], sep: str, end: str, out: TextIO
+    ) -> None:
+        recorder = _counters._active
+        if recorder is None:
+            context = capture_prefix(_EMIT_SKIP)
+            if depth:
+                context += stack_text(capture_stack(depth, _EMIT_SKIP))
+            message = format_values(values, sep, limits)
+        else:
+            started = _clock()
+            context = capture_prefix(_EMIT_SKIP)
+            if depth:
+                context += stack_text(capture_stack(depth, _EMIT_SKIP))
+            captured = _clock()
+            message = format_values(values, sep, limits)
+            formatted = _clock()
+        output = f"{context} | {message}{end}"
+        if recorder is not None:
+            site = capture_site(_EMIT_SKIP) if recorder.wants_site else None
+            recorder.record_call(
+                "verbose", site, len(output), captured - started, formatted - captured
+            )
+        if window is None:
+            _write(out, output, flusher)
+        else:
+            site = capture_site(_EMIT_SKIP)
+            _write_deduped(out, output, site, hash(output), window, flusher)
+
+    return emit_verbose
@@ -0,0 +1,405 @@
+"""
+Opt-in background writer for printtrace.
+
+By default printtrace writes and flushes on the caller's thread. When the
+background writer is started, callers instead append the fully formatted
+record to a bounded queue and return; a single daemon thread drains the
+queue in arrival order, writing under ``output_lock()`` and flushing each
+touched stream once per batch. A stream with a ``write_records()`` method,
+such as :class:`~printtrace.sinks.FdSink`, is handed each run of
+consecutive records for it in one call.
+
+:func:`start_loop_writer` covers asyncio programs: records emitted on a
+thread that is running an event loop go to a background writer that never
+blocks, while other threads keep writing synchronously.
+
+:class:`~printtrace.shards.ShardedWriter` (``sharded=True``) replaces the
+single queue with per-thread buffers merged in sequence order, for
+workloads where many threads emit at once. Both kinds share the registry
+below: one background writer is active at a time.
+
+Constraints:
+- records are formatted before they are queued - the writer only writes
+- one writer thread; queue order is output order
+- a full queue never raises: the configured policy blocks or drops
+- pending records are drained at interpreter exit, bounded by a timeout
+- a forked child starts in synchronous mode: the writer thread did not
+  survive the fork, and records queued in the parent are the parent's
+"""
+
+from __future__ import annotations
+
+import atexit
+import contextlib
+import os
+import sys
+import threading
+from collections import deque
+from itertools import groupby
+from operator import itemgetter
+from typing import Literal, Protocol, TextIO
+
+from .sync import output_lock
+
+FullPolicy = Literal["block", "drop-newest", "drop-oldest"]
+_VALID_POLICIES: frozenset[str] = frozenset({"block", "drop-newest", "drop-oldest"})
+_LOOP_POLICIES: frozenset[str] = frozenset({"drop-newest", "drop-oldest"})
+
+DEFAULT_MAXSIZE = 10_000
+DEFAULT_DRAIN_TIMEOUT = 5.0
+
+# (stream, text, number of records dropped immediately before this one)
+_Record = tuple[TextIO, str, int]
+
+__all__ = [
+    "AsyncWriter",
+    "BackgroundWriter",
+    "FullPolicy",
+    "active_writer",
+    "start_async_writer",
+    "start_loop_writer",
+    "stop_async_writer",
+    "stop_loop_writer",
+    "write_notice",
+]
+
+
+class BackgroundWriter(Protocol):
+    """What the emit path needs from whichever background writer is active."""
+
+    def submit(self, stream: TextIO, text: str) -> bool: ...
+
+    def flush(self, timeout: float | None = None) -> bool: ...
+
+    def close(self, timeout: float | None = None) -> bool: ...
+
+
+class AsyncWriter:
+    """
+    Bounded queue drained by a single writer thread.
+
+    Parameters
+    ----------
+    maxsize:
+        Maximum number of queued records. Must be >= 1.
+    policy:
+        What :meth:`submit` does when the queue is full:
+
+        - ``"block"`` - wait until the writer makes room.
+        - ``"drop-newest"`` - discard the record being submitted.
+        - ``"drop-oldest"`` - discard the oldest queued record.
+
+        Dropped records are reported in the output as a single
+        ``[printtrace] dropped N records`` line at the position of the gap.
+    """
+
+    def __init__(self, maxsize: int = DEFAULT_MAXSIZE, policy: str = "block") -> None:
+        if maxsize < 1:
+            raise ValueError(f"maxsize must be >= 1, got {maxsize}.")
+        if policy not in _VALID_POLICIES:
+            raise ValueError(
+                f"Invalid full-queue policy {policy!r}. "
+                f"Expected one of: {sorted(_VALID_POLICIES)}."
+            )
+        self.maxsize = maxsize
+        self.policy = policy
+
+        self._queue: deque[_Record] = deque()
+        self._cond = threading.Condition(threading.Lock())
+        self._pending_drops = 0
+        self._busy = False
+        self._closed = False
+        self._thread = threading.Thread(
+            target=self._run, name="printtrace-writer", daemon=True
+        )
+        self._thread.start()
+
+    def submit(self, stream: TextIO, text: str) -> bool:
+        """
+        Queue *text* for writing to *stream*.
+
+        Returns ``False`` only if the writer has been closed, in which case
+        the caller is expected to write the record itself. A record discarded
+        by a drop policy still counts as accepted.
+        """
+        with self._cond:
+            if self._closed:
+                return False
+            if len(self._queue) >= self.maxsize:
+                if self.policy == "block":
+                    while len(self._queue) >= self.maxsize and not self._closed:
+                        self._cond.wait()
+                    if self._closed:
+                        return False
+                elif self.policy == "drop-newest":
+                    self._pending_drops += 1
+                    return True
+                else:
+                    self._drop_oldest()
+            self._queue.append((stream, text, self._pending_drops))
+            self._pending_drops = 0
+            self._cond.notify_all()
+        return True
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """
+        Wait until every queued record has been written and flushed.
+
+        Returns ``False`` if *timeout* expired first.
+        """
+        with self._cond:
+            return self._cond.wait_for(
+                lambda: not self._queue and not self._busy, timeout
+            )
+
+    def close(self, timeout: float | None = DEFAULT_DRAIN_TIMEOUT) -> bool:
+        """
+        Stop accepting records and drain the queue.
+
+        Returns ``False`` if the writer thread did not finish within
+        *timeout*; records still queued at that point are lost.
+        """
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+        return not self._thread.is_alive()
+
+    def _drop_oldest(self) -> None:
+        # Called with self._cond held and the queue full.
+        _, _, dropped = self._queue.popleft()
+        carried = dropped + 1
+        if self._queue:
+            stream, text, head_dropped = self._queue[0]
+            self._queue[0] = (stream, text, head_dropped + carried)
+        else:
+            self._pending_drops += carried
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._queue and not self._closed:
+                    self._cond.wait()
+                if not self._queue:
+                    self._cond.notify_all()
+                    return
+                batch = list(self._queue)
+                self._queue.clear()
+                self._busy = True
+                self._cond.notify_all()
+
+            try:
+                _write_batch(batch)
+            finally:
+                with self._cond:
+                    self._busy = False
+                    self._cond.notify_all()
+
+
+def _write_batch(batch: list[_Record]) -> None:
+    touched: dict[int, TextIO] = {}
+    for stream, run in groupby(batch, key=itemgetter(0)):
+        texts = [
+            _drop_marker(dropped) + text if dropped else text
+            for _, text, dropped in run
+        ]
+        # The writer thread has no caller to report to: a broken stream loses
+        # its records but must not stop the other streams from being served.
+        write_records = getattr(stream, "write_records", None)
+        if write_records is not None:
+            # A sink that batches itself, e.g. with writev: one call per run.
+            try:
+                with output_lock():
+                    write_records(texts)
+            except Exception:
+                continue
+            touched[id(stream)] = stream
+            continue
+        for text in texts:
+            try:
+                with output_lock():
+                    stream.write(text)
+            except Exception:
+                continue
+            touched[id(stream)] = stream
+
+    # One flush per stream per batch, outside the lock.
+    for stream in touched.values():
+        with contextlib.suppress(Exception):
+            stream.flush()
+
+
+def write_notice(stream: TextIO, text: str) -> None:
+    """
+    Write a ``[printtrace]`` notice line that is not itself a trace record.
+
+    Goes through the active background writer, if any, so it stays in order
+    with the records around it. Best effort: a binary or closed stream
+    simply gets no notice.
+    """
+    writer = active_writer()
+    if writer is not None and writer.submit(stream, text):
+        return
+    try:
+        with output_lock():
+            stream.write(text)
+        stream.flush()
+    except Exception:
+        pass
+
+
+def _drop_marker(count: int) -> str:
+    noun = "record" if count == 1 else "records"
+    return f"[printtrace] dropped {count} {noun}\n"
+
+
+_active: BackgroundWriter | None = None
+# Used for event-loop threads while no other background writer is active.
+_loop_writer: AsyncWriter | None = None
+_drain_timeout: float = DEFAULT_DRAIN_TIMEOUT
+_control_lock = threading.Lock()
+_atexit_registered = False
+
+
+def active_writer() -> BackgroundWriter | None:
+    """
+    Return the background writer for the calling thread, or ``None`` to write
+    synchronously.
+    """
+    writer = _active
+    if writer is None and _loop_writer is not None and _on_loop_thread():
+        return _loop_writer
+    return writer
+
+
+def _on_loop_thread() -> bool:
+    # A program that has not imported asyncio is not running a loop.
+    aio = sys.modules.get("asyncio")
+    return aio is not None and aio._get_running_loop() is not None
+
+
+def start_async_writer(
+    *,
+    maxsize: int = DEFAULT_MAXSIZE,
+    policy: FullPolicy = "block",
+    drain_timeout: float = DEFAULT_DRAIN_TIMEOUT,
+    sharded: bool = False,
+) -> BackgroundWriter:
+    """
+    Switch printtrace to background writing.
+
+    Any previously running writer is drained and replaced. Records still
+    queued at interpreter exit are drained for at most *drain_timeout*
+    seconds.
+
+    With ``sharded=True`` each thread buffers its own records and
+    *maxsize* applies per thread; ``"drop-oldest"`` is not available.
+
+    Raises
+    ------
+    ValueError
+        If *maxsize* is less than 1 or *policy* is not a valid policy.
+    """
+    global _active, _drain_timeout, _atexit_registered
+
+    new: BackgroundWriter
+    if sharded:
+        from .shards import ShardedWriter
+
+        new = ShardedWriter(maxsize=maxsize, policy=policy)
+    else:
+        new = AsyncWriter(maxsize=maxsize, policy=policy)
+    with _control_lock:
+        old, _active = _active, new
+        _drain_timeout = drain_timeout
+        if not _atexit_registered:
+            atexit.register(_drain_at_exit)
+            _atexit_registered = True
+    if old is not None:
+        old.close(drain_timeout)
+    return new
+
+
+def stop_async_writer(timeout: float | None = DEFAULT_DRAIN_TIMEOUT) -> bool:
+    """
+    Drain the background writer and return to synchronous writing.
+
+    Returns ``False`` if the queue could not be drained within *timeout*.
+    """
+    global _active
+
+    with _control_lock:
+        old, _active = _active, None
+    if old is None:
+        return True
+    return old.close(timeout)
+
+
+def start_loop_writer(
+    *,
+    maxsize: int = DEFAULT_MAXSIZE,
+    policy: FullPolicy = "drop-newest",
+    drain_timeout: float = DEFAULT_DRAIN_TIMEOUT,
+) -> AsyncWriter:
+    """
+    Never block an asyncio event loop on output.
+
+    Records emitted on a thread that is running an event loop are queued for
+    a background writer thread; a full queue drops records rather than
+    waiting. Other threads keep writing synchronously. A writer started with
+    :func:`start_async_writer` takes precedence on every thread.
+
+    Raises
+    ------
+    ValueError
+        If *maxsize* is less than 1 or *policy* is not a dropping policy.
+    """
+    global _loop_writer, _drain_timeout, _atexit_registered
+
+    if policy not in _LOOP_POLICIES:
+        raise ValueError(
+            f"Invalid loop writer policy {policy!r}. "
+            f"Expected one of: {sorted(_LOOP_POLICIES)}."
+        )
+    new = AsyncWriter(maxsize=maxsize, policy=policy)
+    with _control_lock:
+        old, _loop_writer = _loop_writer, new
+        _drain_timeout = drain_timeout
+        if not _atexit_registered:
+            atexit.register(_drain_at_exit)
+            _atexit_registered = True
+    if old is not None:
+        old.close(drain_timeout)
+    return new
+
+
+def stop_loop_writer(timeout: float | None = DEFAULT_DRAIN_TIMEOUT) -> bool:
+    """
+    Drain the event-loop writer; loop threads write synchronously again.
+
+    Returns ``False`` if the queue could not be drained within *timeout*.
+    """
+    global _loop_writer
+
+    with _control_lock:
+        old, _loop_writer = _loop_writer, None
+    if old is None:
+        return True
+    return old.close(timeout)
+
+
+def _drain_at_exit() -> None:
+    stop_async_writer(_drain_timeout)
+    stop_loop_writer(_drain_timeout)
+
+
+def _reinit_after_fork() -> None:
+    global _active, _loop_writer, _control_lock
+
+    _active = None
+    _loop_writer = None
+    _control_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reinit_after_fork)
@@ -0,0 +1,221 @@
+from __future__ import annotations
+
+import io
+import subprocess
+import sys
+import textwrap
+import threading
+
+import pytest
+
+from printtrace import printtrace, start_async_writer, stop_async_writer
+from printtrace.writer import AsyncWriter, active_writer
+
+
+class GatedWriter:
+    """Stream whose write() blocks until released, to hold the writer thread."""
+
+    def __init__(self) -> None:
+        self.buffer = io.StringIO()
+        self.entered = threading.Event()
+        self.release = threading.Event()
+        self.flushes = 0
+
+    def write(self, data: str) -> None:
+        self.entered.set()
+        self.release.wait(5)
+        self.buffer.write(data)
+
+    def flush(self) -> None:
+        self.flushes += 1
+
+    def lines(self) -> list[str]:
+        return self.buffer.getvalue().splitlines()
+
+
+@pytest.fixture
+def async_mode():
+    writer = start_async_writer()
+    yield writer
+    stop_async_writer()
+
+
+def _fill_behind_gate(writer: AsyncWriter, stream: GatedWriter, count: int) -> None:
+    # The first record occupies the writer thread; the rest sit in the queue.
+    writer.submit(stream, "held\n")
+    assert stream.entered.wait(5)
+    for i in range(count):
+        writer.submit(stream, f"r{i}\n")
+
+
+def test_records_written_in_arrival_order(async_mode, capture_output):
+    writer, get_lines = capture_output
+
+    for i in range(200):
+        printtrace("line", i, file=writer, mode="minimal")
+
+    assert async_mode.flush(5)
+    assert get_lines() == [f"line {i}" for i in range(200)]
+
+
+def test_concurrent_callers_all_lines_present(async_mode, capture_output):
+    writer, get_lines = capture_output
+
+    def worker(i: int) -> None:
+        for j in range(20):
+            printtrace(f"t{i}-{j}", file=writer, mode="minimal")
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert async_mode.flush(5)
+    lines = get_lines()
+    assert len(lines) == 160
+    # Per-thread order is preserved.
+    for i in range(8):
+        mine = [line for line in lines if line.startswith(f"t{i}-")]
+        assert mine == [f"t{i}-{j}" for j in range(20)]
+
+
+def test_stop_returns_to_synchronous_writes():
+    start_async_writer()
+    assert active_writer() is not None
+    assert stop_async_writer()
+    assert active_writer() is None
+
+    buf = io.StringIO()
+    printtrace("sync", file=buf, mode="minimal")
+    assert buf.getvalue() == "sync\n"
+
+
+def test_stop_drains_pending_records(capture_output):
+    writer, get_lines = capture_output
+    start_async_writer()
+    for i in range(50):
+        printtrace(i, file=writer, mode="minimal")
+    assert stop_async_writer()
+    assert len(get_lines()) == 50
+
+
+def test_flush_once_per_batch():
+    stream = GatedWriter()
+    writer = AsyncWriter(maxsize=100)
+    _fill_behind_gate(writer, stream, 10)
+    stream.release.set()
+    assert writer.flush(5)
+    writer.close()
+    # One batch for "held", one for the ten queued behind it.
+    assert stream.flushes == 2
+
+
+def test_drop_newest_keeps_queued_records():
+    stream = GatedWriter()
+    writer = AsyncWriter(maxsize=3, policy="drop-newest")
+    _fill_behind_gate(writer, stream, 5)
+    stream.release.set()
+    assert writer.flush(5)
+    writer.submit(stream, "after\n")
+    writer.close()
+
+    assert stream.lines() == [
+        "held",
+        "r0",
+        "r1",
+        "r2",
+        "[printtrace] dropped 2 records",
+        "after",
+    ]
+
+
+def test_drop_oldest_keeps_newest_records():
+    stream = GatedWriter()
+    writer = AsyncWriter(maxsize=3, policy="drop-oldest")
+    _fill_behind_gate(writer, stream, 5)
+    stream.release.set()
+    writer.close()
+
+    assert stream.lines() == [
+        "held",
+        "[printtrace] dropped 2 records",
+        "r2",
+        "r3",
+        "r4",
+    ]
+
+
+def test_block_policy_loses_nothing():
+    stream = GatedWriter()
+    writer = AsyncWriter(maxsize=2, policy="block")
+    writer.submit(stream, "held\n")
+    assert stream.entered.wait(5)
+
+    def producer() -> None:
+        for i in range(5):
+            writer.submit(stream, f"r{i}\n")
+
+    t = threading.Thread(target=producer)
+    t.start()
+    t.join(0.1)
+    assert t.is_alive(), "producer should block on a full queue"
+
+    stream.release.set()
+    t.join(5)
+    writer.close()
+    assert stream.lines() == ["held"] + [f"r{i}" for i in range(5)]
+
+
+def test_broken_stream_does_not_kill_writer(capture_output):
+    class Broken:
+        def write(self, data: str) -> None:
+            raise OSError("disk on fire")
+
+        def flush(self) -> None:
+            pass
+
+    good, get_lines = capture_output
+    writer = AsyncWriter()
+    writer.submit(Broken(), "lost\n")  # type: ignore[arg-type]
+    writer.submit(good, "kept\n")  # type: ignore[arg-type]
+    writer.close()
+    assert get_lines() == ["kept"]
+
+
+def test_closed_writer_rejects_submit():
+    writer = AsyncWriter()
+    writer.close()
+    assert writer.submit(io.StringIO(), "x\n") is False
+
+
+def test_invalid_policy_raises():
+    with pytest.raises(ValueError, match="drop-sideways"):
+        AsyncWriter(policy="drop-sideways")
+
+
+def test_invalid_maxsize_raises():
+    with pytest.raises(ValueError):
+        AsyncWriter(maxsize=0)
+
+
+def test_queued_records_drained_at_exit():
+    script = textwrap.dedent(
+        """
+        from printtrace import printtrace, start_async_writer
+        start_async_writer()
+        for i in range(1000):
+            printtrace("line", i, mode="minimal")
+        """
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", script],
+        capture_output=True,
+        text=True,
+        timeout=30,
+    )
+    assert result.returncode == 0, result.stderr
+    lines = result.stdout.splitlines()
+    assert len(lines) == 1000
+    assert lines[0] == "line 0"
+    assert lines[-1] == "line 999"
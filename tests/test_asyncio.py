@@ -0,0 +1,171 @@
+from __future__ import annotations
+
+import asyncio
+import io
+import json
+import threading
+import time
+
+import pytest
+
+from printtrace import Tracer, printtrace, start_loop_writer, stop_loop_writer
+from printtrace.binary import read_events
+from printtrace import context
+from printtrace.context import (
+    capture_context,
+    capture_json_fields,
+    capture_prefix,
+    render_context,
+    render_json_fields,
+)
+from printtrace.writer import active_writer
+
+# Each write to the throttled stream takes this long.
+_STALL = 0.05
+
+
+class ThrottledStream:
+    """A stdout that has stalled: every write blocks for a while."""
+
+    def __init__(self) -> None:
+        self.buffer = io.StringIO()
+        self.lock = threading.Lock()
+
+    def write(self, data: str) -> int:
+        time.sleep(_STALL)
+        with self.lock:
+            return self.buffer.write(data)
+
+    def flush(self) -> None:
+        pass
+
+
+async def _max_loop_lag(stream: ThrottledStream, records: int) -> float:
+    """Emit *records* from one task while another measures loop lag."""
+    lag = 0.0
+    done = asyncio.Event()
+
+    async def ticker() -> None:
+        nonlocal lag
+        while not done.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(0.005)
+            lag = max(lag, time.perf_counter() - start - 0.005)
+
+    async def emitter() -> None:
+        for i in range(records):
+            printtrace("tick", i, file=stream, mode="minimal")  # type: ignore[arg-type]
+            await asyncio.sleep(0.01)
+        done.set()
+
+    await asyncio.gather(ticker(), emitter())
+    return lag
+
+
+@pytest.fixture
+def loop_writer():
+    writer = start_loop_writer()
+    yield writer
+    stop_loop_writer()
+
+
+def test_task_name_in_context():
+    async def main() -> str:
+        buf = io.StringIO()
+        printtrace("x", file=buf)
+        return buf.getvalue()
+
+    async def run() -> str:
+        return await asyncio.create_task(main(), name="worker-7")
+
+    out = asyncio.run(run())
+    assert out.startswith("[MainThread:worker-7] test_asyncio.py:")
+
+
+def test_capture_context_task_name():
+    async def main() -> str | None:
+        return capture_context(skip=1).task_name
+
+    assert asyncio.run(main()) is not None
+    assert capture_context(skip=1).task_name is None
+
+
+def test_same_site_in_different_tasks():
+    async def emit(buf: io.StringIO) -> None:
+        printtrace("x", file=buf, mode="json")
+
+    async def main() -> list[str | None]:
+        bufs = [io.StringIO(), io.StringIO()]
+        await asyncio.gather(
+            asyncio.create_task(emit(bufs[0]), name="a"),
+            asyncio.create_task(emit(bufs[1]), name="b"),
+        )
+        return [json.loads(buf.getvalue())["task"] for buf in bufs]
+
+    assert asyncio.run(main()) == ["a", "b"]
+
+
+def test_context_cache_does_not_grow_per_task():
+    def captured() -> tuple[str, str, str, str]:
+        ctx = capture_context(skip=2)
+        expected = render_context(ctx), render_json_fields(ctx)
+        return capture_prefix(2), capture_json_fields(2), *expected
+
+    async def site() -> tuple[str, str, str, str]:
+        return captured()
+
+    async def main() -> list[tuple[str, str, str, str]]:
+        names = ["req-1", 'quote"d', "naïve ☃", "req-4"]
+        return await asyncio.gather(
+            *(asyncio.create_task(site(), name=name) for name in names)
+        )
+
+    before = len(context._cache.prefixes), len(context._cache.json_fields)
+    results = asyncio.run(main())
+    for prefix, fields, expected_prefix, expected_fields in results:
+        assert prefix == expected_prefix
+        assert fields == expected_fields
+    assert len({prefix for prefix, *_ in results}) == 4
+    after = len(context._cache.prefixes), len(context._cache.json_fields)
+    assert after[0] - before[0] <= 1
+    assert after[1] - before[1] <= 1
+
+
+def test_binary_mode_keeps_task_name():
+    buf = io.BytesIO()
+
+    async def main() -> None:
+        Tracer("binary", file=buf)("x")
+
+    asyncio.run(main())
+    (event,) = read_events(io.BytesIO(buf.getvalue()))
+    assert event.context.task_name is not None
+
+
+def test_loop_writer_only_serves_loop_threads(loop_writer):
+    assert active_writer() is None
+
+    async def main() -> object:
+        return active_writer()
+
+    assert asyncio.run(main()) is loop_writer
+
+
+def test_loop_lag_stays_flat_with_throttled_stream(loop_writer):
+    stream = ThrottledStream()
+    lag = asyncio.run(_max_loop_lag(stream, records=10))
+    assert loop_writer.flush(5)
+
+    assert lag < _STALL / 2
+    assert stream.buffer.getvalue() == "".join(f"tick {i}\n" for i in range(10))
+
+
+def test_loop_lag_without_loop_writer():
+    # The contrast: writing on the loop thread stalls every coroutine.
+    lag = asyncio.run(_max_loop_lag(ThrottledStream(), records=3))
+    assert lag >= _STALL * 0.8
+
+
+def test_loop_writer_rejects_blocking_policy():
+    with pytest.raises(ValueError, match="block"):
+        start_loop_writer(policy="block")
@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+import json
+
+import pytest
+
+from printtrace import bench
+
+
+def _result(**values: float) -> dict[str, object]:
+    return {
+        "schema": bench.SCHEMA,
+        "metrics": {
+            name.replace("_", "."): {
+                "value": value,
+                "unit": "rec/s" if name.startswith("threads") else "ns/call",
+                "higher_is_better": name.startswith("threads"),
+            }
+            for name, value in values.items()
+        },
+    }
+
+
+def test_compare_flags_slowdowns_in_the_right_direction():
+    baseline = _result(call_verbose=1000, call_json=1000, threads_null_8=1000)
+    current = _result(call_verbose=1200, call_json=1050, threads_null_8=800)
+    changes = {c.name: c for c in bench.compare(baseline, current, 0.10)}
+    assert changes["call.verbose"].regressed
+    assert changes["call.verbose"].change == pytest.approx(-0.2)
+    assert not changes["call.json"].regressed
+    assert changes["threads.null.8"].regressed
+    assert changes["threads.null.8"].change == pytest.approx(-0.2)
+
+
+def test_compare_skips_metrics_missing_from_the_baseline():
+    changes = bench.compare(_result(call_verbose=1), _result(call_json=1))
+    assert changes == []
+
+
+def test_compare_rejects_foreign_json():
+    with pytest.raises(ValueError):
+        bench.compare({"metrics": {}}, _result())
+
+
+def test_run_writes_json_and_compares(tmp_path, capsys):
+    output = tmp_path / "base.json"
+    argv = ["--quick", "--only", "context.capture_site", "--output", str(output)]
+    assert bench.main(argv) == 0
+    saved = json.loads(output.read_text())
+    assert list(saved["metrics"]) == ["context.capture_site"]
+    metric = saved["metrics"]["context.capture_site"]
+    assert metric["unit"] == "ns/call"
+    assert metric["value"] > 0
+
+    argv = ["--quick", "--only", "context.capture_site", "--compare", str(output)]
+    assert bench.main([*argv, "--threshold", "100"]) == 0
+    assert "context.capture_site" in capsys.readouterr().out
+
+
+def test_unreadable_baseline_is_an_error(tmp_path, capsys):
+    missing = tmp_path / "missing.json"
+    assert bench.main(["--quick", "--compare", str(missing)]) == 1
+    assert "missing.json" in capsys.readouterr().err
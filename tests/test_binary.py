@@ -0,0 +1,219 @@
+from __future__ import annotations
+
+import io
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from printtrace import Tracer, printtrace
+from printtrace.binary import decode, read_events
+
+
+def _decoded(data: bytes, fmt: str = "verbose") -> str:
+    out = io.StringIO()
+    decode(io.BytesIO(data), out, fmt)
+    return out.getvalue()
+
+
+def test_decode_matches_verbose_output():
+    binary = io.BytesIO()
+    text = io.StringIO()
+    trace_bin = Tracer("binary", file=binary)
+    trace_text = Tracer("verbose", file=text)
+    for i in range(3):
+        for trace in (trace_bin, trace_text):
+            trace("hello", {"i": i}, [1.5, None])
+
+    assert _decoded(binary.getvalue()) == text.getvalue()
+
+
+def test_decode_json_is_byte_compatible():
+    buf = io.BytesIO()
+    before = time.time()
+    Tracer("binary", file=buf)("naïve ☃", 42)
+    line = _decoded(buf.getvalue(), "json").rstrip("\n")
+    data = json.loads(line)
+    assert json.dumps(data) == line
+    assert data["values"] == ["'naïve ☃'", "42"]
+    assert data["function"] == "test_decode_json_is_byte_compatible"
+    assert before - 1 <= data["timestamp"] <= time.time() + 1
+
+
+def test_custom_sep_and_end_round_trip():
+    binary = io.BytesIO()
+    text = io.StringIO()
+    for out, mode in ((binary, "binary"), (text, "verbose")):
+        printtrace("a", "b", sep=" / ", end="!\n", file=out, mode=mode)
+    assert _decoded(binary.getvalue()) == text.getvalue()
+
+
+def test_definitions_are_written_once_per_stream():
+    buf = io.BytesIO()
+    trace = Tracer("binary", file=buf)
+    for _ in range(10):
+        trace("x")
+    data = buf.getvalue()
+    assert data.count(b"test_binary.py") == 1
+    assert data.count(b"MainThread") == 1
+    assert len(list(read_events(io.BytesIO(data)))) == 10
+
+
+def test_failed_write_does_not_mark_definitions_sent():
+    class Flaky(io.BytesIO):
+        fail = True
+
+        def write(self, data: bytes) -> int:  # type: ignore[override]
+            if self.fail:
+                self.fail = False
+                raise OSError("disk full")
+            return super().write(data)
+
+    buf = Flaky()
+    trace = Tracer("binary", file=buf)
+    with pytest.raises(OSError):
+        trace("lost")
+    trace("kept")
+    assert "kept" in _decoded(buf.getvalue())
+    assert "test_binary.py" in _decoded(buf.getvalue())
+
+
+def test_each_thread_is_defined():
+    buf = io.BytesIO()
+    trace = Tracer("binary", file=buf)
+
+    def run() -> None:
+        trace("from worker")
+
+    worker = threading.Thread(target=run, name="worker-1")
+    worker.start()
+    worker.join()
+    trace("from main")
+
+    events = read_events(io.BytesIO(buf.getvalue()))
+    threads = [event.context.thread_name for event in events]
+    assert threads == ["worker-1", "MainThread"]
+
+
+def test_concatenated_sessions_decode():
+    first = io.BytesIO()
+    second = io.BytesIO()
+    Tracer("binary", file=first)("one")
+    Tracer("binary", file=second)("two")
+    events = list(read_events(io.BytesIO(first.getvalue() + second.getvalue())))
+    assert [event.values for event in events] == [["'one'"], ["'two'"]]
+
+
+def test_interleaved_sessions_keep_their_definitions(tmp_path):
+    path = tmp_path / "trace.bin"
+
+    def from_first(out: object, text: str) -> None:
+        Tracer("binary", file=out)(text)  # type: ignore[arg-type]
+
+    def from_second(out: object, text: str) -> None:
+        Tracer("binary", file=out)(text)  # type: ignore[arg-type]
+
+    with (
+        open(path, "ab", buffering=0) as first,
+        open(path, "ab", buffering=0) as second,
+    ):
+        from_first(first, "one")
+        from_second(second, "two")
+        from_first(first, "three")
+    with open(path, "rb") as stream:
+        events = list(read_events(stream))
+    assert [(event.values, event.context.function) for event in events] == [
+        (["'one'"], "from_first"),
+        (["'two'"], "from_second"),
+        (["'three'"], "from_first"),
+    ]
+    assert {event.context.thread_name for event in events} == {"MainThread"}
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs fork")
+def test_forked_child_and_parent_never_share_a_site_id(tmp_path):
+    path = tmp_path / "trace.bin"
+    ready, go = os.pipe()
+    with open(path, "ab", buffering=0) as out:
+        trace = Tracer("binary", file=out)
+
+        def in_child() -> None:
+            trace("child")
+
+        def in_parent() -> None:
+            trace("parent")
+
+        pid = os.fork()
+        if pid == 0:
+            try:
+                os.read(ready, 1)
+                in_child()
+            finally:
+                os._exit(0)
+        in_parent()
+        os.write(go, b"x")
+        os.waitpid(pid, 0)
+        in_parent()
+    os.close(ready)
+    os.close(go)
+    with open(path, "rb") as stream:
+        events = list(read_events(stream))
+    assert [(event.values, event.context.function) for event in events] == [
+        (["'parent'"], "in_parent"),
+        (["'child'"], "in_child"),
+        (["'parent'"], "in_parent"),
+    ]
+    assert [event.context.pid for event in events] == [os.getpid(), pid, os.getpid()]
+
+
+def test_truncated_final_record_is_ignored():
+    buf = io.BytesIO()
+    trace = Tracer("binary", file=buf)
+    trace("complete")
+    trace("cut short")
+    data = buf.getvalue()[:-3]
+    events = list(read_events(io.BytesIO(data)))
+    assert [event.values for event in events] == [["'complete'"]]
+
+
+def test_not_a_trace_raises():
+    with pytest.raises(ValueError, match="Not a printtrace binary trace"):
+        list(read_events(io.BytesIO(b"\x05\x00\x00\x00hello")))
+
+
+def test_invalid_decode_format_raises():
+    with pytest.raises(ValueError, match="yaml"):
+        decode(io.BytesIO(b""), io.StringIO(), "yaml")
+
+
+def test_decode_cli(tmp_path):
+    path = tmp_path / "trace.bin"
+    with open(path, "wb") as out:
+        Tracer("binary", file=out)("from file", 7)
+
+    result = subprocess.run(
+        [sys.executable, "-m", "printtrace", "decode", str(path)],
+        capture_output=True,
+        text=True,
+        timeout=30,
+    )
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.endswith(" | 'from file' 7\n")
+    assert "in test_decode_cli" in result.stdout
+
+
+def test_decode_cli_reports_bad_input(tmp_path):
+    path = tmp_path / "not-a-trace.bin"
+    path.write_bytes(b"\x01\x00\x00\x00\x07")
+    result = subprocess.run(
+        [sys.executable, "-m", "printtrace", "decode", str(path)],
+        capture_output=True,
+        text=True,
+        timeout=30,
+    )
+    assert result.returncode == 1
+    assert "Not a printtrace binary trace" in result.stderr
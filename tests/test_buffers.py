@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+import ctypes
+import mmap
+from array import array
+
+from printtrace.formatting import MAX_STR_LEN, format_value
+
+
+class Exploding:
+    """Array-like whose repr must never be called."""
+
+    shape = (3, 224, 224)
+    dtype = "float32"
+
+    def __repr__(self) -> str:
+        raise AssertionError("repr() called on a large array")
+
+
+def test_short_bytes_keep_repr():
+    assert format_value(b"hi\x00") == "b'hi\\x00'"
+    assert format_value(bytearray(b"ab")) == "bytearray(b'ab')"
+
+
+def test_large_bytes_are_summarized():
+    payload = b"HTTP/1.1 200 OK\r\n" + bytes(1 << 20)
+    out = format_value(payload)
+    assert out.startswith(f"<bytes len={len(payload)} ")
+    assert "hex=48 54 54 50 2f 31 2e 31 20 32 30 30 20 4f 4b 0d …" in out
+    assert "ascii='HTTP/1.1 200 OK.'" in out
+    assert len(out) < 200
+
+
+def test_bytearray_summary_names_its_type():
+    out = format_value(bytearray(MAX_STR_LEN + 1))
+    assert out.startswith(f"<bytearray len={MAX_STR_LEN + 1} ")
+
+
+def test_memoryview_is_always_summarized():
+    out = format_value(memoryview(b"abc"))
+    assert out == "<memoryview len=3 format='B' hex=61 62 63 ascii='abc'>"
+
+
+def test_released_memoryview():
+    view = memoryview(b"abc")
+    view.release()
+    assert format_value(view) == "<memoryview released>"
+
+
+def test_multidimensional_memoryview_shows_shape():
+    view = memoryview(bytes(64)).cast("B", (8, 8))
+    out = format_value(view)
+    assert "shape=(8, 8)" in out
+    assert "nbytes=64" in out
+
+
+def test_non_contiguous_memoryview_has_no_preview():
+    out = format_value(memoryview(bytes(64))[::2])
+    assert out == "<memoryview len=32 format='B'>"
+
+
+def test_small_array_keeps_repr():
+    assert format_value(array("i", [1, 2])) == "array('i', [1, 2])"
+
+
+def test_large_array_shows_typed_items():
+    out = format_value(array("d", range(100_000)))
+    assert out == "<array len=100000 format='d' nbytes=800000 head=[0.0, 1.0, …]>"
+
+
+def test_unpackable_format_shows_raw_bytes():
+    short = format_value(memoryview((ctypes.c_int * 2)(1, 2)))
+    assert short.endswith("hex=01 00 00 00 02 00 00 00>")
+    long = format_value(memoryview((ctypes.c_int * 20)()))
+    assert long.endswith(" …>")
+
+
+def test_array_like_is_summarized_without_repr():
+    out = format_value(Exploding())
+    assert out == "<Exploding shape=(3, 224, 224) dtype=float32>"
+
+
+def test_array_interface_is_used_for_shape():
+    class Interfaced:
+        __array_interface__ = {"shape": (1000,), "typestr": "<f8", "version": 3}
+
+        def __repr__(self) -> str:
+            raise AssertionError
+
+    assert format_value(Interfaced()) == "<Interfaced shape=(1000,) dtype=<f8>"
+
+
+def test_array_like_refusing_its_buffer_is_still_summarized():
+    class Frame(mmap.mmap):
+        shape = (4096,)
+        dtype = "uint8"
+
+    frame = Frame(-1, 4096)
+    frame.close()  # memoryview() now raises ValueError
+    assert format_value(frame) == "<Frame shape=(4096,) dtype=uint8>"
+
+
+def test_small_array_like_keeps_repr():
+    class Small:
+        shape = (2,)
+        dtype = "int64"
+
+        def __repr__(self) -> str:
+            return "Small([1, 2])"
+
+    assert format_value(Small()) == "Small([1, 2])"
+
+
+def test_buffers_inside_containers():
+    out = format_value({"frame": b"x" * 1000})
+    assert out.startswith("{'frame': <bytes len=1000 ")
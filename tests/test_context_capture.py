@@ -5,7 +5,7 @@ import inspect
 import threading
 
 from printtrace import printtrace
-from printtrace.context import capture_context
+from printtrace.context import capture_context, capture_prefix, render_context
 
 
 def _emit(buf: io.StringIO) -> str:
@@ -62,3 +62,58 @@ def test_huge_skip_returns_fallback():
 def test_negative_skip_clamped():
     ctx = capture_context(skip=-1)
     assert ctx.function == "capture_context"
+
+
+def _prefix_here() -> str:
+    return capture_prefix(skip=1)
+
+
+def test_capture_prefix_matches_rendered_context():
+    ctx = capture_context(skip=0)
+    prefix = capture_prefix(skip=0)
+    assert prefix.startswith(f"[{ctx.thread_name}] ")
+    assert "context.py:" in prefix
+    assert prefix.endswith("in capture_prefix")
+    assert render_context(ctx).endswith("in capture_context")
+
+
+def test_warm_call_site_reuses_cached_prefix():
+    prefixes = [_prefix_here() for _ in range(3)]
+    assert prefixes[0] is prefixes[1] is prefixes[2]
+
+
+def test_distinct_lines_get_distinct_prefixes():
+    first = capture_prefix(skip=1)
+    second = capture_prefix(skip=1)
+    assert first != second
+
+
+def test_prefix_cache_is_per_thread():
+    results: dict[str, str] = {}
+
+    def worker(name: str) -> None:
+        results[name] = _prefix_here()
+
+    threads = [
+        threading.Thread(target=worker, args=(f"pt-{i}",), name=f"pt-{i}")
+        for i in range(3)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    for name, prefix in results.items():
+        assert prefix.startswith(f"[{name}] ")
+
+
+def test_huge_skip_prefix_returns_fallback():
+    assert capture_prefix(skip=9999).endswith("<unknown>:0 in <unknown>")
+
+
+def test_call_context_is_tuple_backed():
+    ctx = capture_context(skip=0)
+    assert isinstance(ctx, tuple)
+    filename, lineno, function, thread_name, pid, process_name, task_name = ctx
+    assert function == "capture_context"
+    assert not hasattr(ctx, "__dict__")
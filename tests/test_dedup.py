@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+import io
+import json
+import subprocess
+import sys
+import textwrap
+import threading
+
+import pytest
+
+from printtrace import Tracer, printtrace, report_repeats
+from printtrace import dedup
+
+
+def test_repeats_are_collapsed_until_the_message_changes():
+    buf = io.StringIO()
+    for value in ["a", "a", "a", "b", "b", "c"]:
+        printtrace(value, file=buf, mode="minimal", dedup=True)
+    lines = buf.getvalue().splitlines()
+    assert lines[0] == "a"
+    assert lines[1].startswith("[printtrace] test_dedup.py:")
+    assert lines[1].endswith(
+        " in test_repeats_are_collapsed_until_the_message_changes: "
+        "previous line repeated 2 times"
+    )
+    assert lines[2] == "b"
+    assert lines[3].endswith("previous line repeated 1 time")
+    assert lines[4] == "c"
+    assert len(lines) == 5
+
+
+def test_sites_are_independent():
+    buf = io.StringIO()
+    trace = Tracer("minimal", file=buf, dedup=True)
+    for _ in range(3):
+        trace("x")
+        trace("x")
+    assert buf.getvalue().splitlines() == ["x", "x"]
+
+
+def test_same_line_to_another_stream_is_written():
+    first, second = io.StringIO(), io.StringIO()
+    for _ in range(2):
+        for out in (first, second):
+            printtrace("same", file=out, mode="minimal", dedup=True)
+    assert first.getvalue().splitlines() == ["same", "same"]
+    assert second.getvalue().splitlines() == ["same", "same"]
+
+
+def test_summary_goes_to_the_stream_that_saw_the_repeats():
+    first, second = io.StringIO(), io.StringIO()
+    for out in (first, first, first, second):
+        printtrace("same", file=out, mode="minimal", dedup=True)
+    assert first.getvalue().splitlines()[0] == "same"
+    assert first.getvalue().splitlines()[1].endswith("repeated 2 times")
+    assert second.getvalue().splitlines() == ["same"]
+
+
+def test_window_end_writes_summary(monkeypatch):
+    clock = [0.0]
+    monkeypatch.setattr(dedup.time, "monotonic", lambda: clock[0])
+    buf = io.StringIO()
+    trace = Tracer("minimal", file=buf, dedup=5)
+    for i in range(10):
+        trace("stuck")
+        if i == 5:
+            clock[0] += 5.0
+    lines = buf.getvalue().splitlines()
+    assert lines[0] == "stuck"
+    assert lines[1].endswith("previous line repeated 6 times")
+    assert len(lines) == 2
+    report_repeats()
+    assert buf.getvalue().splitlines()[2].endswith("repeated 3 times")
+
+
+def test_verbose_repeats_from_other_threads_are_not_collapsed():
+    buf = io.StringIO()
+    trace = Tracer("verbose", file=buf, dedup=True)
+
+    def call() -> None:
+        trace("same")
+
+    call()
+    thread = threading.Thread(target=call, name="other")
+    thread.start()
+    thread.join()
+    call()
+    lines = buf.getvalue().splitlines()
+    assert [line.split("]")[0] for line in lines] == [
+        "[MainThread",
+        "[other",
+        "[MainThread",
+    ]
+
+
+def test_json_ignores_timestamp():
+    buf = io.StringIO()
+    trace = Tracer("json", file=buf, dedup=True)
+    for value in ["same", "same", "same", "other"]:
+        trace(value, 1)
+    lines = buf.getvalue().splitlines()
+    assert json.loads(lines[0])["values"] == ["'same'", "1"]
+    assert lines[1].endswith("previous line repeated 2 times")
+    assert json.loads(lines[2])["values"] == ["'other'", "1"]
+
+
+def test_summary_written_at_exit():
+    script = textwrap.dedent(
+        """
+        from printtrace import printtrace
+
+        for i in range(100):
+            printtrace("poll", mode="minimal", dedup=True)
+        """
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", script],
+        capture_output=True,
+        text=True,
+        timeout=60,
+    )
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.splitlines() == [
+        "poll",
+        "[printtrace] <string>:5 in <module>: previous line repeated 99 times",
+    ]
+
+
+def test_invalid_dedup_arguments():
+    with pytest.raises(ValueError):
+        Tracer("minimal", dedup=0)
+    with pytest.raises(ValueError):
+        Tracer("binary", dedup=True)
+    assert Tracer("minimal").dedup is None
+    assert Tracer("minimal", dedup=True).dedup == dedup.DEFAULT_WINDOW
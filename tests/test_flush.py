@@ -0,0 +1,164 @@
+from __future__ import annotations
+
+import gc
+import io
+import os
+import subprocess
+import sys
+import textwrap
+import time
+import weakref
+
+import pytest
+
+from printtrace import flush as flush_module
+from printtrace import printtrace
+from printtrace.flush import (
+    BatchFlusher,
+    TtyFlusher,
+    flush_pending,
+    resolve_flush_policy,
+)
+
+
+class CountingWriter:
+    def __init__(self, tty: bool = False) -> None:
+        self.buffer = io.StringIO()
+        self.flushes = 0
+        self.tty = tty
+
+    def write(self, data: str) -> None:
+        self.buffer.write(data)
+
+    def flush(self) -> None:
+        self.flushes += 1
+
+    def isatty(self) -> bool:
+        return self.tty
+
+
+def test_default_policy_flushes_every_call():
+    out = CountingWriter()
+    for _ in range(5):
+        printtrace("x", file=out)
+    assert out.flushes == 5
+
+
+def test_tty_policy_flushes_terminals(monkeypatch):
+    monkeypatch.setenv("PRINTTRACE_FLUSH", "tty")
+    out = CountingWriter(tty=True)
+    for _ in range(3):
+        printtrace("x", file=out)
+    assert out.flushes == 3
+
+
+def test_tty_policy_defers_non_terminals(monkeypatch):
+    monkeypatch.setenv("PRINTTRACE_FLUSH", "tty")
+    out = CountingWriter(tty=False)
+    for _ in range(3):
+        printtrace("x", file=out)
+    assert out.flushes == 0
+
+    flush_pending()
+    assert out.flushes == 1
+    assert len(out.buffer.getvalue().splitlines()) == 3
+
+
+def test_tty_policy_treats_streams_without_isatty_as_files():
+    flusher = TtyFlusher()
+    assert flusher.note_write(io.StringIO(), 10) is False
+    flush_pending()
+
+
+def test_tty_policy_does_not_keep_deferred_streams_alive():
+    flusher = TtyFlusher()
+    refs = []
+    for _ in range(1000):
+        out = io.StringIO()
+        flusher.note_write(out, 10)
+        refs.append(weakref.ref(out))
+    del out
+    gc.collect()
+    assert all(ref() is None for ref in refs)
+    assert len(flush_module._pending) <= flush_module._MAX_TRACKED_STREAMS
+    flush_pending()
+
+
+def test_streams_beyond_the_tracking_bound_flush_per_call():
+    flusher = TtyFlusher()
+    live = [CountingWriter() for _ in range(flush_module._MAX_TRACKED_STREAMS)]
+    try:
+        for out in live:
+            assert flusher.note_write(out, 10) is False  # type: ignore[arg-type]
+        extra = CountingWriter()
+        assert flusher.note_write(extra, 10) is True  # type: ignore[arg-type]
+    finally:
+        flush_pending()
+    assert all(out.flushes == 1 for out in live)
+
+
+def test_batch_flushes_when_byte_threshold_reached():
+    flusher = BatchFlusher(max_bytes=100, interval=3600)
+    out = CountingWriter()
+    assert flusher.note_write(out, 60) is False  # type: ignore[arg-type]
+    assert flusher.note_write(out, 60) is True  # type: ignore[arg-type]
+    # The threshold resets after a flush.
+    assert flusher.note_write(out, 60) is False  # type: ignore[arg-type]
+    flush_pending()
+
+
+def test_batch_timer_flushes_idle_streams():
+    flusher = BatchFlusher(max_bytes=1 << 30, interval=0.01)
+    out = CountingWriter()
+    flusher.note_write(out, 1)  # type: ignore[arg-type]
+    deadline = time.monotonic() + 5
+    while not out.flushes and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert out.flushes >= 1
+
+
+def test_env_policy_resolution(monkeypatch):
+    assert resolve_flush_policy(None) == "always"
+    monkeypatch.setenv("PRINTTRACE_FLUSH", "batch")
+    assert resolve_flush_policy(None) == "batch"
+    assert resolve_flush_policy("tty") == "tty"
+
+
+def test_invalid_env_policy_raises(monkeypatch):
+    monkeypatch.setenv("PRINTTRACE_FLUSH", "sometimes")
+    with pytest.raises(ValueError, match="sometimes"):
+        printtrace("x", file=io.StringIO())
+
+
+def _run(script: str, **env: str) -> subprocess.CompletedProcess[str]:
+    return subprocess.run(
+        [sys.executable, "-c", textwrap.dedent(script)],
+        capture_output=True,
+        text=True,
+        timeout=30,
+        env={**os.environ, **env},
+    )
+
+
+def test_deferred_lines_flushed_before_uncaught_exception():
+    script = """
+        from printtrace import printtrace
+        for i in range(3):
+            printtrace("before crash", i, mode="minimal")
+        raise RuntimeError("boom")
+        """
+    result = _run(script, PRINTTRACE_FLUSH="batch")
+    assert result.returncode == 1
+    assert "RuntimeError: boom" in result.stderr
+    assert result.stdout.splitlines() == [f"before crash {i}" for i in range(3)]
+
+
+def test_deferred_lines_flushed_at_exit():
+    script = """
+        from printtrace import printtrace
+        for i in range(100):
+            printtrace("line", i, mode="minimal")
+        """
+    result = _run(script, PRINTTRACE_FLUSH="tty")
+    assert result.returncode == 0, result.stderr
+    assert len(result.stdout.splitlines()) == 100
@@ -2,14 +2,21 @@ from __future__ import annotations
 
 import io
 
-from collections import namedtuple
+from collections import OrderedDict, namedtuple
+from collections.abc import Mapping
 
 from printtrace import printtrace
 from printtrace.formatting import (
     MAX_DEPTH,
     MAX_ITEMS,
     MAX_STR_LEN,
+    MAX_TOTAL_LEN,
+    FormatLimits,
     format_value,
+    format_values,
+    register_formatter,
+    str_values,
+    unregister_formatter,
     _format,
 )
 
@@ -168,3 +175,215 @@ def test_empty_minimal_output():
     buf = io.StringIO()
     printtrace(file=buf, mode="minimal")
     assert buf.getvalue() == "\n"
+
+
+class RequestId:
+    def __init__(self, value: int) -> None:
+        self.value = value
+
+
+class TraceId(RequestId):
+    pass
+
+
+def test_registered_formatter_is_used():
+    register_formatter(RequestId, lambda r: f"req#{r.value}")
+    try:
+        assert format_value(RequestId(7)) == "req#7"
+        assert format_value([RequestId(1), RequestId(2)]) == "[req#1, req#2]"
+    finally:
+        unregister_formatter(RequestId)
+
+
+def test_registered_formatter_applies_to_subclasses():
+    register_formatter(RequestId, lambda r: f"req#{r.value}")
+    try:
+        assert format_value(TraceId(3)) == "req#3"
+    finally:
+        unregister_formatter(RequestId)
+
+
+def test_registered_formatter_applies_to_builtin_subclasses():
+    register_formatter(int, lambda n: f"#{n:x}")
+    try:
+        assert format_value([255, True]) == "[#ff, #1]"
+    finally:
+        unregister_formatter(int)
+    assert format_value([255, True]) == "[255, True]"
+
+
+def test_unregister_restores_repr():
+    register_formatter(RequestId, lambda r: "custom")
+    format_value(TraceId(1))  # populate the resolution cache
+    unregister_formatter(RequestId)
+    assert format_value(RequestId(1)).startswith("<")
+    assert format_value(TraceId(1)).startswith("<")
+
+
+def test_failing_registered_formatter_is_unprintable():
+    def boom(value: object) -> str:
+        raise RuntimeError("formatter exploded")
+
+    register_formatter(RequestId, boom)
+    try:
+        assert format_value(RequestId(1)) == "<unprintable>"
+        assert format_value([RequestId(1), 2]) == "[<unprintable>, 2]"
+    finally:
+        unregister_formatter(RequestId)
+
+
+def test_subclass_dispatch_matches_isinstance_rules():
+    class MyDict(dict):
+        pass
+
+    class MyStr(str):
+        pass
+
+    class MyInt(int):
+        pass
+
+    class MySet(set):
+        pass
+
+    assert format_value(MyDict(a=1)) == "{'a': 1}"
+    assert format_value(MyStr("hi")) == "'hi'"
+    assert format_value(MyInt(5)) == "5"
+    assert format_value(MySet()) == "set()"
+    assert format_value(OrderedDict(a=[1])) == "{'a': [1]}"
+
+
+def test_custom_mapping_uses_mapping_format():
+    class Config(Mapping):
+        def __getitem__(self, key: str) -> int:
+            return {"x": 1}[key]
+
+        def __iter__(self):
+            return iter(["x"])
+
+        def __len__(self) -> int:
+            return 1
+
+    assert format_value(Config()) == "{'x': 1}"
+
+
+def test_total_budget_caps_nested_structures():
+    value = {i: [{j: list(range(10)) for j in range(10)}] * 10 for i in range(10)}
+    result = format_value(value, FormatLimits(max_total=200))
+    assert len(result) < 300
+    assert result.endswith("…}")
+
+
+class Counted:
+    def __init__(self, calls: list[int]) -> None:
+        self.calls = calls
+
+    def __repr__(self) -> str:
+        self.calls.append(1)
+        return "x" * 50
+
+
+def test_budget_stops_iteration_early():
+    calls: list[int] = []
+    value = [Counted(calls) for _ in range(1000)]
+    result = format_value(value, FormatLimits(max_items=1000, max_total=200))
+    assert len(calls) <= 5
+    assert result.endswith("…]")
+
+
+def test_budget_shared_across_values_skips_later_values():
+    calls: list[int] = []
+    limits = FormatLimits(max_str_len=500, max_total=100)
+    result = format_values(["x" * 200, Counted(calls), Counted(calls)], " ", limits)
+    assert result.endswith(" …")
+    assert calls == []
+
+
+def test_fallback_repr_is_truncated_to_budget():
+    class Huge:
+        def __repr__(self) -> str:
+            return "H" * 1_000_000
+
+    result = format_value(Huge())
+    assert len(result) <= MAX_TOTAL_LEN + 1
+    assert result.endswith("…")
+
+
+def test_default_budget_leaves_normal_values_untouched():
+    value = {"user": {"id": 1, "name": "ann"}, "items": list(range(5))}
+    assert format_value(value) == repr(value)
+
+
+def test_minimal_mode_is_budgeted():
+    buf = io.StringIO()
+    printtrace("y" * (MAX_TOTAL_LEN * 2), file=buf, mode="minimal")
+    line = buf.getvalue()
+    assert line.endswith("…\n")
+    assert len(line) <= MAX_TOTAL_LEN + 2
+
+
+def test_str_values_matches_print_within_budget():
+    assert str_values(["a", 1, None], "-") == "a-1-None"
+
+
+def test_self_referencing_list_renders_like_repr():
+    value: list[object] = [1, 2]
+    value.append(value)
+    assert format_value(value) == repr(value) == "[1, 2, [...]]"
+
+
+def test_self_referencing_dict_renders_like_repr():
+    value: dict[str, object] = {"k": 1}
+    value["self"] = value
+    assert format_value(value) == repr(value) == "{'k': 1, 'self': {...}}"
+
+
+def test_cycle_through_a_tuple_renders_like_repr():
+    value: tuple[list[object]] = ([],)
+    value[0].append(value)
+    assert format_value(value) == repr(value) == "([(...)],)"
+
+
+def test_mutual_references_stop_at_the_first_repeat():
+    a: dict[str, object] = {"name": "a"}
+    b: dict[str, object] = {"name": "b", "peer": a}
+    a["peer"] = b
+    deep = FormatLimits(max_depth=20)
+    expected = "{'name': 'a', 'peer': {'name': 'b', 'peer': {...}}}"
+    assert format_value(a, deep) == expected
+
+
+def test_shared_subtree_is_formatted_once():
+    calls = []
+
+    class Row:
+        pass
+
+    register_formatter(Row, lambda row: calls.append(row) or "<Row>")
+    try:
+        shared = [Row()]
+        assert format_value([shared, shared, shared]) == "[[<Row>], [<Row>], [<Row>]]"
+    finally:
+        unregister_formatter(Row)
+    assert len(calls) == 1
+
+
+def test_shared_subtree_keeps_its_depth_cutoff():
+    inner = {"x": [1]}
+    value = [inner, {"again": inner}]
+    # Met again one level deeper, it is cut off one level sooner.
+    assert format_value(value) == "[{'x': […]}, {'again': {…: …}}]"
+
+
+def test_shared_subtree_is_reused_across_values():
+    shared = {"user": {"id": 1}}
+    text = "{'user': {'id': 1}}"
+    assert format_values([shared, shared], " ") == f"{text} {text}"
+
+
+def test_shared_subtree_clipped_by_the_budget_is_not_reused():
+    shared = ["x" * 40] * 3
+    limits = FormatLimits(max_total=100)
+    text = format_value([shared, shared, shared], limits)
+    assert text.startswith("[['" + "x" * 40)
+    assert "…" in text
+    assert len(text) <= 130
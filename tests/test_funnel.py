@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+import multiprocessing
+import os
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+from printtrace._types import CallContext
+from printtrace.context import capture_context, render_context
+
+needs_fork = pytest.mark.skipif(not hasattr(os, "fork"), reason="needs os.fork")
+
+_POOL_SCRIPT = textwrap.dedent(
+    """
+    import io, sys, multiprocessing as mp
+    from concurrent.futures import ProcessPoolExecutor
+    from printtrace import (
+        attach_funnel, printtrace, start_process_funnel, stop_process_funnel,
+    )
+
+    def work(n):
+        # Anything not sent through the funnel would vanish here.
+        sys.stdout = io.StringIO()
+        for i in range(50):
+            printtrace("child", n, i, mode="minimal")
+        printtrace("done", mode="verbose")
+
+    if __name__ == "__main__":
+        ctx = mp.get_context(sys.argv[1])
+        funnel = start_process_funnel(context=ctx)
+        kwargs = {}
+        if sys.argv[1] != "fork":
+            kwargs = {"initializer": attach_funnel, "initargs": (funnel.queue,)}
+        with ProcessPoolExecutor(2, mp_context=ctx, **kwargs) as pool:
+            list(pool.map(work, range(4)))
+        stop_process_funnel()
+    """
+)
+
+
+def _run_pool(tmp_path, method: str) -> list[str]:
+    script = tmp_path / "pool_script.py"
+    script.write_text(_POOL_SCRIPT)
+    result = subprocess.run(
+        [sys.executable, str(script), method],
+        capture_output=True,
+        text=True,
+        timeout=60,
+    )
+    assert result.returncode == 0, result.stderr
+    return result.stdout.splitlines()
+
+
+def _check_pool_output(lines: list[str]) -> None:
+    records = [line for line in lines if line.startswith("child")]
+    assert sorted(records) == sorted(
+        f"child {n} {i}" for n in range(4) for i in range(50)
+    )
+    for n in range(4):
+        mine = [line for line in records if line.split()[1] == str(n)]
+        assert mine == [f"child {n} {i}" for i in range(50)]
+    done = [line for line in lines if line.endswith("| 'done'")]
+    assert len(done) == 4
+    assert all(line.startswith("[") and "Process-" in line for line in done)
+
+
+@needs_fork
+def test_fork_children_are_funnelled(tmp_path):
+    _check_pool_output(_run_pool(tmp_path, "fork"))
+
+
+def test_spawn_children_are_funnelled(tmp_path):
+    _check_pool_output(_run_pool(tmp_path, "spawn"))
+
+
+@needs_fork
+def test_fork_while_lock_held_does_not_deadlock():
+    script = textwrap.dedent(
+        """
+        import os, sys, threading
+        from printtrace import printtrace, start_async_writer
+        from printtrace.sync import output_lock
+
+        start_async_writer()
+        held, release = threading.Event(), threading.Event()
+
+        def hold():
+            with output_lock():
+                held.set()
+                release.wait()
+
+        threading.Thread(target=hold, daemon=True).start()
+        held.wait()
+        pid = os.fork()
+        if pid == 0:
+            printtrace("child ok", mode="minimal")
+            sys.stdout.flush()
+            os._exit(0)
+        os.waitpid(pid, 0)
+        release.set()
+        """
+    )
+    result = subprocess.run(
+        [sys.executable, "-W", "ignore", "-c", script],
+        capture_output=True,
+        text=True,
+        timeout=30,
+    )
+    assert result.returncode == 0, result.stderr
+    assert result.stdout == "child ok\n"
+
+
+def test_context_has_pid_and_process_name():
+    ctx = capture_context(skip=1)
+    assert ctx.pid == os.getpid()
+    assert ctx.process_name == multiprocessing.current_process().name
+
+
+def test_process_name_in_prefix_outside_main_process():
+    ctx = CallContext("/a/app.py", 3, "work", "MainThread", 123, "ForkProcess-1")
+    assert render_context(ctx) == "[ForkProcess-1/MainThread] app.py:3 in work"
+    main = ctx._replace(process_name="MainProcess")
+    assert render_context(main) == "[MainThread] app.py:3 in work"
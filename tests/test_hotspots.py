@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+import io
+import os
+import signal
+import subprocess
+import sys
+import textwrap
+import threading
+import time
+
+import pytest
+
+from printtrace import (
+    Tracer,
+    disable_hotspots,
+    disable_stats,
+    enable_hotspots,
+    enable_stats,
+    hotspots,
+    printtrace,
+    report_hotspots,
+    stats,
+)
+
+
+@pytest.fixture
+def profiling():
+    enable_hotspots()
+    yield
+    disable_hotspots()
+
+
+def _chatty(trace: Tracer) -> None:
+    for i in range(30):
+        trace("chatty", i)
+
+
+def _quiet(trace: Tracer) -> None:
+    trace("quiet", list(range(50)))
+
+
+def test_sites_ranked_by_calls_and_text(profiling):
+    trace = Tracer("minimal", file=io.StringIO())
+    _chatty(trace)
+    _quiet(trace)
+    by_calls = hotspots(by="calls")
+    assert [(h.function, h.calls) for h in by_calls] == [
+        ("_chatty", 30),
+        ("_quiet", 1),
+    ]
+    assert by_calls[0].filename == "test_hotspots.py"
+    assert by_calls[0].format_ns > 0
+    assert by_calls[0].mean_format_ns == by_calls[0].format_ns / 30
+    by_text = hotspots(by="text")
+    assert by_text[0].function == "_chatty"
+    assert sum(h.text for h in by_text) == len(trace.file.getvalue())
+
+
+def test_threads_are_merged(profiling):
+    trace = Tracer("verbose", file=io.StringIO())
+    threads = [threading.Thread(target=_chatty, args=(trace,)) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    (only,) = hotspots()
+    assert only.calls == 120
+
+
+def test_report_table(profiling):
+    trace = Tracer("json", file=io.StringIO())
+    _chatty(trace)
+    _quiet(trace)
+    out = io.StringIO()
+    report_hotspots(top=1, by="calls", file=out)
+    lines = out.getvalue().splitlines()
+    assert lines[0] == "[printtrace] hot call sites, top 1 by calls"
+    assert len(lines) == 3
+    assert lines[2].split()[0] == "30"
+    assert lines[2].endswith("in _chatty")
+
+
+def test_works_alongside_stats(profiling):
+    enable_stats()
+    try:
+        printtrace("x", file=io.StringIO(), mode="minimal")
+        assert stats().calls == {"minimal": 1}
+        assert hotspots()[0].calls == 1
+    finally:
+        disable_stats()
+    printtrace("y", file=io.StringIO(), mode="minimal")
+    assert sum(h.calls for h in hotspots()) == 2
+
+
+def test_disabled_returns_nothing():
+    disable_hotspots()
+    printtrace("x", file=io.StringIO())
+    assert hotspots() == []
+
+
+def test_invalid_arguments():
+    with pytest.raises(ValueError):
+        enable_hotspots(top=0)
+    with pytest.raises(ValueError):
+        hotspots(by="bytes")  # type: ignore[arg-type]
+
+
+def test_report_at_exit():
+    script = textwrap.dedent(
+        """
+        import sys
+        from printtrace import enable_hotspots, printtrace
+
+        enable_hotspots(file=sys.stdout)
+        for i in range(5):
+            printtrace(i, mode="minimal")
+        """
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", script],
+        capture_output=True,
+        text=True,
+        timeout=60,
+    )
+    assert result.returncode == 0, result.stderr
+    lines = result.stdout.splitlines()
+    assert lines[5] == "[printtrace] hot call sites, top 1 by time"
+    assert lines[7].split()[0] == "5"
+    assert lines[7].endswith("<string>:7 in <module>")
+
+
+@pytest.mark.skipif(not hasattr(signal, "SIGUSR1"), reason="needs SIGUSR1")
+def test_report_on_signal(profiling):
+    out = io.StringIO()
+    enable_hotspots(file=out, report_signal=signal.SIGUSR1)
+    try:
+        printtrace("x", file=io.StringIO())
+        os.kill(os.getpid(), signal.SIGUSR1)
+        deadline = time.monotonic() + 5
+        while "hot call sites" not in out.getvalue():
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+    finally:
+        disable_hotspots()
+    assert signal.getsignal(signal.SIGUSR1) == signal.SIG_DFL
@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+import subprocess
+import sys
+
+from printtrace import bench
+
+# Generous: about three times a typical run, so a slow CI machine passes but
+# an eager import of something heavy does not go unnoticed for long.
+IMPORT_BUDGET_US = 200_000
+
+# Loaded on first use only - never by a bare ``import printtrace``.
+DEFERRED = (
+    "array",
+    "asyncio",
+    "inspect",
+    "json",
+    "mmap",
+    "multiprocessing",
+    "printtrace.binary",
+    "printtrace.ring",
+    "printtrace.sinks",
+    "signal",
+    "struct",
+    "traceback",
+)
+
+
+def _loaded_after(statement: str) -> set[str]:
+    script = (
+        f"import sys\n{statement}\n"
+        f"print(' '.join(m for m in {DEFERRED!r} if m in sys.modules))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", script], capture_output=True, text=True, timeout=30
+    )
+    assert result.returncode == 0, result.stderr
+    return set(result.stdout.split())
+
+
+def test_import_loads_no_heavy_modules():
+    assert _loaded_after("import printtrace") == set()
+
+
+def test_first_use_of_a_plain_mode_loads_no_heavy_modules():
+    statement = (
+        "import io, printtrace\n"
+        "printtrace.printtrace('x', {'a': [1]}, file=io.StringIO())\n"
+        "printtrace.printtrace('x', file=io.StringIO(), mode='minimal')"
+    )
+    assert _loaded_after(statement) == set()
+
+
+def test_json_mode_loads_the_encoder_on_first_use():
+    statement = (
+        "import io, printtrace\n"
+        "printtrace.printtrace('x', file=io.StringIO(), mode='json')"
+    )
+    assert _loaded_after(statement) == {"json"}
+
+
+def test_ring_sink_is_loaded_on_first_access():
+    loaded = _loaded_after("import printtrace\nprinttrace.RingSink")
+    assert {"mmap", "printtrace.ring"} <= loaded
+    assert _loaded_after("from printtrace import RingSink") >= {"printtrace.ring"}
+
+
+def test_import_time_within_budget():
+    assert bench.import_time(runs=3) < IMPORT_BUDGET_US
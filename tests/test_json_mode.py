@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import io
+import json
+import os
+import threading
+import time
+
+from printtrace import Tracer, printtrace
+from printtrace._types import CallContext
+from printtrace.context import render_json_fields
+
+
+def _record(*values: object, **kwargs: object) -> tuple[str, dict[str, object]]:
+    buf = io.StringIO()
+    printtrace(*values, file=buf, mode="json", **kwargs)  # type: ignore[arg-type]
+    line = buf.getvalue()
+    assert line.endswith("\n")
+    return line[:-1], json.loads(line)
+
+
+def test_record_has_structured_fields():
+    before = time.time()
+    _, data = _record("hello", 42)
+    assert list(data) == [
+        "message",
+        "context",
+        "thread",
+        "file",
+        "line",
+        "function",
+        "pid",
+        "process",
+        "task",
+        "timestamp",
+        "values",
+    ]
+    assert data["message"] == "'hello' 42"
+    assert data["values"] == ["'hello'", "42"]
+    assert data["thread"] == "MainThread"
+    assert data["file"] == "test_json_mode.py"
+    assert data["function"] == "_record"
+    assert isinstance(data["line"], int)
+    assert data["pid"] == os.getpid()
+    assert data["process"] == "MainProcess"
+    assert data["task"] is None
+    assert data["context"] == (
+        f"[MainThread] test_json_mode.py:{data['line']} in _record"
+    )
+    assert before <= data["timestamp"] <= time.time()
+
+
+def test_output_is_byte_identical_to_json_dumps():
+    values = ('quote"back\\slash', "naïve ☃", "\x00\n\t", {"k": [1.5, None]}, 2**70)
+    line, data = _record(*values, sep=" | ")
+    assert json.dumps(data) == line
+
+
+def test_non_ascii_thread_name_is_escaped_like_json_dumps():
+    lines: list[str] = []
+
+    def run() -> None:
+        buf = io.StringIO()
+        Tracer("json", file=buf)("x")
+        lines.append(buf.getvalue().rstrip("\n"))
+
+    thread = threading.Thread(target=run, name='wörker"1')
+    thread.start()
+    thread.join()
+
+    data = json.loads(lines[0])
+    assert data["thread"] == 'wörker"1'
+    assert json.dumps(data) == lines[0]
+
+
+def test_no_values():
+    line, data = _record()
+    assert data["message"] == ""
+    assert data["values"] == []
+    assert json.dumps(data) == line
+
+
+def test_budget_placeholder_is_the_last_value():
+    buf = io.StringIO()
+    Tracer("json", file=buf, max_total=10)("a" * 20, "b", "c")
+    data = json.loads(buf.getvalue())
+    assert data["values"][-1] == "…"
+    assert data["message"] == " ".join(data["values"])
+
+
+def test_render_json_fields_matches_json_dumps():
+    ctx = CallContext("/src/app/ütil.py", 7, "<lambda>", 'T"1', 42, "Wörker")
+    fields = render_json_fields(ctx)
+    expected = json.dumps(
+        {
+            "context": '[Wörker/T"1] ütil.py:7 in <lambda>',
+            "thread": 'T"1',
+            "file": "ütil.py",
+            "line": 7,
+            "function": "<lambda>",
+            "pid": 42,
+            "process": "Wörker",
+            "task": None,
+        }
+    )
+    assert "{" + fields + "}" == expected
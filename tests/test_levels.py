@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import io
+import os
+import subprocess
+import sys
+
+import pytest
+
+from printtrace import DEBUG, ERROR, INFO, WARNING, Lazy, Tracer, printtrace
+from printtrace.levels import resolve_level
+
+
+class Exploding:
+    """Any attempt to format this value fails the test."""
+
+    def __repr__(self) -> str:
+        raise AssertionError("value was formatted")
+
+    __str__ = __repr__
+
+
+def test_off_mode_writes_nothing():
+    buf = io.StringIO()
+    printtrace("x", file=buf, mode="off")
+    assert buf.getvalue() == ""
+
+
+def test_off_mode_skips_formatting():
+    buf = io.StringIO()
+    printtrace(Exploding(), file=buf, mode="off")
+    Tracer("off", file=buf)(Exploding())
+    assert buf.getvalue() == ""
+
+
+def test_off_mode_from_env(monkeypatch):
+    monkeypatch.setenv("PRINTTRACE_MODE", "off")
+    buf = io.StringIO()
+    printtrace(Exploding(), file=buf)
+    assert buf.getvalue() == ""
+
+
+def test_tracer_level_threshold():
+    buf = io.StringIO()
+    trace = Tracer("minimal", file=buf, level=INFO)
+    trace("debug")
+    trace("info", level=INFO)
+    trace("error", level=ERROR)
+    trace(Exploding(), level=DEBUG)
+    assert buf.getvalue().splitlines() == ["info", "error"]
+
+
+def test_tracer_level_by_name():
+    assert Tracer(level="warning").level == WARNING
+    assert Tracer(level="ERROR").level == ERROR
+
+
+def test_default_threshold_emits_everything():
+    buf = io.StringIO()
+    printtrace("low", file=buf, mode="minimal", level=1)
+    assert buf.getvalue() == "low\n"
+
+
+def test_env_level_threshold(monkeypatch):
+    monkeypatch.setenv("PRINTTRACE_LEVEL", "info")
+    buf = io.StringIO()
+    printtrace("dropped", file=buf, mode="minimal")
+    printtrace("kept", file=buf, mode="minimal", level=WARNING)
+    assert buf.getvalue() == "kept\n"
+
+
+def test_resolve_level():
+    assert resolve_level(None) == 0
+    assert resolve_level(25) == 25
+    assert resolve_level("25") == 25
+    assert resolve_level("Debug") == DEBUG
+
+
+def test_invalid_level_raises(monkeypatch):
+    monkeypatch.setenv("PRINTTRACE_LEVEL", "loud")
+    with pytest.raises(ValueError, match="loud"):
+        printtrace("x", file=io.StringIO())
+
+
+def test_lazy_value_evaluated_when_emitted():
+    buf = io.StringIO()
+    printtrace("total", Lazy(lambda: sum(range(5))), file=buf)
+    assert buf.getvalue().endswith(" | 'total' 10\n")
+
+
+def test_lazy_value_in_minimal_mode():
+    buf = io.StringIO()
+    printtrace(Lazy(lambda: "computed"), file=buf, mode="minimal")
+    assert buf.getvalue() == "computed\n"
+
+
+def test_lazy_value_not_evaluated_when_suppressed():
+    calls: list[int] = []
+    thunk = Lazy(lambda: calls.append(1))
+    printtrace(thunk, file=io.StringIO(), mode="off")
+    Tracer(level=ERROR, file=io.StringIO())(thunk)
+    assert calls == []
+
+
+def test_lazy_value_that_raises_is_unprintable():
+    def boom() -> object:
+        raise RuntimeError("thunk exploded")
+
+    for mode in ("verbose", "minimal", "json"):
+        buf = io.StringIO()
+        printtrace(Lazy(boom), file=buf, mode=mode)
+        assert "<unprintable>" in buf.getvalue()
+
+
+def test_off_at_import_binds_noop():
+    script = (
+        "import printtrace, printtrace.api\n"
+        "assert printtrace.printtrace is printtrace.printtrace_disabled\n"
+        "printtrace.printtrace('hidden', mode='verbose')\n"
+        "printtrace.api.printtrace('shown', mode='minimal')\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", script],
+        capture_output=True,
+        text=True,
+        timeout=30,
+        env={**os.environ, "PRINTTRACE_MODE": "off"},
+    )
+    assert result.returncode == 0, result.stderr
+    assert result.stdout == "shown\n"
@@ -0,0 +1,198 @@
+from __future__ import annotations
+
+import enum
+import sys
+
+import pytest
+
+from printtrace.formatting import (
+    FormatLimits,
+    format_value,
+    register_formatter,
+    unregister_formatter,
+)
+from printtrace.memo import (
+    FormatCache,
+    disable_format_cache,
+    enable_format_cache,
+    format_cache_stats,
+)
+
+
+class Color(enum.Enum):
+    RED = 1
+    BLUE = (2, "b")
+
+
+class Holder(enum.Enum):
+    MUTABLE = [1, 2]
+
+
+class Listy(list, enum.Enum):  # type: ignore[misc]
+    A = [1, 2]
+
+
+@pytest.fixture
+def cache():
+    cache = enable_format_cache()
+    yield cache
+    disable_format_cache()
+
+
+LONG = "constant " * 10
+CONFIG = ("db", 5432, ("replica", 5433), frozenset({"ro"}), Color.RED)
+
+
+def test_disabled_by_default():
+    format_value(LONG)
+    format_value(LONG)
+    assert format_cache_stats() == (0, 0, 0, 0, 0)
+
+
+def test_repeated_long_string_hits(cache):
+    first = format_value(LONG)
+    assert format_value(LONG) == first
+    stats = cache.stats()
+    assert stats.misses == 1
+    assert stats.hits == 1
+
+
+def test_equal_string_objects_share_an_entry(cache):
+    format_value("x" * 40)
+    format_value("".join(["x"] * 40))
+    assert cache.stats().hits == 1
+
+
+def test_short_strings_are_not_cached(cache):
+    format_value("short")
+    format_value("short")
+    assert cache.stats() == (0, 0, 0, 0, 0)
+
+
+def test_immutable_tuple_hits_by_identity(cache):
+    expected = format_value(CONFIG)
+    assert format_value(CONFIG) == expected
+    assert cache.stats().hits == 1
+
+    # An equal but distinct tuple is a separate object: a miss, same output.
+    copy = tuple(list(CONFIG))
+    assert format_value(copy) == expected
+    assert cache.stats().hits == 1
+
+
+def test_enum_members_hit(cache):
+    format_value(Color.BLUE)
+    format_value(Color.BLUE)
+    assert cache.stats().hits == 1
+
+
+def test_tuple_with_mutable_member_is_never_stale(cache):
+    inner = [1, 2]
+    value = ("fixed", inner)
+    assert format_value(value) == "('fixed', [1, 2])"
+    inner.append(3)
+    assert format_value(value) == "('fixed', [1, 2, 3])"
+    assert cache.stats().hits == 0
+
+
+def test_enum_with_mutable_value_is_never_stale(cache):
+    before = format_value(Holder.MUTABLE)
+    Holder.MUTABLE.value.append(3)
+    try:
+        after = format_value(Holder.MUTABLE)
+        assert before != after
+        assert "3" in after
+    finally:
+        Holder.MUTABLE.value.pop()
+
+
+def test_enum_with_unhashable_mixin_is_formatted(cache):
+    disable_format_cache()
+    expected = format_value(Listy.A)
+    enable_format_cache()
+    assert format_value(Listy.A) == expected
+    assert format_value(Listy.A) == expected
+
+
+def test_uncacheable_tuple_is_not_kept_alive(cache):
+    value = tuple(range(5000))  # too large for the immutability walk
+    before = sys.getrefcount(value)
+    format_value(value)
+    format_value(value)
+    assert sys.getrefcount(value) == before
+    assert cache.stats().hits == 0
+
+
+def test_anchored_tuple_counts_against_the_ceiling(cache):
+    value = tuple(range(500))
+    text = format_value(value)
+    assert cache.stats().size > sys.getsizeof(value) + len(text)
+
+
+def test_mutable_containers_are_not_cached(cache):
+    data = {"k": [1]}
+    format_value(data)
+    data["k"].append(2)
+    assert format_value(data) == "{'k': [1, 2]}"
+    assert cache.stats() == (0, 0, 0, 0, 0)
+
+
+def test_bool_and_int_tuples_do_not_collide(cache):
+    assert format_value((1, 1)) == "(1, 1)"
+    assert format_value((True, True)) == "(True, True)"
+
+
+def test_limits_are_part_of_the_key(cache):
+    value = tuple(range(20))
+    short = FormatLimits(max_items=2)
+    assert format_value(value, short) == "(0, 1, …)"
+    assert "…" in format_value(value)
+    assert format_value(value, short) == "(0, 1, …)"
+
+
+def test_eviction_by_entry_count():
+    cache = FormatCache(max_entries=2)
+    for i in range(5):
+        key = cache.key_for(f"{i}" * 40, ())
+        cache.store(key, f"{i}" * 40, "text")
+    stats = cache.stats()
+    assert stats.entries == 2
+    assert stats.evictions == 3
+
+
+def test_eviction_by_memory_ceiling():
+    cache = FormatCache(max_bytes=1000)
+    for i in range(10):
+        value = str(i) * 100
+        cache.store(cache.key_for(value, ()), value, value)
+    stats = cache.stats()
+    assert stats.size <= 1000
+    assert stats.evictions > 0
+
+
+def test_lru_keeps_recently_used_entries():
+    cache = FormatCache(max_entries=2)
+    a, b, c = ("a" * 40, "b" * 40, "c" * 40)
+    for value in (a, b):
+        cache.store(cache.key_for(value, ()), value, value)
+    cache.lookup(cache.key_for(a, ()), a)
+    cache.store(cache.key_for(c, ()), c, c)
+    assert cache.lookup(cache.key_for(a, ()), a) == (True, a)
+    assert cache.lookup(cache.key_for(b, ()), b) == (False, None)
+
+
+def test_registering_a_formatter_clears_the_cache(cache):
+    format_value(LONG)
+    register_formatter(str, lambda s: "custom")
+    try:
+        assert format_value(LONG) == "custom"
+    finally:
+        unregister_formatter(str)
+    assert format_value(LONG).startswith("'constant")
+
+
+def test_invalid_limits_raise():
+    with pytest.raises(ValueError):
+        FormatCache(max_entries=0)
+    with pytest.raises(ValueError):
+        FormatCache(max_bytes=0)
@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import os
+import signal
+import subprocess
+import sys
+
+import pytest
+
+from printtrace import RingSink, Tracer, printtrace
+from printtrace.ring import HEADER_SIZE, MIN_SIZE, read_ring
+
+
+def test_records_round_trip(tmp_path):
+    path = tmp_path / "trace.ring"
+    with RingSink(path, size=MIN_SIZE) as sink:
+        trace = Tracer("minimal", file=sink)  # type: ignore[arg-type]
+        for i in range(5):
+            trace("record", i)
+    assert read_ring(path) == [f"record {i}\n" for i in range(5)]
+
+
+def test_file_has_fixed_size(tmp_path):
+    path = tmp_path / "trace.ring"
+    with RingSink(path, size=MIN_SIZE) as sink:
+        for _ in range(1000):
+            sink.write("x" * 50)
+    assert os.path.getsize(path) == HEADER_SIZE + MIN_SIZE
+
+
+def test_oldest_records_are_overwritten(tmp_path):
+    path = tmp_path / "trace.ring"
+    with RingSink(path, size=MIN_SIZE) as sink:
+        for i in range(2000):
+            sink.write(f"line {i:04d}\n")
+    records = read_ring(path)
+    assert records[-1] == "line 1999\n"
+    # Contiguous and in order, across the wrap-around point.
+    numbers = [int(record.split()[1]) for record in records]
+    assert numbers == list(range(numbers[0], 2000))
+    assert len(records) > 100
+
+
+def test_last_n(tmp_path):
+    path = tmp_path / "trace.ring"
+    with RingSink(path, size=MIN_SIZE) as sink:
+        for i in range(10):
+            sink.write(f"{i}\n")
+    assert read_ring(path, last=3) == ["7\n", "8\n", "9\n"]
+
+
+def test_oversized_record_is_truncated(tmp_path):
+    path = tmp_path / "trace.ring"
+    with RingSink(path, size=MIN_SIZE) as sink:
+        sink.write("a" * (MIN_SIZE * 2))
+    (record,) = read_ring(path)
+    assert set(record) == {"a"}
+    assert len(record) < MIN_SIZE
+
+
+def test_reopen_appends(tmp_path):
+    path = tmp_path / "trace.ring"
+    with RingSink(path, size=MIN_SIZE) as sink:
+        sink.write("first run\n")
+    with RingSink(path, size=MIN_SIZE) as sink:
+        sink.write("second run\n")
+    assert read_ring(path) == ["first run\n", "second run\n"]
+
+
+def test_reopen_with_other_size_resets(tmp_path):
+    path = tmp_path / "trace.ring"
+    with RingSink(path, size=MIN_SIZE) as sink:
+        sink.write("old\n")
+    with RingSink(path, size=MIN_SIZE * 2) as sink:
+        sink.write("new\n")
+    assert read_ring(path) == ["new\n"]
+
+
+def test_write_after_close_raises(tmp_path):
+    sink = RingSink(tmp_path / "trace.ring", size=MIN_SIZE)
+    sink.close()
+    with pytest.raises(ValueError):
+        sink.write("x")
+
+
+def test_invalid_size_raises(tmp_path):
+    with pytest.raises(ValueError, match="size"):
+        RingSink(tmp_path / "trace.ring", size=16)
+
+
+def test_not_a_ring_file_raises(tmp_path):
+    path = tmp_path / "other"
+    path.write_bytes(b"\x00" * 100)
+    with pytest.raises(ValueError, match="Not a printtrace ring file"):
+        read_ring(path)
+
+
+@pytest.mark.skipif(not hasattr(signal, "SIGKILL"), reason="needs SIGKILL")
+def test_records_survive_sigkill(tmp_path):
+    path = tmp_path / "trace.ring"
+    script = (
+        "import os, signal\n"
+        "from printtrace import RingSink, printtrace\n"
+        f"sink = RingSink({str(path)!r}, size={MIN_SIZE})\n"
+        "for i in range(500):\n"
+        "    printtrace('event', i, file=sink, mode='minimal')\n"
+        "os.kill(os.getpid(), signal.SIGKILL)\n"
+    )
+    result = subprocess.run([sys.executable, "-c", script], timeout=30)
+    assert result.returncode == -signal.SIGKILL
+
+    records = read_ring(path, last=3)
+    assert records == ["event 497\n", "event 498\n", "event 499\n"]
+
+
+def test_ring_cli(tmp_path):
+    path = tmp_path / "trace.ring"
+    with RingSink(path, size=MIN_SIZE) as sink:
+        for i in range(5):
+            printtrace("cli", i, file=sink, mode="minimal")  # type: ignore[arg-type]
+
+    result = subprocess.run(
+        [sys.executable, "-m", "printtrace", "ring", "-n", "2", str(path)],
+        capture_output=True,
+        text=True,
+        timeout=30,
+    )
+    assert result.returncode == 0, result.stderr
+    assert result.stdout == "cli 3\ncli 4\n"
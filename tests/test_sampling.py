@@ -0,0 +1,178 @@
+from __future__ import annotations
+
+import io
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+from printtrace import (
+    EveryNth,
+    FirstN,
+    RateLimit,
+    Tracer,
+    printtrace,
+    report_suppressed,
+)
+from printtrace import sampling
+from printtrace._types import Lazy
+
+
+def test_every_nth_emits_first_of_each_group():
+    buf = io.StringIO()
+    policy = EveryNth(3)
+    for i in range(7):
+        printtrace(i, file=buf, mode="minimal", sample=policy)
+    assert buf.getvalue().splitlines() == ["0", "3", "6"]
+
+
+def test_first_n_then_silent():
+    buf = io.StringIO()
+    trace = Tracer("minimal", file=buf, sample=FirstN(2))
+    for i in range(5):
+        trace(i)
+    assert buf.getvalue().splitlines() == ["0", "1"]
+
+
+def test_rate_limit_allows_burst_then_refills(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr(sampling.time, "monotonic", lambda: clock[0])
+    buf = io.StringIO()
+    trace = Tracer("minimal", file=buf, sample=RateLimit(2, burst=2))
+
+    def call(i: int) -> None:
+        trace(i)
+
+    for i in range(4):
+        call(i)
+    clock[0] += 0.5
+    call(4)
+    call(5)
+    assert buf.getvalue().splitlines() == ["0", "1", "4"]
+
+
+def test_state_is_per_call_site():
+    buf = io.StringIO()
+    trace = Tracer("minimal", file=buf, sample=FirstN(1))
+    for _ in range(3):
+        trace("a")
+        trace("b")
+    assert buf.getvalue().splitlines() == ["a", "b"]
+
+
+def test_call_argument_overrides_tracer_policy():
+    buf = io.StringIO()
+    trace = Tracer("minimal", file=buf, sample=FirstN(0))
+    for i in range(3):
+        trace(i, sample=EveryNth(1))
+    assert buf.getvalue().splitlines() == ["0", "1", "2"]
+
+
+def test_suppressed_call_formats_nothing():
+    calls = []
+    lazy = Lazy(lambda: calls.append(1) or "x")
+    trace = Tracer("verbose", file=io.StringIO(), sample=FirstN(0))
+    for _ in range(3):
+        trace(lazy)
+    assert calls == []
+
+
+def test_report_counts_suppressed_lines():
+    buf = io.StringIO()
+    for i in range(10):
+        printtrace(i, file=buf, mode="minimal", sample=FirstN(2))
+    report_suppressed()
+    lines = buf.getvalue().splitlines()
+    assert lines[:2] == ["0", "1"]
+    assert len(lines) == 3
+    assert lines[2].startswith("[printtrace] test_sampling.py:")
+    assert lines[2].endswith(
+        " in test_report_counts_suppressed_lines suppressed 8 lines"
+    )
+
+    # Reported once only.
+    report_suppressed()
+    assert len(buf.getvalue().splitlines()) == 3
+
+
+def test_periodic_report_precedes_later_lines(monkeypatch):
+    clock = [0.0]
+    monkeypatch.setattr(sampling.time, "monotonic", lambda: clock[0])
+    buf = io.StringIO()
+    trace = Tracer("minimal", file=buf, sample=EveryNth(1000))
+    for i in range(2001):
+        trace(i)
+        if i == 1500:
+            clock[0] += sampling.REPORT_INTERVAL
+    lines = buf.getvalue().splitlines()
+    assert lines[0] == "0"
+    assert lines[1] == "1000"
+    assert lines[2].endswith("suppressed 1,500 lines")
+    assert lines[3] == "2000"
+    assert len(lines) == 4
+
+
+def test_periodic_report_does_not_wait_for_an_emitted_line(monkeypatch):
+    clock = [0.0]
+    monkeypatch.setattr(sampling.time, "monotonic", lambda: clock[0])
+    buf = io.StringIO()
+    trace = Tracer("minimal", file=buf, sample=FirstN(1))
+    for i in range(10):
+        trace(i)
+        if i == 5:
+            clock[0] += sampling.REPORT_INTERVAL
+    lines = buf.getvalue().splitlines()
+    assert lines[0] == "0"
+    assert lines[1].endswith("suppressed 6 lines")
+    assert len(lines) == 2
+
+
+def test_sampling_policy_is_abstract():
+    with pytest.raises(TypeError):
+        sampling.SamplingPolicy()  # type: ignore[abstract]
+
+
+def test_binary_trace_gets_no_report_line():
+    buf = io.BytesIO()
+    trace = Tracer("binary", file=buf, sample=FirstN(1))
+    for i in range(3):
+        trace(i)
+    size = len(buf.getvalue())
+    report_suppressed()
+    assert len(buf.getvalue()) == size
+
+
+def test_report_written_at_exit():
+    script = textwrap.dedent(
+        """
+        from printtrace import EveryNth, printtrace
+
+        for i in range(100):
+            printtrace(i, mode="minimal", sample=EveryNth(10))
+        """
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", script],
+        capture_output=True,
+        text=True,
+        timeout=60,
+    )
+    assert result.returncode == 0, result.stderr
+    lines = result.stdout.splitlines()
+    assert lines[:10] == [str(i) for i in range(0, 100, 10)]
+    assert lines[10] == "[printtrace] <string>:5 in <module> suppressed 90 lines"
+
+
+@pytest.mark.parametrize(
+    "make",
+    [
+        lambda: EveryNth(0),
+        lambda: FirstN(-1),
+        lambda: RateLimit(0),
+        lambda: RateLimit(1, burst=0),
+    ],
+)
+def test_invalid_policy_arguments(make):
+    with pytest.raises(ValueError):
+        make()
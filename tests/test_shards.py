@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+import io
+import threading
+import time
+
+import pytest
+
+from printtrace import printtrace, start_async_writer, stop_async_writer
+from printtrace.shards import ShardedWriter
+from printtrace.writer import active_writer
+
+
+@pytest.fixture
+def sharded_mode():
+    writer = start_async_writer(sharded=True)
+    yield writer
+    stop_async_writer()
+
+
+def test_sharded_writer_is_the_active_writer(sharded_mode):
+    assert isinstance(sharded_mode, ShardedWriter)
+    assert active_writer() is sharded_mode
+
+
+def test_single_thread_order(sharded_mode, capture_output):
+    writer, get_lines = capture_output
+    for i in range(500):
+        printtrace("line", i, file=writer, mode="minimal")
+    assert sharded_mode.flush(5)
+    assert get_lines() == [f"line {i}" for i in range(500)]
+
+
+def test_many_threads_keep_per_thread_order(sharded_mode, capture_output):
+    writer, get_lines = capture_output
+    start = threading.Barrier(16)
+
+    def run(n: int) -> None:
+        start.wait()
+        for i in range(200):
+            printtrace(n, i, file=writer, mode="minimal")
+
+    threads = [threading.Thread(target=run, args=(n,)) for n in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sharded_mode.flush(5)
+
+    lines = get_lines()
+    assert len(lines) == 16 * 200
+    for n in range(16):
+        mine = [line for line in lines if line.split()[0] == str(n)]
+        assert mine == [f"{n} {i}" for i in range(200)]
+
+
+def test_arrival_order_across_threads(sharded_mode, capture_output):
+    writer, get_lines = capture_output
+    for i in range(20):
+        # Each record is submitted only after the previous thread finished.
+        thread = threading.Thread(
+            target=printtrace, args=(i,), kwargs={"file": writer, "mode": "minimal"}
+        )
+        thread.start()
+        thread.join()
+    assert sharded_mode.flush(5)
+    assert get_lines() == [str(i) for i in range(20)]
+
+
+def test_missing_sequence_number_is_skipped():
+    writer = ShardedWriter()
+    buf = io.StringIO()
+    try:
+        writer.submit(buf, "before\n")
+        writer._next_seq()  # taken, never appended
+        writer.submit(buf, "after\n")
+        assert writer.flush(5)
+    finally:
+        writer.close(5)
+    assert buf.getvalue() == "before\nafter\n"
+
+
+def test_drop_newest_reports_gap():
+    writer = ShardedWriter(maxsize=1, policy="drop-newest")
+    buf = io.StringIO()
+    gate = threading.Event()
+
+    class Gated(io.StringIO):
+        def write(self, data: str) -> int:
+            gate.wait(5)
+            return buf.write(data)
+
+    stream = Gated()
+    try:
+        writer.submit(stream, "first\n")
+        # Wait for the merger to take "first", then fill and overflow the shard.
+        while writer._shards[0].records:
+            pass
+        writer.submit(stream, "second\n")
+        writer.submit(stream, "dropped\n")
+        writer.submit(stream, "dropped\n")
+        gate.set()
+        assert writer.flush(5)
+        writer.submit(stream, "third\n")
+        assert writer.flush(5)
+    finally:
+        gate.set()
+        writer.close(5)
+    assert buf.getvalue() == ("first\nsecond\n[printtrace] dropped 2 records\nthird\n")
+
+
+def test_close_rejects_new_records():
+    writer = ShardedWriter()
+    assert writer.close(5)
+    assert writer.submit(io.StringIO(), "x") is False
+
+
+def test_record_submitted_during_close_is_not_lost():
+    writer = ShardedWriter()
+    buf = io.StringIO()
+    taking = threading.Event()
+    release = threading.Event()
+    next_seq = writer._next_seq
+
+    def slow_next_seq() -> int:
+        # Hold the submitter between its closed check and its append.
+        taking.set()
+        release.wait(5)
+        return next_seq()
+
+    writer._next_seq = slow_next_seq  # type: ignore[method-assign]
+    result: list[bool] = []
+    submitter = threading.Thread(
+        target=lambda: result.append(writer.submit(buf, "late\n"))
+    )
+    submitter.start()
+    assert taking.wait(5)
+    closer = threading.Thread(target=writer.close, args=(5,))
+    closer.start()
+    time.sleep(0.3)  # long enough for the merger to finish if it does not wait
+    release.set()
+    submitter.join()
+    closer.join()
+    assert result == [True]
+    assert buf.getvalue() == "late\n"
+
+
+def test_drop_oldest_is_not_available():
+    with pytest.raises(ValueError, match="drop-oldest"):
+        start_async_writer(sharded=True, policy="drop-oldest")
+    assert active_writer() is None
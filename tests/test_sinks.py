@@ -0,0 +1,297 @@
+from __future__ import annotations
+
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from printtrace import (
+    FdSink,
+    RotatingFileSink,
+    Tracer,
+    printtrace,
+    start_async_writer,
+    stop_async_writer,
+)
+
+
+def test_records_reach_the_file_on_close(tmp_path):
+    path = tmp_path / "app.log"
+    with RotatingFileSink(path) as sink:
+        trace = Tracer("minimal", file=sink)  # type: ignore[arg-type]
+        for i in range(5):
+            trace("record", i)
+        # Buffered: the per-call flush is held back by flush_interval.
+        assert path.read_text() == ""
+    assert path.read_text() == "".join(f"record {i}\n" for i in range(5))
+
+
+def test_full_buffer_is_written(tmp_path):
+    path = tmp_path / "app.log"
+    with RotatingFileSink(path, buffer_size=100) as sink:
+        for i in range(20):
+            sink.write(f"line {i:02d}\n")
+        written = path.read_text()
+        assert len(written) >= 100
+        assert written == "".join(f"line {i:02d}\n" for i in range(len(written) // 8))
+
+
+def test_flush_writes_once_the_interval_has_passed(tmp_path):
+    path = tmp_path / "app.log"
+    with RotatingFileSink(path, flush_interval=0.05) as sink:
+        sink.write("first\n")
+        sink.flush()
+        assert path.read_text() == ""
+        time.sleep(0.06)
+        sink.flush()
+        assert path.read_text() == "first\n"
+
+
+def test_idle_buffer_is_written_by_the_timer(tmp_path):
+    path = tmp_path / "app.log"
+    with RotatingFileSink(path, flush_interval=0.05) as sink:
+        sink.write("idle\n")
+        deadline = time.monotonic() + 5
+        while path.read_text() != "idle\n" and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert path.read_text() == "idle\n"
+
+
+def test_sync_writes_immediately(tmp_path):
+    path = tmp_path / "app.log"
+    with RotatingFileSink(path) as sink:
+        sink.write("now\n")
+        sink.sync()
+        assert path.read_text() == "now\n"
+
+
+def test_existing_file_is_appended_to(tmp_path):
+    path = tmp_path / "app.log"
+    path.write_text("old\n")
+    with RotatingFileSink(path) as sink:
+        sink.write("new\n")
+    assert path.read_text() == "old\nnew\n"
+
+
+def test_rotates_by_size(tmp_path):
+    path = tmp_path / "app.log"
+    with RotatingFileSink(path, max_bytes=50, backups=2) as sink:
+        for i in range(20):
+            sink.write(f"line {i:02d}\n")
+    names = sorted(os.listdir(tmp_path))
+    assert names == ["app.log", "app.log.1", "app.log.2"]
+    for name in names:
+        assert (tmp_path / name).stat().st_size <= 50
+    # Newest in app.log, then .1, then .2; nothing lost within the kept files.
+    kept = "".join((tmp_path / n).read_text() for n in reversed(names))
+    lines = kept.splitlines()
+    assert lines[-1] == "line 19"
+    numbers = [int(line.split()[1]) for line in lines]
+    assert numbers == list(range(numbers[0], 20))
+
+
+def test_buffered_records_stay_in_the_file_they_were_written_to(tmp_path):
+    path = tmp_path / "app.log"
+    with RotatingFileSink(path) as sink:
+        sink.write("before\n")
+        sink.rotate()
+        sink.write("after\n")
+    assert (tmp_path / "app.log.1").read_text() == "before\n"
+    assert path.read_text() == "after\n"
+
+
+def test_rotates_by_age(tmp_path):
+    path = tmp_path / "app.log"
+    with RotatingFileSink(path, rotate_interval=0.05) as sink:
+        sink.write("early\n")
+        time.sleep(0.06)
+        sink.write("late\n")
+    assert (tmp_path / "app.log.1").read_text() == "early\n"
+    assert path.read_text() == "late\n"
+
+
+def test_no_backups_truncates(tmp_path):
+    path = tmp_path / "app.log"
+    with RotatingFileSink(path, max_bytes=10, backups=0) as sink:
+        sink.write("0123456789")
+        sink.write("abc")
+    assert os.listdir(tmp_path) == ["app.log"]
+    assert path.read_text() == "abc"
+
+
+def test_oversized_record_is_written_whole(tmp_path):
+    path = tmp_path / "app.log"
+    with RotatingFileSink(path, max_bytes=10) as sink:
+        sink.write("small\n")
+        sink.write("x" * 30)
+    assert (tmp_path / "app.log.1").read_text() == "small\n"
+    assert path.read_text() == "x" * 30
+
+
+def test_threads_keep_whole_records_in_order(tmp_path):
+    path = tmp_path / "app.log"
+    with RotatingFileSink(path, buffer_size=4096) as sink:
+        trace = Tracer("minimal", file=sink)  # type: ignore[arg-type]
+
+        def worker(n: int) -> None:
+            for i in range(500):
+                trace(f"t{n}", i)
+
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    lines = path.read_text().splitlines()
+    assert len(lines) == 4000
+    for n in range(8):
+        mine = [int(line.split()[1]) for line in lines if line.startswith(f"t{n} ")]
+        assert mine == list(range(500))
+
+
+def test_write_after_close_raises(tmp_path):
+    sink = RotatingFileSink(tmp_path / "app.log")
+    sink.close()
+    assert sink.closed
+    with pytest.raises(ValueError, match="closed"):
+        sink.write("late\n")
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {"max_bytes": 0},
+        {"rotate_interval": 0},
+        {"backups": -1},
+        {"buffer_size": -1},
+        {"flush_interval": 0},
+    ],
+)
+def test_invalid_settings_raise(tmp_path, kwargs):
+    with pytest.raises(ValueError, match="must be"):
+        RotatingFileSink(tmp_path / "app.log", **kwargs)
+
+
+def test_buffer_is_written_at_exit(tmp_path):
+    path = tmp_path / "app.log"
+    script = (
+        "from printtrace import RotatingFileSink, printtrace\n"
+        f"sink = RotatingFileSink({str(path)!r}, flush_interval=3600)\n"
+        "for i in range(3):\n"
+        "    printtrace('exit', i, file=sink, mode='minimal')\n"
+    )
+    result = subprocess.run([sys.executable, "-c", script], timeout=30)
+    assert result.returncode == 0
+    assert path.read_text() == "exit 0\nexit 1\nexit 2\n"
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs fork")
+def test_forked_child_drops_parent_buffer(tmp_path):
+    path = tmp_path / "app.log"
+    with RotatingFileSink(path) as sink:
+        sink.write("parent\n")
+        pid = os.fork()
+        if pid == 0:
+            try:
+                printtrace("child", file=sink, mode="minimal")  # type: ignore[arg-type]
+                sink.close()
+            finally:
+                os._exit(0)
+        os.waitpid(pid, 0)
+    assert path.read_text() == "child\nparent\n"
+
+
+def test_fd_sink_appends_to_path(tmp_path):
+    path = tmp_path / "app.log"
+    path.write_text("old\n")
+    with FdSink(path) as sink:
+        trace = Tracer("minimal", file=sink)  # type: ignore[arg-type]
+        trace("record", 1)
+        # Unbuffered: on disk before close.
+        assert path.read_text() == "old\nrecord 1\n"
+    assert sink.closed
+
+
+def test_fd_sink_leaves_a_borrowed_descriptor_open(tmp_path):
+    fd = os.open(tmp_path / "app.log", os.O_WRONLY | os.O_CREAT)
+    try:
+        with FdSink(fd) as sink:
+            sink.write("é\n")
+        os.write(fd, b"still open\n")
+    finally:
+        os.close(fd)
+    assert (tmp_path / "app.log").read_text(encoding="utf-8") == "é\nstill open\n"
+
+
+@pytest.mark.skipif(not hasattr(os, "writev"), reason="needs writev")
+def test_fd_sink_batches_stay_within_pipe_buf(monkeypatch):
+    read_fd, write_fd = os.pipe()
+    pipe_buf = os.fpathconf(write_fd, "PC_PIPE_BUF")
+    calls: list[int] = []
+    real_writev = os.writev
+
+    def writev(fd: int, buffers: list[bytes]) -> int:
+        calls.append(sum(map(len, buffers)))
+        return real_writev(fd, buffers)
+
+    monkeypatch.setattr(os, "writev", writev)
+    records = [f"{i:03d} {'x' * 995}\n" for i in range(12)]
+    try:
+        with FdSink(write_fd, closefd=True) as sink:
+            sink.write_records(records)
+        with open(read_fd, "r", closefd=False) as pipe:
+            assert pipe.read() == "".join(records)
+    finally:
+        os.close(read_fd)
+    # Several whole-record batches, none large enough to be split.
+    assert len(calls) > 1
+    assert all(size <= pipe_buf and size % 1000 == 0 for size in calls)
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs fork")
+def test_fd_sink_records_from_several_processes_do_not_interleave():
+    read_fd, write_fd = os.pipe()
+    record = "{n} " + "y" * 2000 + "\n"
+    children = []
+    for n in range(4):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                os.close(read_fd)
+                sink = FdSink(write_fd)
+                for _ in range(200):
+                    sink.write(record.format(n=n))
+            finally:
+                os._exit(0)
+        children.append(pid)
+    os.close(write_fd)
+    with open(read_fd, "r") as pipe:
+        lines = pipe.read().splitlines(keepends=True)
+    for pid in children:
+        os.waitpid(pid, 0)
+    assert len(lines) == 800
+    assert all(line == record.format(n=line.split()[0]) for line in lines)
+
+
+def test_background_writer_hands_fd_sink_whole_runs(tmp_path):
+    batches: list[int] = []
+
+    class CountingSink(FdSink):
+        def write_records(self, texts: list[str]) -> None:
+            batches.append(len(texts))
+            super().write_records(texts)
+
+    path = tmp_path / "app.log"
+    with CountingSink(path) as sink:
+        trace = Tracer("minimal", file=sink)  # type: ignore[arg-type]
+        start_async_writer()
+        try:
+            for i in range(100):
+                trace("queued", i)
+        finally:
+            stop_async_writer()
+    assert path.read_text() == "".join(f"queued {i}\n" for i in range(100))
+    assert sum(batches) == 100
@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import io
+import json
+
+import pytest
+
+from printtrace import Tracer, printtrace
+from printtrace import stack
+from printtrace.stack import capture_stack, render_stack, stack_text
+
+
+class Repo:
+    def get(self, trace: Tracer) -> None:
+        trace("row")
+
+
+def handle(trace: Tracer) -> None:
+    Repo().get(trace)
+
+
+def test_verbose_shows_callers_innermost_first():
+    buf = io.StringIO()
+    handle(Tracer("verbose", file=buf, stack=2))
+    line = buf.getvalue()
+    prefix, rest = line.split(" <- ", 1)
+    assert prefix.endswith("in get")
+    frames = rest.split(" | ")[0].split(" <- ")
+    assert len(frames) == 2
+    assert frames[0].startswith("test_stack.py:")
+    assert frames[0].endswith(" in handle")
+    assert frames[1].endswith(" in test_verbose_shows_callers_innermost_first")
+    assert line.endswith(" | 'row'\n")
+
+
+def test_qualname_is_used():
+    def outer() -> list[str]:
+        return render_stack(capture_stack(1, 1))
+
+    (frame,) = outer()
+    assert frame.endswith(" in test_qualname_is_used")
+
+    class Holder:
+        def method(self) -> list[str]:
+            return render_stack(capture_stack(1, 1))
+
+        def call(self) -> list[str]:
+            return self.method()
+
+    (frame,) = Holder().call()
+    assert frame.endswith("Holder.call")
+
+
+def test_json_stack_field():
+    buf = io.StringIO()
+    handle(Tracer("json", file=buf, stack=1))
+    line = buf.getvalue().rstrip("\n")
+    data = json.loads(line)
+    assert list(data)[8:11] == ["task", "stack", "timestamp"]
+    assert len(data["stack"]) == 1
+    assert data["stack"][0].endswith(" in handle")
+    assert json.dumps(data) == line
+
+
+def test_depth_zero_is_unchanged():
+    plain, deep = io.StringIO(), io.StringIO()
+    printtrace("x", file=plain)
+    printtrace("x", file=deep, stack=0)
+    assert " <- " not in deep.getvalue()
+    assert plain.getvalue().split(":")[0] == deep.getvalue().split(":")[0]
+
+
+def test_stack_shorter_than_depth():
+    key = capture_stack(10_000, 1)
+    assert 0 < len(key) // 2 < 10_000
+
+
+def test_identical_stacks_render_from_cache():
+    def site() -> tuple[object, ...]:
+        return capture_stack(3, 1)
+
+    first, second = site(), site()
+    assert first == second
+    assert stack_text(first) is stack_text(second)
+    assert first in stack._texts
+
+
+def test_printtrace_stack_argument():
+    buf = io.StringIO()
+    printtrace("x", file=buf, stack=1)
+    assert " <- " in buf.getvalue()
+
+
+def test_negative_depth_rejected():
+    with pytest.raises(ValueError):
+        Tracer("verbose", stack=-1)
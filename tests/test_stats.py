@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+import io
+import threading
+
+import pytest
+
+from printtrace import (
+    Tracer,
+    disable_stats,
+    enable_stats,
+    printtrace,
+    reset_stats,
+    start_async_writer,
+    stats,
+    stop_async_writer,
+)
+
+
+@pytest.fixture
+def recording():
+    enable_stats()
+    reset_stats()
+    yield
+    disable_stats()
+
+
+def test_disabled_by_default_and_all_zero():
+    disable_stats()
+    printtrace("x", file=io.StringIO())
+    totals = stats()
+    assert totals.calls == {}
+    assert totals.bytes_written == 0
+    assert totals.lock_wait_histogram == {}
+
+
+def test_counts_calls_per_mode_and_bytes(recording):
+    buf = io.StringIO()
+    printtrace("a", file=buf)
+    printtrace("b", file=buf, mode="minimal")
+    printtrace("c", file=buf, mode="minimal")
+    Tracer("json", file=buf)("d")
+    totals = stats()
+    assert totals.calls == {"verbose": 1, "minimal": 2, "json": 1}
+    assert totals.bytes_written == len(buf.getvalue())
+    assert sum(totals.lock_wait_histogram.values()) == 4
+    assert totals.format_ns > 0
+    assert totals.context_ns > 0
+    assert totals.write_ns > 0
+
+
+def test_threads_are_summed(recording):
+    trace = Tracer("minimal", file=io.StringIO())
+
+    def work() -> None:
+        for _ in range(100):
+            trace("x")
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    totals = stats()
+    assert totals.calls == {"minimal": 400}
+    assert totals.bytes_written == 800
+    assert sum(totals.lock_wait_histogram.values()) == 400
+    assert all(bound & (bound - 1) == 0 for bound in totals.lock_wait_histogram)
+
+
+def test_reset_and_disable(recording):
+    printtrace("x", file=io.StringIO())
+    reset_stats()
+    assert stats().calls == {}
+    printtrace("x", file=io.StringIO())
+    disable_stats()
+    assert stats().calls == {}
+
+
+def test_bytes_written_counts_encoded_bytes(recording):
+    buf = io.StringIO()
+    printtrace("h\u00e9llo \u2603", file=buf, mode="minimal")
+    printtrace("\ud800", file=buf, mode="minimal")
+    assert stats().bytes_written == len(
+        buf.getvalue().encode("utf-8", "surrogatepass")
+    )
+    assert stats().bytes_written > len(buf.getvalue())
+
+
+def test_background_writer_handoff_counts_bytes(recording):
+    start_async_writer()
+    try:
+        printtrace("x", file=io.StringIO(), mode="minimal")
+    finally:
+        stop_async_writer()
+    totals = stats()
+    assert totals.calls == {"minimal": 1}
+    assert totals.bytes_written == 2
+    assert totals.lock_wait_histogram == {}
+
+
+def test_output_unchanged_while_recording(recording):
+    plain = io.StringIO()
+    printtrace("same", 1, file=plain, mode="minimal")
+    assert plain.getvalue() == "same 1\n"
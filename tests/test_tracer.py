@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+import io
+import json
+
+import pytest
+
+from printtrace import Tracer, printtrace
+
+
+def test_verbose_tracer_includes_context():
+    buf = io.StringIO()
+    trace = Tracer(file=buf)
+    trace("hello", 1)
+    out = buf.getvalue()
+    assert out.endswith(" | 'hello' 1\n")
+    assert "test_tracer.py" in out
+    assert "in test_verbose_tracer_includes_context" in out
+
+
+def test_tracer_output_matches_printtrace():
+    tracer_buf = io.StringIO()
+    api_buf = io.StringIO()
+    trace = Tracer(file=tracer_buf)
+    for fn, kwargs in ((trace, {}), (printtrace, {"file": api_buf})):
+        fn({"a": [1, 2]}, "x", sep=", ", end="!\n", **kwargs)
+
+    # Both calls come from the same line, so even the context must match.
+    assert tracer_buf.getvalue() == api_buf.getvalue()
+
+
+def test_minimal_tracer():
+    buf = io.StringIO()
+    Tracer("minimal", file=buf)("a", 42)
+    assert buf.getvalue() == "a 42\n"
+
+
+def test_json_tracer():
+    buf = io.StringIO()
+    Tracer("json", file=buf)("hello")
+    data = json.loads(buf.getvalue())
+    assert data["message"] == "'hello'"
+    assert "test_tracer.py" in data["context"]
+
+
+def test_file_argument_overrides_bound_stream():
+    bound = io.StringIO()
+    override = io.StringIO()
+    trace = Tracer("minimal", file=bound)
+    trace("x", file=override)
+    assert bound.getvalue() == ""
+    assert override.getvalue() == "x\n"
+
+
+def test_unbound_tracer_writes_to_current_stdout(capsys):
+    Tracer("minimal")("to stdout")
+    assert capsys.readouterr().out == "to stdout\n"
+
+
+def test_tracer_ignores_mode_env_var(monkeypatch):
+    monkeypatch.setenv("PRINTTRACE_MODE", "minimal")
+    buf = io.StringIO()
+    Tracer(file=buf)("x")
+    assert " | " in buf.getvalue()
+
+
+def test_tracer_limits_are_per_instance():
+    short = io.StringIO()
+    default = io.StringIO()
+    trace = Tracer("verbose", file=short, max_items=2, max_str_len=3)
+    trace(list(range(5)), "abcdef")
+    Tracer("verbose", file=default)(list(range(5)), "abcdef")
+    assert short.getvalue().endswith(" | [0, 1, …] 'abc…'\n")
+    assert default.getvalue().endswith(" | [0, 1, 2, 3, 4] 'abcdef'\n")
+
+
+def test_tracer_sep_and_end_none():
+    buf = io.StringIO()
+    Tracer("minimal", file=buf)("a", "b", sep=None, end=None)
+    assert buf.getvalue() == "a b\n"
+
+
+def test_tracer_exposes_bound_configuration():
+    buf = io.StringIO()
+    trace = Tracer("json", file=buf, flush="tty", max_depth=5)
+    assert trace.mode == "json"
+    assert trace.file is buf
+    assert trace.flush == "tty"
+    assert trace.limits.max_depth == 5
+    assert "json" in repr(trace)
+
+
+def test_invalid_tracer_mode_raises():
+    with pytest.raises(ValueError, match="vervose"):
+        Tracer("vervose")  # type: ignore[arg-type]
+
+
+def test_invalid_tracer_flush_raises():
+    with pytest.raises(ValueError, match="sometimes"):
+        Tracer(flush="sometimes")